@@ -1,67 +1,50 @@
 from django.contrib import admin
 from .models import Order, OrderItem, Product, Supplier
-from django.core.mail import send_mail
-from django.conf import settings
+from .services import notify_status_changed, transition_orders
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer', 'status', 'delivery_address', 'created_at')
+    list_display = ('id', 'customer', 'status', 'delivery_address', 'total', 'item_count', 'created_at')
+    readonly_fields = ('total', 'item_count')
     list_filter = ('status', 'created_at')
     search_fields = ('customer__username', 'delivery_address')
+    list_select_related = ('customer',)
     actions = ['mark_as_confirmed', 'mark_as_shipped', 'mark_as_delivered']
 
+    def transition(self, request, queryset, target):
+        """
+        Общее действие смены статуса: один UPDATE на все выбранные заказы,
+        письма клиентам уходят фоновой пачкой, поэтому время ответа не зависит от выборки.
+        Заказы, из статуса которых переход недопустим (Order.TRANSITIONS), пропускаются.
+        """
+        updated = transition_orders(queryset, target)
+        notify_status_changed(updated)
+        skipped = queryset.count() - len(updated)
+        self.message_user(request, f'Обновлено заказов: {len(updated)}, пропущено: {skipped}')
+
     def mark_as_confirmed(self, request, queryset):
-        updated = 0
-        for order in queryset:
-            if order.status != 'confirmed':
-                order.status = 'confirmed'
-                order.save()
-                updated += 1
-                send_mail(
-                    subject='Статус заказа обновлен',
-                    message=f'Ваш заказ #{order.id} теперь имеет статус: {order.get_status_display()}.',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[order.customer.email],
-                )
-        self.message_user(request, f'Обновлено заказов: {updated}')
+        self.transition(request, queryset, 'confirmed')
     mark_as_confirmed.short_description = 'Перевести статус на "Подтвержден"'
 
     def mark_as_shipped(self, request, queryset):
-        updated = 0
-        for order in queryset:
-            if order.status != 'shipped':
-                order.status = 'shipped'
-                order.save()
-                updated += 1
-                send_mail(
-                    subject='Статус заказа обновлен',
-                    message=f'Ваш заказ #{order.id} теперь имеет статус: {order.get_status_display()}.',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[order.customer.email],
-                )
-        self.message_user(request, f'Обновлено заказов: {updated}')
+        self.transition(request, queryset, 'shipped')
     mark_as_shipped.short_description = 'Перевести статус на "Отгружен"'
 
     def mark_as_delivered(self, request, queryset):
-        updated = 0
-        for order in queryset:
-            if order.status != 'delivered':
-                order.status = 'delivered'
-                order.save()
-                updated += 1
-                send_mail(
-                    subject='Статус заказа обновлен',
-                    message=f'Ваш заказ #{order.id} теперь имеет статус: {order.get_status_display()}.',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[order.customer.email],
-                )
-        self.message_user(request, f'Обновлено заказов: {updated}')
+        self.transition(request, queryset, 'delivered')
     mark_as_delivered.short_description = 'Перевести статус на "Доставлен"'
 
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('id', 'order', 'product', 'quantity')
+    list_display = ('id', 'order', 'product', 'quantity', 'unit_price')
     list_filter = ('order',)
+    readonly_fields = ('unit_price',)
+
+    def save_model(self, request, obj, form, change):
+        # При замене товара позиция получает его текущую цену (см. OrderItem.save)
+        if 'product' in form.changed_data:
+            obj.unit_price = None
+        super().save_model(request, obj, form, change)
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -0,0 +1,207 @@
+"""
+Дневные агрегаты продаж для аналитики поставщиков (SalesRollup).
+
+Агрегаты меняются приращениями в тех же транзакциях, что и заказы: при создании
+заказов (orders.services), смене статуса и правке позиций из админки (orders.signals).
+Приращения по одному ключу (товар, день, статус) складываются заранее и применяются
+одним UPDATE ... SET units = units + CASE ... на пачку ключей, поэтому число запросов
+не зависит от числа заказов. Полная или частичная пересборка — rebuild_sales_rollups.
+
+Выручка считается по ценам позиций на момент заказа (OrderItem.unit_price), как в SupplierOrder.
+"""
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import ArchivedOrder, Order, OrderItem, Product, SalesRollup
+
+# Ключей в одном UPDATE (по два параметра CASE на ключ и поле)
+UPDATE_CHUNK_SIZE = 200
+
+REVENUE = ExpressionWrapper(
+    F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+class SalesDeltas:
+    """Приращения агрегатов: {(товар, день, статус): [поставщик, единицы, выручка]}."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, supplier_id, product_id, day, status, units, revenue):
+        row = self.rows.setdefault((product_id, day, status), [supplier_id, 0, Decimal(0)])
+        row[1] += units
+        row[2] += revenue
+
+    def add_items(self, order, items, sign=1):
+        """Позиции заказа с загруженными товарами (нужен поставщик), без запросов к БД."""
+        day = timezone.localdate(order.created_at)
+        for item in items:
+            self.add(
+                item.product.supplier_id, item.product_id, day, order.status,
+                sign * item.quantity, sign * item.quantity * item.unit_price,
+            )
+
+    def add_stored(self, items, sign=1, status=None):
+        """Позиции (queryset OrderItem) одним агрегирующим запросом; status — вместо текущего статуса заказов."""
+        rows = (
+            items.values('product_id', 'product__supplier_id', 'order__status', day=TruncDate('order__created_at'))
+            .annotate(units=Sum('quantity'), revenue=Sum(REVENUE))
+            .order_by()
+        )
+        for row in rows:
+            self.add(
+                row['product__supplier_id'], row['product_id'], row['day'], status or row['order__status'],
+                sign * row['units'], sign * row['revenue'],
+            )
+
+    def add_deleted(self, items):
+        """
+        Вычитает удаленные позиции (экземпляры OrderItem): заказы и поставщики товаров
+        загружаются двумя запросами на все позиции. Вызывать, пока заказы и товары еще в БД.
+        """
+        if not items:
+            return
+        orders = {
+            row['id']: row for row in Order.objects.filter(id__in={item.order_id for item in items}).values(
+                'id', 'created_at', 'status',
+            )
+        }
+        suppliers = dict(
+            Product.objects.filter(id__in={item.product_id for item in items}).values_list('id', 'supplier_id')
+        )
+        for item in items:
+            order = orders.get(item.order_id)
+            if order is not None and item.product_id in suppliers:
+                self.add(
+                    suppliers[item.product_id], item.product_id, timezone.localdate(order['created_at']),
+                    order['status'], -item.quantity, -item.quantity * item.unit_price,
+                )
+
+    def add_archived(self, archived, sign=1):
+        """Позиции архивного заказа; поставщики товаров загружаются одним запросом, удаленные товары пропускаются."""
+        day = timezone.localdate(archived.created_at)
+        suppliers = dict(
+            Product.objects.filter(id__in={item[1] for item in archived.items}).values_list('id', 'supplier_id')
+        )
+        for _, product_id, quantity, price in archived.items:
+            if product_id in suppliers:
+                self.add(
+                    suppliers[product_id], product_id, day, archived.status,
+                    sign * quantity, sign * quantity * Decimal(price),
+                )
+
+    def apply(self):
+        apply_sales_deltas(self.rows)
+
+
+def apply_sales_deltas(rows):
+    """
+    Прибавляет приращения к SalesRollup: недостающие строки создаются нулевыми
+    (ignore_conflicts — параллельная вставка того же ключа не ошибка), затем
+    значения меняются атомарным UPDATE с CASE по id строк. Строки создаются только
+    для положительных приращений: вычитать из отсутствующей строки нечего, а при
+    каскадном удалении товара новая строка нарушила бы внешний ключ.
+    """
+    rows = {key: row for key, row in rows.items() if row[1] or row[2]}
+    if not rows:
+        return
+    with transaction.atomic():
+        SalesRollup.objects.bulk_create(
+            (
+                SalesRollup(supplier_id=supplier_id, product_id=product_id, day=day, status=status)
+                for (product_id, day, status), (supplier_id, units, _) in rows.items()
+                if units > 0
+            ),
+            ignore_conflicts=True,
+        )
+        keys = list(rows)
+        for start in range(0, len(keys), UPDATE_CHUNK_SIZE):
+            chunk = keys[start:start + UPDATE_CHUNK_SIZE]
+            stored = SalesRollup.objects.filter(
+                product_id__in={key[0] for key in chunk},
+                day__in={key[1] for key in chunk},
+                status__in={key[2] for key in chunk},
+            ).values_list('product_id', 'day', 'status', 'id')
+            ids = {(product_id, day, status): pk for product_id, day, status, pk in stored}
+            chunk = [key for key in chunk if key in ids]
+            if not chunk:
+                continue
+            SalesRollup.objects.filter(id__in=[ids[key] for key in chunk]).update(
+                units=F('units') + Case(*(When(id=ids[key], then=Value(rows[key][1])) for key in chunk)),
+                revenue=F('revenue') + Case(
+                    *(When(id=ids[key], then=Value(rows[key][2])) for key in chunk),
+                    output_field=DecimalField(max_digits=14, decimal_places=2),
+                ),
+            )
+
+
+def record_orders_created(orders):
+    """orders — пары (заказ, его позиции с загруженными товарами)."""
+    deltas = SalesDeltas()
+    for order, items in orders:
+        deltas.add_items(order, items)
+    deltas.apply()
+
+
+def record_status_change(order_ids, target, source=None):
+    """
+    Переносит продажи заказов из прежнего статуса в target. Без source прежний
+    статус читается из БД — вызывать до UPDATE статуса в той же транзакции.
+    """
+    items = OrderItem.objects.filter(order_id__in=order_ids)
+    deltas = SalesDeltas()
+    deltas.add_stored(items, sign=-1, status=source)
+    deltas.add_stored(items, status=target)
+    deltas.apply()
+
+
+def rebuild_sales_rollups(since=None, using=DEFAULT_DB_ALIAS):
+    """
+    Пересчитывает SalesRollup в базе using по заказам, созданным начиная с даты since (все — если None):
+    оперативные — агрегирующим запросом, архивные — по позициям из ArchivedOrder.
+    Приращения, закоммиченные параллельно с пересборкой, могут потеряться:
+    запускать при затишье записи. Возвращает число строк агрегатов.
+    """
+    deltas = SalesDeltas()
+    items = OrderItem.objects.using(using)
+    archived = ArchivedOrder.objects.using(using)
+    if since is not None:
+        items = items.filter(order__created_at__date__gte=since)
+        archived = archived.filter(created_at__date__gte=since)
+    rows = (
+        items.values('product_id', 'product__supplier_id', 'order__status', day=TruncDate('order__created_at'))
+        .annotate(units=Sum('quantity'), revenue=Sum(REVENUE))
+        .order_by()
+    )
+    for row in rows.iterator():
+        deltas.add(
+            row['product__supplier_id'], row['product_id'], row['day'], row['order__status'],
+            row['units'], row['revenue'],
+        )
+    suppliers = {}
+    for order in archived.values('created_at', 'status', 'items').iterator():
+        day = timezone.localdate(order['created_at'])
+        missing = {item[1] for item in order['items']} - suppliers.keys()
+        if missing:
+            # Удаленные товары запоминаются как None, чтобы не запрашивать их снова
+            suppliers.update(dict.fromkeys(missing))
+            suppliers.update(Product.objects.using(using).filter(id__in=missing).values_list('id', 'supplier_id'))
+        for _, product_id, quantity, price in order['items']:
+            if suppliers[product_id] is not None:
+                deltas.add(suppliers[product_id], product_id, day, order['status'], quantity, quantity * Decimal(price))
+
+    rollups = [
+        SalesRollup(supplier_id=supplier_id, product_id=product_id, day=day, status=status, units=units, revenue=revenue)
+        for (product_id, day, status), (supplier_id, units, revenue) in deltas.rows.items()
+        if units
+    ]
+    with transaction.atomic(using=using):
+        stale = SalesRollup.objects.using(using)
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        SalesRollup.objects.using(using).bulk_create(rollups, batch_size=1000)
+    return len(rollups)
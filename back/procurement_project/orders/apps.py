@@ -1,5 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+def ensure_product_fts(using='default', **kwargs):
+    from .search import install_product_fts
+    from django.db import connections
+    if 'orders_product' in connections[using].introspection.table_names():
+        install_product_fts(using)
 
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(ensure_product_fts, sender=self)
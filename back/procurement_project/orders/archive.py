@@ -0,0 +1,146 @@
+"""
+Горячее и холодное хранение заказов: доставленные заказы, которые давно не менялись,
+переносятся из Order/OrderItem в компактную таблицу ArchivedOrder (строка на заказ,
+позиции внутри нее). Оперативные таблицы и их индексы остаются маленькими.
+
+Чтение архива прозрачно: restore_orders превращает архивные строки в несохраненные
+Order с позициями, поэтому представления и сериализаторы заказов работают с ними
+как с обычными. Строки SupplierOrder при переносе сохраняются — лента поставщика
+продолжает видеть архивные заказы.
+"""
+from collections import defaultdict
+from contextvars import ContextVar
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import ArchivedOrder, Order, OrderItem, Product
+
+ARCHIVE_STATUS = 'delivered'
+
+_archiving = ContextVar('archiving_orders', default=False)
+
+
+def is_archiving():
+    """Идет ли удаление заказов, перенесенных в архив (сигналы не трогают их SupplierOrder)."""
+    return _archiving.get()
+
+
+def archive_orders(days=None, batch_size=None):
+    """
+    Переносит в архив доставленные заказы, не менявшиеся дольше days дней
+    (по умолчанию settings.ORDER_ARCHIVE_AFTER_DAYS). Заказы обрабатываются пачками
+    по batch_size, каждая — в своей короткой транзакции, чтобы не держать блокировки
+    весь проход. Возвращает число перенесенных заказов.
+    """
+    days = settings.ORDER_ARCHIVE_AFTER_DAYS if days is None else days
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    candidates = Order.objects.filter(status=ARCHIVE_STATUS, updated_at__lt=cutoff).order_by('id')
+    archived, last_id = 0, 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return archived
+        archived += archive_batch(ids, cutoff)
+        last_id = ids[-1]
+
+
+def archive_batch(order_ids, cutoff):
+    """Переносит пачку заказов в одной транзакции; условия переноса перепроверяются под блокировкой."""
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update()
+            .filter(id__in=order_ids, status=ARCHIVE_STATUS, updated_at__lt=cutoff)
+            .order_by('id')
+        )
+        if not orders:
+            return 0
+        ids = [order.id for order in orders]
+        items = defaultdict(list)
+        rows = (
+            OrderItem.objects.filter(order_id__in=ids).order_by('id')
+            .values_list('order_id', 'id', 'product_id', 'quantity', 'unit_price')
+        )
+        for order_id, item_id, product_id, quantity, unit_price in rows:
+            items[order_id].append([item_id, product_id, quantity, f'{unit_price:.2f}'])
+        ArchivedOrder.objects.bulk_create(
+            ArchivedOrder(
+                id=order.id, customer_id=order.customer_id, status=order.status,
+                delivery_address=order.delivery_address, created_at=order.created_at,
+                updated_at=order.updated_at, total=order.total, item_count=order.item_count, items=items[order.id],
+            )
+            for order in orders
+        )
+        token = _archiving.set(True)
+        try:
+            Order.objects.filter(id__in=ids).delete()
+        finally:
+            _archiving.reset(token)
+    return len(orders)
+
+
+def _product_ids(rows):
+    return {item[1] for row in rows if isinstance(row, ArchivedOrder) for item in row.items}
+
+
+def _restore(rows, products):
+    restored = []
+    for row in rows:
+        if isinstance(row, ArchivedOrder):
+            order = Order(
+                id=row.id, customer_id=row.customer_id, status=row.status,
+                delivery_address=row.delivery_address, created_at=row.created_at, updated_at=row.updated_at,
+                total=row.total, item_count=row.item_count,
+            )
+            # Позиции удаленных товаров пропускаются, как их удалил бы каскад у оперативного заказа
+            order._prefetched_objects_cache = {'items': [
+                OrderItem(
+                    id=item_id, order=order, product=products[product_id], quantity=quantity, unit_price=Decimal(price),
+                )
+                for item_id, product_id, quantity, price in row.items
+                if product_id in products
+            ]}
+            row = order
+        restored.append(row)
+    return restored
+
+
+def restore_orders(rows):
+    """
+    Заменяет архивные строки в списке (можно вперемешку с Order) на несохраненные
+    Order с предзагруженными позициями; товары загружаются одним запросом.
+    """
+    ids = _product_ids(rows)
+    return _restore(rows, Product.objects.in_bulk(ids) if ids else {})
+
+
+async def arestore_orders(rows):
+    """Async-вариант restore_orders."""
+    ids = _product_ids(rows)
+    return _restore(rows, await Product.objects.ain_bulk(ids) if ids else {})
+
+
+def archived_order_stats(pk):
+    """
+    Времена изменения архивного заказа и его товаров для условного GET
+    (как агрегат по оперативному заказу) или None, если заказа нет в архиве.
+    """
+    row = ArchivedOrder.objects.filter(pk=pk).values('updated_at', 'items').first()
+    if row is None:
+        return None
+    ids = {item[1] for item in row['items']}
+    products = Product.objects.filter(id__in=ids).aggregate(last=Max('updated_at'))['last']
+    return {'order': row['updated_at'], 'products': products}
+
+
+async def aarchived_order_stats(pk):
+    """Async-вариант archived_order_stats."""
+    row = await ArchivedOrder.objects.filter(pk=pk).values('updated_at', 'items').afirst()
+    if row is None:
+        return None
+    ids = {item[1] for item in row['items']}
+    products = (await Product.objects.filter(id__in=ids).aaggregate(last=Max('updated_at')))['last']
+    return {'order': row['updated_at'], 'products': products}
@@ -0,0 +1,178 @@
+"""
+Нативные async-представления для чтения каталога и заказов под ASGI.
+
+DRF не поддерживает async-представления, поэтому здесь используются обычные
+Django View с async-обработчиками: ORM вызывается через aget/aiterator/aaggregate,
+кэш — через aget_or_compute_products. Ответы совпадают с синхронными эндпоинтами.
+"""
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, Throttled
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .archive import aarchived_order_stats, arestore_orders
+from .authentication import CachedTokenAuthentication
+from .cache import aget_or_compute_products
+from .conditional import conditional_response, make_etag
+from .filters import filter_products
+from .models import ArchivedOrder, Order, Product
+from .pagination import ProductCursorPagination
+from .renderers import ORJSONRenderer
+from .serializers import (
+    OrderSerializer, ProductReadSerializer, ProductSerializer, parse_product_fields, product_columns,
+)
+from .throttling import ScopedSlidingThrottle
+from .views import ORDER_ITEMS_PREFETCH
+
+
+async def aauthenticate(request):
+    """Пользователь по заголовку Authorization: Token <key> или по сессии."""
+    auth = request.headers.get('Authorization', '').split()
+    if auth and auth[0].lower() == 'token':
+        if len(auth) != 2:
+            raise AuthenticationFailed('Некорректный заголовок токена.')
+        user, _ = await CachedTokenAuthentication().aauthenticate_credentials(auth[1])
+        return user
+    return await request.auser()
+
+
+class AsyncAPIView(View):
+    """
+    База async-представлений: аутентификация, тротлинг, ошибки DRF (APIException)
+    в JSON и рендер ORJSONRenderer. Тротлинг тот же, что у синхронных представлений
+    (throttle_classes, throttle_scope), и счетчики у них общие: переход на async-URL
+    лимит не обходит.
+    """
+    http_method_names = ['get', 'head', 'options']
+    login_required = False
+    renderer = ORJSONRenderer()
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            # Пользователь нужен и без login_required: лимит считается по нему, а не по IP
+            user = await aauthenticate(request)
+            if self.login_required and not user.is_authenticated:
+                raise NotAuthenticated()
+            # Request DRF нужен ради query_params для фильтров и пагинатора и для тротлинга
+            self.drf_request = Request(request)
+            self.drf_request.user = user
+            await sync_to_async(self.check_throttles)(self.drf_request)
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            # Как rest_framework.views.exception_handler: строка оборачивается в {"detail": ...}
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = self.render(data, exc.status_code)
+            if getattr(exc, 'wait', None) is not None:
+                response['Retry-After'] = '%d' % exc.wait
+            return response
+
+    def check_throttles(self, request):
+        """Как APIView.check_throttles: при отказе — Throttled с наибольшим из ожиданий."""
+        waits = [
+            throttle.wait() for throttle in (throttle_class() for throttle_class in self.throttle_classes)
+            if not throttle.allow_request(request, self)
+        ]
+        if waits:
+            raise Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), status=status_code, content_type='application/json')
+
+    async def render_conditional(self, request, validators, build):
+        """Условный GET: 304 по ETag/Last-Modified, иначе тело из корутины build()."""
+        etag, last_modified = await validators()
+        response, set_headers = conditional_response(request, etag, last_modified)
+        if response is None:
+            response = self.render(await build())
+        return set_headers(response)
+
+
+class ProductListAsyncView(AsyncAPIView):
+    """Async-вариант ProductListView: те же фильтры, ?fields=, курсоры, кэш и лимит (листание только вперед)."""
+    throttle_classes = [ScopedSlidingThrottle]
+    throttle_scope = 'products'
+
+    async def get(self, request):
+        params = sorted(request.GET.lists())
+        queryset = filter_products(Product.objects.all(), request.GET)
+        fields = parse_product_fields(request.GET)
+
+        async def compute_validators():
+            stats = await queryset.aaggregate(last_modified=Max('updated_at'), count=Count('id'))
+            return make_etag('product-list', params, stats['last_modified'], stats['count']), stats['last_modified']
+
+        async def validators():
+            # Ключ совпадает с синхронным списком: валидаторы не зависят от хоста и пути
+            return await aget_or_compute_products(('list-validators', params), compute_validators)
+
+        async def render_page():
+            paginator = ProductCursorPagination()
+            page = await paginator.apaginate_queryset(queryset.values(*product_columns(fields)), self.drf_request)
+            serializer = ProductReadSerializer(page, many=True, context={'request': request, 'fields': fields})
+            return {'next': paginator.next_link, 'previous': None, 'results': list(serializer.data)}
+
+        async def build():
+            parts = ('async-list', request.build_absolute_uri('/'), params)
+            return await aget_or_compute_products(parts, render_page)
+
+        return await self.render_conditional(request, validators, build)
+
+
+class ProductDetailAsyncView(AsyncAPIView):
+    """Async-вариант ProductDetailView; кэш ответа общий с синхронным представлением."""
+
+    async def get(self, request, pk):
+        async def compute_validators():
+            last_modified = await Product.objects.filter(pk=pk).values_list('updated_at', flat=True).afirst()
+            if last_modified is None:
+                return None, None
+            return make_etag('product', pk, last_modified), last_modified
+
+        async def validators():
+            return await aget_or_compute_products(('detail-validators', pk), compute_validators)
+
+        async def retrieve():
+            try:
+                product = await Product.objects.aget(pk=pk)
+            except Product.DoesNotExist:
+                raise NotFound()
+            return ProductSerializer(product, context={'request': request}).data
+
+        async def build():
+            return await aget_or_compute_products(('detail', request.build_absolute_uri('/'), pk), retrieve)
+
+        return await self.render_conditional(request, validators, build)
+
+
+class OrderDetailAsyncView(AsyncAPIView):
+    """Async-вариант OrderDetailView, включая чтение из архива."""
+    login_required = True
+
+    async def get(self, request, pk):
+        async def validators():
+            stats = await Order.objects.filter(pk=pk).aaggregate(
+                order=Max('updated_at'), products=Max('items__product__updated_at'),
+            )
+            if stats['order'] is None:
+                stats = await aarchived_order_stats(pk)
+            if stats is None:
+                return None, None
+            last_modified = max(filter(None, stats.values()))
+            return make_etag('order', pk, stats['order'], stats['products']), last_modified
+
+        async def build():
+            try:
+                order = await Order.objects.prefetch_related(ORDER_ITEMS_PREFETCH).aget(pk=pk)
+            except Order.DoesNotExist:
+                try:
+                    archived = await ArchivedOrder.objects.aget(pk=pk)
+                except ArchivedOrder.DoesNotExist:
+                    raise NotFound()
+                [order] = await arestore_orders([archived])
+            return OrderSerializer(order, context={'request': request}).data
+
+        return await self.render_conditional(request, validators, build)
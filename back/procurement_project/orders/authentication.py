@@ -0,0 +1,93 @@
+import hashlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from .cache import _MISSING, LocalLRUCache
+
+User = get_user_model()
+
+# Поля пользователя в снимке; пароль не кэшируется и при обращении догружается из БД
+USER_SNAPSHOT_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+token_local_cache = LocalLRUCache(
+    maxsize=getattr(settings, 'TOKEN_AUTH_LOCAL_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_AUTH_LOCAL_TTL', 5),
+)
+
+
+def _token_cache_key(key):
+    # В общем кэше хранится хеш, а не сам токен
+    return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def invalidate_tokens(keys):
+    cache_keys = [_token_cache_key(key) for key in keys]
+    for cache_key in cache_keys:
+        token_local_cache.delete(cache_key)
+    cache.delete_many(cache_keys)
+
+
+def invalidate_user_tokens(user_id):
+    invalidate_tokens(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+def _snapshot(token):
+    return {'key': token.key, 'user': [getattr(token.user, name) for name in USER_SNAPSHOT_FIELDS]}
+
+
+def _restore(snapshot):
+    user = User.from_db(router.db_for_read(User), USER_SNAPSHOT_FIELDS, snapshot['user'])
+    token = Token(key=snapshot['key'], user=user)
+    token._state.adding = False
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса Token JOIN User на каждый вызов API.
+    Снимок токена и пользователя хранится в LRU процесса (несколько секунд)
+    и в общем кэше (TOKEN_AUTH_CACHE_TIMEOUT). Удаление токена и любое сохранение
+    пользователя (деактивация, смена роли) сбрасывают снимок (orders.signals);
+    другие процессы увидят изменение не позже TOKEN_AUTH_LOCAL_TTL.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = _token_cache_key(key)
+        snapshot = token_local_cache.get(cache_key)
+        if snapshot is _MISSING:
+            snapshot = cache.get(cache_key)
+            if snapshot is None:
+                snapshot = self.load_snapshot(key)
+                cache.set(cache_key, snapshot, timeout=getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300))
+            token_local_cache.set(cache_key, snapshot)
+        return self.check_snapshot(snapshot)
+
+    async def aauthenticate_credentials(self, key):
+        """Вариант для async-представлений (orders.async_views)."""
+        cache_key = _token_cache_key(key)
+        snapshot = token_local_cache.get(cache_key)
+        if snapshot is _MISSING:
+            snapshot = await cache.aget(cache_key)
+            if snapshot is None:
+                token = await Token.objects.select_related('user').filter(key=key).afirst()
+                snapshot = _snapshot(token) if token is not None else False
+                await cache.aset(cache_key, snapshot, timeout=getattr(settings, 'TOKEN_AUTH_CACHE_TIMEOUT', 300))
+            token_local_cache.set(cache_key, snapshot)
+        return self.check_snapshot(snapshot)
+
+    def load_snapshot(self, key):
+        token = Token.objects.select_related('user').filter(key=key).first()
+        # Несуществующий токен тоже кэшируется (False), чтобы перебор ключей не бил в БД
+        return _snapshot(token) if token is not None else False
+
+    def check_snapshot(self, snapshot):
+        if not snapshot:
+            raise AuthenticationFailed('Недействительный токен.')
+        token = _restore(snapshot)
+        if not token.user.is_active:
+            raise AuthenticationFailed('Пользователь неактивен или удален.')
+        return token.user, token
@@ -0,0 +1,241 @@
+"""
+Сценарии и измерения для manage.py bench: каждый эндпоинт orders/urls.py
+прогоняется в несколько потоков через тестовый клиент Django (полный стек
+middleware → DRF → сериализация), для каждого запроса собираются задержка,
+число SQL-запросов и время сериализации (orders.instrumentation).
+"""
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from .instrumentation import collect_request_stats
+from .models import Order, Product, Supplier, User
+from .services import add_to_cart, create_order
+
+BENCH_PASSWORD = 'BenchPassword123'
+
+
+@dataclass
+class Endpoint:
+    name: str
+    url_name: str
+    method: str
+    # (контекст потока, номер запроса) -> (аргументы маршрута, данные запроса)
+    build: Callable
+    role: Optional[str] = 'customer'
+    # Подготовка перед запросом, в замер не входит
+    prepare: Optional[Callable] = None
+
+
+@dataclass
+class EndpointResult:
+    name: str
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    serialize: list = field(default_factory=list)
+    statuses: dict = field(default_factory=dict)
+    elapsed: float = 0.0
+
+    def as_dict(self):
+        ordered = sorted(self.latencies)
+
+        def percentile(q):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000 if ordered else 0.0
+
+        count = len(self.latencies)
+        return {
+            'requests': count,
+            'errors': sum(number for code, number in self.statuses.items() if code >= 400),
+            'statuses': {str(code): number for code, number in sorted(self.statuses.items())},
+            'rps': round(count / self.elapsed, 1) if self.elapsed else 0.0,
+            'p50_ms': round(percentile(0.5), 2),
+            'p95_ms': round(percentile(0.95), 2),
+            'p99_ms': round(percentile(0.99), 2),
+            'queries_per_request': round(sum(self.queries) / count, 2) if count else 0.0,
+            'serialize_ms': round(sum(self.serialize) / count * 1000, 3) if count else 0.0,
+        }
+
+
+def create_bench_data(products=2000, orders=300, workers=8):
+    """
+    Небольшой каталог и история заказов для замеров: поставщики, товары,
+    по покупателю с токеном на каждый поток и заказы по 3 позиции.
+    """
+    password = make_password(BENCH_PASSWORD)
+    supplier_users = User.objects.bulk_create(
+        User(username=f'bench-supplier-{i}', role='supplier', password=password) for i in range(5)
+    )
+    suppliers = Supplier.objects.bulk_create(
+        Supplier(user=user, company_name=f'Поставщик {i}') for i, user in enumerate(supplier_users)
+    )
+    Product.objects.bulk_create(
+        (
+            Product(
+                supplier=suppliers[i % len(suppliers)], name=f'Товар {i}', description='Описание товара ' * 4,
+                price=i % 1000 + 1, custom_fields={'category': f'Категория {i % 20}'}, category=f'Категория {i % 20}',
+            )
+            for i in range(products)
+        ),
+        batch_size=1000,
+    )
+    customers = User.objects.bulk_create(
+        User(username=f'bench-customer-{i}', role='customer', password=password) for i in range(workers)
+    )
+    Token.objects.bulk_create(Token(key=Token.generate_key(), user=user) for user in [*customers, *supplier_users])
+    catalog = list(Product.objects.order_by('id')[:200])
+    for i in range(orders):
+        create_order(customers[i % len(customers)], f'Адрес {i}', [
+            {'product': catalog[(i * 3 + j) % len(catalog)], 'quantity': j + 1} for j in range(3)
+        ])
+
+
+class BenchContext:
+    """Данные, доступные сценариям в одном потоке: свой покупатель, токены, id товаров и заказов."""
+
+    def __init__(self, worker):
+        self.worker = worker
+        self.customer = User.objects.filter(role='customer', username__startswith='bench-customer-').order_by('id')[worker]
+        self.supplier = Supplier.objects.order_by('id').select_related('user').first().user
+        self.tokens = {
+            'customer': Token.objects.get(user=self.customer).key,
+            'supplier': Token.objects.get(user=self.supplier).key,
+        }
+        self.product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:200])
+        self.order_ids = list(Order.objects.filter(customer=self.customer).values_list('id', flat=True)[:200])
+        self.supplier_order_ids = list(
+            Order.objects.filter(supplier_links__supplier__user=self.supplier).values_list('id', flat=True)[:200]
+        )
+
+    def product(self, i):
+        return self.product_ids[i % len(self.product_ids)]
+
+    def order(self, i):
+        return self.order_ids[i % len(self.order_ids)]
+
+
+def _fill_cart(ctx, i):
+    add_to_cart(ctx.customer, Product.objects.get(pk=ctx.product(i)))
+
+
+def _reset_order(ctx, i):
+    # Переходы статуса идут только вперед: перед каждым запросом заказ возвращается в начало
+    Order.objects.filter(pk=ctx.order(i)).update(status='pending')
+
+
+def _reset_supplier_orders(ctx, i):
+    Order.objects.filter(id__in=ctx.supplier_order_ids).update(status='pending')
+
+
+ENDPOINTS = [
+    Endpoint('register', 'register', 'post', lambda ctx, i: (
+        [], {'username': f'bench-new-{ctx.worker}-{i}-{time.monotonic_ns()}', 'password': BENCH_PASSWORD},
+    ), role=None),
+    Endpoint('login', 'login', 'post', lambda ctx, i: (
+        [], {'username': ctx.customer.username, 'password': BENCH_PASSWORD},
+    ), role=None),
+    Endpoint('product-list', 'product-list', 'get', lambda ctx, i: ([], {'page_size': 50}), role=None),
+    Endpoint('product-list-filtered', 'product-list', 'get', lambda ctx, i: (
+        [], {'category': f'Категория {i % 20}', 'price_max': 500},
+    ), role=None),
+    Endpoint('product-detail', 'product-detail', 'get', lambda ctx, i: ([ctx.product(i)], None), role=None),
+    Endpoint('product-export', 'product-export', 'get', lambda ctx, i: ([], None), role='supplier'),
+    Endpoint('cart', 'cart', 'get', lambda ctx, i: ([], None)),
+    Endpoint('cart-add', 'cart', 'post', lambda ctx, i: ([], {'product_id': ctx.product(i), 'quantity': 1})),
+    Endpoint('cart-remove', 'cart', 'delete', lambda ctx, i: ([], {'product_id': ctx.product(i)}), prepare=_fill_cart),
+    Endpoint('cart-checkout', 'cart-checkout', 'post', lambda ctx, i: (
+        [], {'delivery_address': 'Адрес'},
+    ), prepare=_fill_cart),
+    Endpoint('order-create', 'order-create', 'post', lambda ctx, i: ([], {
+        'delivery_address': 'Адрес',
+        'items': [{'product_id': ctx.product(i + j), 'quantity': 1} for j in range(3)],
+    })),
+    Endpoint('order-batch-create', 'order-batch-create', 'post', lambda ctx, i: ([], {'orders': [
+        {'delivery_address': 'Адрес', 'items': [{'product_id': ctx.product(i + j + k), 'quantity': 1} for k in range(3)]}
+        for j in range(100)
+    ]})),
+    Endpoint('order-list', 'order-list', 'get', lambda ctx, i: ([], None)),
+    Endpoint('order-list-supplier', 'order-list', 'get', lambda ctx, i: ([], None), role='supplier'),
+    Endpoint('order-detail', 'order-detail', 'get', lambda ctx, i: ([ctx.order(i)], None)),
+    Endpoint('order-status-update', 'order-status-update', 'patch', lambda ctx, i: (
+        [ctx.order(i)], {'status': 'confirmed'},
+    ), prepare=_reset_order),
+    Endpoint('order-status-bulk', 'order-status-bulk', 'post', lambda ctx, i: (
+        [], {'ids': ctx.supplier_order_ids, 'status': 'confirmed'},
+    ), role='supplier', prepare=_reset_supplier_orders),
+    Endpoint('sales-analytics', 'sales-analytics', 'get', lambda ctx, i: ([], None), role='supplier'),
+    Endpoint('async-product-list', 'async-product-list', 'get', lambda ctx, i: ([], {'page_size': 50}), role=None),
+    Endpoint('async-product-detail', 'async-product-detail', 'get', lambda ctx, i: ([ctx.product(i)], None), role=None),
+    Endpoint('async-order-detail', 'async-order-detail', 'get', lambda ctx, i: ([ctx.order(i)], None)),
+]
+
+# Эндпоинты orders/urls.py, которые намеренно не нагружаются (error-test всегда падает)
+SKIPPED_URL_NAMES = {'error-test'}
+
+
+def uncovered_url_names():
+    """Имена маршрутов orders/urls.py без сценария — подсказка дописать его в ENDPOINTS."""
+    from .urls import urlpatterns
+    covered = {endpoint.url_name for endpoint in ENDPOINTS} | SKIPPED_URL_NAMES
+    return [pattern.name for pattern in urlpatterns if pattern.name not in covered]
+
+
+def run_endpoint(endpoint, requests, concurrency):
+    """Выполняет requests запросов к эндпоинту в concurrency потоков."""
+    result = EndpointResult(endpoint.name)
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def worker(number):
+        try:
+            ctx = BenchContext(number)
+            client = Client(raise_request_exception=False)
+            headers = {}
+            if endpoint.role:
+                headers['HTTP_AUTHORIZATION'] = f'Token {ctx.tokens[endpoint.role]}'
+            while True:
+                i = next(counter)
+                if i >= requests:
+                    return
+                if endpoint.prepare:
+                    endpoint.prepare(ctx, i)
+                args, data = endpoint.build(ctx, i)
+                url = reverse(endpoint.url_name, args=args)
+                with collect_request_stats() as stats:
+                    started = time.perf_counter()
+                    response = send(client, endpoint.method, url, data, headers)
+                    latency = time.perf_counter() - started
+                with lock:
+                    result.latencies.append(latency)
+                    result.queries.append(stats.queries)
+                    result.serialize.append(stats.timings.get('serialize', 0.0))
+                    result.statuses[response.status_code] = result.statuses.get(response.status_code, 0) + 1
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def send(client, method, url, data, headers):
+    if method == 'get':
+        response = client.get(url, data, **headers)
+    else:
+        response = getattr(client, method)(url, json.dumps(data), content_type='application/json', **headers)
+    if response.streaming:
+        # Потоковый ответ (экспорт) измеряется до конца тела
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    return response
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from .db_routing import primary_reads, sticky_seconds
+
+PRODUCT_CACHE_VERSION_KEY = 'products:version'
+# Время последней инвалидации: пока реплики могут отставать, кэш заполняется из default
+PRODUCT_CACHE_CHANGED_KEY = 'products:changed_at'
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """Небольшой потокобезопасный LRU-кэш в памяти процесса перед общим кэшем."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalLRUCache(
+    maxsize=getattr(settings, 'PRODUCT_CACHE_LOCAL_SIZE', 256),
+    ttl=getattr(settings, 'PRODUCT_CACHE_LOCAL_TTL', 60),
+)
+
+
+def product_cache_version():
+    version = cache.get(PRODUCT_CACHE_VERSION_KEY)
+    if version is None:
+        # Начальная версия от текущего времени: если ключ версии вытеснят из кэша,
+        # новая версия все равно будет больше всех прежних
+        cache.add(PRODUCT_CACHE_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(PRODUCT_CACHE_VERSION_KEY)
+    return version
+
+
+async def aproduct_cache_version():
+    version = await cache.aget(PRODUCT_CACHE_VERSION_KEY)
+    if version is None:
+        await cache.aadd(PRODUCT_CACHE_VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = await cache.aget(PRODUCT_CACHE_VERSION_KEY)
+    return version
+
+
+def invalidate_product_cache():
+    """
+    Инвалидирует все закэшированные ответы каталога сменой версии:
+    старые ключи становятся недостижимы и вытесняются по TTL, сканировать ключи не нужно.
+    """
+    cache.set(PRODUCT_CACHE_CHANGED_KEY, time.time(), timeout=sticky_seconds() or 1)
+    try:
+        cache.incr(PRODUCT_CACHE_VERSION_KEY)
+    except ValueError:
+        product_cache_version()
+
+
+def _make_key(version, parts):
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'products:{version}:{digest}'
+
+
+def get_or_compute_products(parts, compute):
+    """
+    Возвращает закэшированное значение для parts или вычисляет его через compute().
+    Порядок: LRU процесса -> общий кэш -> вычисление под блокировкой, чтобы при
+    истечении горячего ключа его пересчитывал только один запрос.
+    """
+    key = _make_key(product_cache_version(), parts)
+    value = local_cache.get(key)
+    if value is not _MISSING:
+        return value
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = _compute_once(key, compute)
+    local_cache.set(key, value)
+    return value
+
+
+def _compute_once(key, compute):
+    timeout = getattr(settings, 'PRODUCT_CACHE_TIMEOUT', 60 * 60 * 24)
+    lock_timeout = getattr(settings, 'PRODUCT_CACHE_LOCK_TIMEOUT', 10)
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = _compute_fresh(compute)
+            cache.set(key, value, timeout=timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # Значение уже вычисляет другой запрос — ждем его результат
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    return _compute_fresh(compute)
+
+
+def _compute_fresh(compute):
+    # Сразу после изменения каталога реплика может его еще не видеть, а результат
+    # закэшируется надолго — в окне отставания он читается из основной базы
+    if cache.get(PRODUCT_CACHE_CHANGED_KEY) is not None:
+        with primary_reads():
+            return compute()
+    return compute()
+
+
+async def aget_or_compute_products(parts, compute):
+    """
+    Асинхронный вариант get_or_compute_products для async-представлений:
+    общий кэш читается через cache.aget/aadd, compute — корутина,
+    ожидание чужого пересчета не блокирует цикл событий.
+    """
+    key = _make_key(await aproduct_cache_version(), parts)
+    value = local_cache.get(key)
+    if value is not _MISSING:
+        return value
+    value = await cache.aget(key, _MISSING)
+    if value is _MISSING:
+        value = await _acompute_once(key, compute)
+    local_cache.set(key, value)
+    return value
+
+
+async def _acompute_once(key, compute):
+    timeout = getattr(settings, 'PRODUCT_CACHE_TIMEOUT', 60 * 60 * 24)
+    lock_timeout = getattr(settings, 'PRODUCT_CACHE_LOCK_TIMEOUT', 10)
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = await compute()
+            await cache.aset(key, value, timeout=timeout)
+            return value
+        finally:
+            await cache.adelete(lock_key)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        value = await cache.aget(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    return await compute()
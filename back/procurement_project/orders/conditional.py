@@ -0,0 +1,47 @@
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(repr(parts).encode('utf-8')).hexdigest())
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Возвращает (ответ 304/412 или None, функцию проставления заголовков валидаторов).
+    Общая часть ConditionalGetMixin и async-представлений (orders.async_views).
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = None
+    if etag or timestamp:
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def set_headers(response):
+        if response.status_code in (200, 304):
+            if etag:
+                response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    return response, set_headers
+
+
+class ConditionalGetMixin:
+    """
+    Условный GET (ETag / Last-Modified) для API-представлений.
+    Валидаторы считаются агрегатным запросом по updated_at без сериализации тела;
+    если клиент прислал совпадающие If-None-Match / If-Modified-Since, отдается 304.
+    """
+
+    def get_validators(self, request, *args, **kwargs):
+        """Возвращает (etag, last_modified: datetime | None) или (None, None)."""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, *args, **kwargs)
+        response, set_headers = conditional_response(request, etag, last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        return set_headers(response)
@@ -0,0 +1,163 @@
+"""
+Чтение с реплик (settings.REPLICA_DATABASES) для представлений каталога и списка заказов.
+
+Реплика выбирается только внутри запроса, обработанного ReplicaRoutingMiddleware,
+и только в представлениях с ReplicaReadMixin. Все остальное — запись, фоновые
+задачи, команды, чтение внутри транзакции — идет в default.
+
+Read-your-writes: после записи в запросе его дальнейшее чтение идет в default,
+а клиент на REPLICA_STICKY_SECONDS (не меньше отставания реплик) закрепляется
+за основной базой — по пользователю в общем кэше и по cookie для анонимных.
+"""
+import random
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+STICKY_COOKIE = 'db_primary'
+
+# Запросы, которые ничего не меняют: чтение и управление транзакцией
+READ_PREFIXES = ('SELECT', 'EXPLAIN', 'PRAGMA', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'BEGIN', 'COMMIT')
+WRITE_TABLE_RE = re.compile(r'\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)', re.IGNORECASE)
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+def replica_databases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def _sticky_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def is_sticky(request):
+    """Писал ли клиент недавно (его чтение должно видеть собственные изменения)."""
+    if STICKY_COOKIE in request.COOKIES:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_authenticated and cache.get(_sticky_key(user.pk)))
+
+
+def mark_sticky(request, response):
+    seconds = sticky_seconds()
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(_sticky_key(user.pk), True, timeout=seconds)
+    response.set_cookie(STICKY_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+
+
+class ReplicaRouter:
+    """Роутер БД: чтение с реплики, когда его разрешил запрос, все остальное — default."""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = replica_databases()
+        if state is None or not state.use_replica or state.wrote or not replicas:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label in getattr(settings, 'REPLICA_IGNORED_APPS', ()):
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Внутри транзакции чтение должно видеть ее незакоммиченные изменения
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Факт записи отмечает _detect_write: db_for_write вызывается и без записи
+        # (например, при присваивании связанного объекта новому экземпляру)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default, объекты из них можно связывать между собой
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит с репликацией (manage.py sync_replicas), а не из migrate
+        if db in replica_databases():
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Для GET/HEAD представления: чтение с реплики, если клиент не закреплен за
+    основной базой. Решение принимается после аутентификации DRF (initial),
+    чтобы учитывать закрепление по пользователю с токеном.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        state = _state.get()
+        if state is not None and request.method in ('GET', 'HEAD') and not is_sticky(request):
+            state.use_replica = True
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        state = _state.get()
+        if state is not None:
+            state.use_replica = False
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def _ignored_tables():
+    labels = set(getattr(settings, 'REPLICA_IGNORED_APPS', ()))
+    return frozenset(model._meta.db_table for model in apps.get_models() if model._meta.app_label in labels)
+
+
+def _detect_write(execute, sql, params, many, context):
+    state = _state.get()
+    if state is not None and not state.wrote and not sql.lstrip()[:9].upper().startswith(READ_PREFIXES):
+        match = WRITE_TABLE_RE.match(sql)
+        if match is None or match.group(1) not in _ignored_tables():
+            state.wrote = True
+    return execute(sql, params, many, context)
+
+
+def install_write_detector(connection, **kwargs):
+    if connection.alias == DEFAULT_DB_ALIAS and _detect_write not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_detect_write)
+
+
+connection_created.connect(install_write_detector)
+
+
+@contextmanager
+def primary_reads():
+    """Временно читать из default, даже если запросу разрешена реплика."""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    saved, state.use_replica = state.use_replica, False
+    try:
+        yield
+    finally:
+        state.use_replica = saved
+
+
+def begin_request():
+    """Новое состояние маршрутизации на время запроса; возвращает токен для end_request."""
+    # Соединение могло открыться до импорта модуля и пропустить connection_created
+    install_write_detector(connections[DEFAULT_DB_ALIAS])
+    state = RoutingState()
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
@@ -0,0 +1,59 @@
+import csv
+import zlib
+
+EXPORT_FIELDNAMES = ['supplier_username', 'supplier_name', 'name', 'description', 'price', 'category']
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_product_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Построчно отдает товары для экспорта.
+    Один запрос с JOIN поставщика и пользователя, чтение порциями через
+    .values().iterator(), поэтому память не растет вместе с каталогом.
+    """
+    values = queryset.order_by('id').values_list(
+        'supplier__user__username', 'supplier__company_name', 'name', 'description', 'price', 'category',
+    )
+    for username, company_name, name, description, price, category in values.iterator(chunk_size=chunk_size):
+        yield {
+            'supplier_username': username,
+            'supplier_name': company_name,
+            'name': name,
+            'description': description,
+            'price': str(price),
+            'category': category,
+        }
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, block_size=64 * 1024):
+    """Генератор CSV (в байтах) с заголовком, строки склеиваются в блоки ~block_size."""
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDNAMES)
+    buffer = [writer.writeheader()]
+    size = 0
+    for row in rows:
+        line = writer.writerow(row)
+        buffer.append(line)
+        size += len(line)
+        if size >= block_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def iter_gzip(chunks):
+    """Потоковое gzip-сжатие последовательности байтовых блоков."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,86 @@
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .search import search_products
+
+
+def _decimal_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: 'Ожидается число'})
+    # NaN и Infinity Decimal принимает, но lookup по DecimalField на них падает
+    if not value.is_finite():
+        raise ValidationError({name: 'Ожидается число'})
+    return value
+
+
+def _date_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: 'Ожидается дата YYYY-MM-DD'})
+
+
+def filter_sales(queryset, params):
+    """
+    Фильтры агрегатов продаж: ?date_from=, ?date_to= (YYYY-MM-DD, по умолчанию
+    последние 30 дней), ?product=<id>, ?status=. Период не длиннее ANALYTICS_MAX_DAYS,
+    поэтому объем чтения по индексу (supplier, day) ограничен.
+    Возвращает (queryset, date_from, date_to).
+    """
+    date_to = _date_param(params, 'date_to') or timezone.localdate()
+    date_from = _date_param(params, 'date_from') or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise ValidationError({'date_from': 'Начало периода позже конца'})
+    max_days = getattr(settings, 'ANALYTICS_MAX_DAYS', 366)
+    if (date_to - date_from).days >= max_days:
+        raise ValidationError({'date_from': f'Период не длиннее {max_days} дней'})
+    queryset = queryset.filter(day__range=(date_from, date_to))
+
+    product = params.get('product')
+    if product:
+        if not product.isdigit():
+            raise ValidationError({'product': 'Ожидается id товара'})
+        queryset = queryset.filter(product_id=int(product))
+
+    status = params.get('status')
+    if status:
+        queryset = queryset.filter(status=status)
+    return queryset, date_from, date_to
+
+
+def filter_products(queryset, params):
+    """
+    Фильтры каталога: ?supplier=<id>, ?price_min=, ?price_max=, ?category=, ?search=.
+    Каждый фильтр опирается на индекс: (supplier, price), (category, price), price и FTS.
+    """
+    supplier = params.get('supplier')
+    if supplier:
+        if not supplier.isdigit():
+            raise ValidationError({'supplier': 'Ожидается id поставщика'})
+        queryset = queryset.filter(supplier_id=int(supplier))
+
+    category = params.get('category')
+    if category:
+        queryset = queryset.filter(category=category)
+
+    price_min = _decimal_param(params, 'price_min')
+    if price_min is not None:
+        queryset = queryset.filter(price__gte=price_min)
+    price_max = _decimal_param(params, 'price_max')
+    if price_max is not None:
+        queryset = queryset.filter(price__lte=price_max)
+
+    search = params.get('search', '').strip()
+    if search:
+        queryset = search_products(queryset, search)
+    return queryset
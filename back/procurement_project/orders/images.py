@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.utils import timezone
+from versatileimagefield.image_warmer import VersatileImageFieldWarmer
+from versatileimagefield.utils import build_versatileimagefield_url_set, get_rendition_key_set
+from .cache import invalidate_product_cache
+from .models import Product
+
+# Набор превью из settings.VERSATILEIMAGEFIELD_RENDITION_KEY_SETS
+PRODUCT_RENDITION_KEY_SET = 'product_image'
+
+
+def product_rendition_urls(image, ready, request=None):
+    """
+    URL превью товара {'thumbnail': ..., 'list': ..., 'detail': ...}.
+    Возвращает None, пока превью не сгенерированы: ссылки никогда не ведут на
+    несуществующие файлы, а генерация на лету при запросе отключена.
+    """
+    if not image or not ready:
+        return None
+    return build_versatileimagefield_url_set(image, get_rendition_key_set(PRODUCT_RENDITION_KEY_SET), request=request)
+
+
+def warm_product_images(product_ids):
+    """
+    Генерирует превью для товаров и отмечает их готовыми.
+    Возвращает (число созданных превью, список изображений с ошибкой).
+    """
+    products = Product.objects.filter(id__in=product_ids).exclude(image='').exclude(image__isnull=True)
+    warmed, failed = VersatileImageFieldWarmer(products, PRODUCT_RENDITION_KEY_SET, 'image').warm()
+    failed = set(failed)
+    ready = [(product.id, product.image.name) for product in products.only('id', 'image') if product.image.name not in failed]
+    with transaction.atomic():
+        for product_id, image in ready:
+            # Флаг ставится только если изображение не заменили, пока шла генерация
+            Product.objects.filter(id=product_id, image=image).update(
+                image_renditions_ready=True, updated_at=timezone.now(),
+            )
+        transaction.on_commit(invalidate_product_cache)
+    return warmed, sorted(failed)
@@ -0,0 +1,87 @@
+"""
+Легковесный сбор метрик запроса: число и время SQL-запросов и время отдельных
+этапов (например, сериализации). Используется ServerTimingMiddleware и manage.py bench.
+
+Обертка запросов ставится на каждое соединение один раз (connection_created) и
+пишет в RequestStats из ContextVar: контекст копируется в потоки sync_to_async,
+поэтому учитываются и запросы async-представлений.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self, parent=None):
+        self.queries = 0
+        self.query_time = 0.0
+        self.timings = {}
+        # Внешний сбор (например, bench вокруг запроса с middleware) получает те же данные
+        self.parent = parent
+        self._active = set()
+
+    def add_query(self, duration):
+        stats = self
+        while stats is not None:
+            stats.queries += 1
+            stats.query_time += duration
+            stats = stats.parent
+
+    def add_timing(self, name, duration):
+        stats = self
+        while stats is not None:
+            stats.timings[name] = stats.timings.get(name, 0.0) + duration
+            stats = stats.parent
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - started)
+
+
+def install_query_wrapper(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_wrapper)
+
+
+@contextmanager
+def collect_request_stats():
+    """Собирает статистику всего, что выполняется внутри блока, в RequestStats."""
+    # Соединения, открытые до импорта модуля, сигнал connection_created уже пропустили
+    for alias in connections:
+        install_query_wrapper(connections[alias])
+    stats = RequestStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """Добавляет время блока к этапу name текущего запроса; вложенные блоки того же этапа не удваиваются."""
+    stats = _current.get()
+    if stats is None or name in stats._active:
+        yield
+        return
+    stats._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats._active.discard(name)
+        stats.add_timing(name, time.perf_counter() - started)
@@ -0,0 +1,101 @@
+"""
+Простой генератор HTTP-нагрузки на asyncio без сторонних зависимостей.
+Каждый из concurrency «клиентов» держит keep-alive соединение и шлет GET-запросы
+подряд; собираются задержки ответов для подсчета пропускной способности и перцентилей.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class LoadResult:
+    requests: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+    latencies: list = field(default_factory=list)
+
+    @property
+    def rps(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, q):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Соединение закрыто сервером')
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            close = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def _client(host, port, paths, headers, total, result, counter):
+    reader = writer = None
+    try:
+        while True:
+            index = counter[0]
+            if index >= total:
+                return
+            counter[0] += 1
+            path = paths[index % len(paths)]
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            request = f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n{headers}\r\n'
+            started = time.perf_counter()
+            try:
+                writer.write(request.encode('latin-1'))
+                status, close = await _read_response(reader)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                result.errors += 1
+                writer.close()
+                reader = writer = None
+                continue
+            result.latencies.append(time.perf_counter() - started)
+            result.requests += 1
+            if status >= 400:
+                result.errors += 1
+            if close:
+                writer.close()
+                reader = writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def run_load(host, port, paths, requests, concurrency, headers=None):
+    """Отправляет requests GET-запросов по кругу из paths в concurrency соединений."""
+    header_lines = ''.join(f'{name}: {value}\r\n' for name, value in (headers or {}).items())
+    result = LoadResult()
+    counter = [0]
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(host, port, paths, header_lines, requests, result, counter) for _ in range(concurrency)
+    ))
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,23 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from orders.archive import archive_orders
+
+class Command(BaseCommand):
+    help = 'Перенос давно доставленных заказов в архив (то же делает периодическая задача Celery)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help='Архивировать заказы, не менявшиеся дольше этого числа дней')
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+                            help='Количество заказов в одной транзакции')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['days'] < 0 or kwargs['batch_size'] < 1:
+            raise CommandError('--days должен быть неотрицательным, --batch-size — положительным')
+
+        started = time.monotonic()
+        archived = archive_orders(days=kwargs['days'], batch_size=kwargs['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив заказов: {archived} за {time.monotonic() - started:.1f} с'
+        ))
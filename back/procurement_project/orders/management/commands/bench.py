@@ -0,0 +1,149 @@
+import json
+import os
+import subprocess
+import tempfile
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from rest_framework.throttling import SimpleRateThrottle
+from orders.benchmarks import ENDPOINTS, create_bench_data, run_endpoint, uncovered_url_names
+from procurement_project.celery import celery_app
+
+# Метрики, рост которых считается регрессией (для rps — падение)
+REGRESSION_METRICS = ('p95_ms', 'queries_per_request')
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер всех эндпоинтов API на временной наполненной базе: '
+        'пропускная способность, p50/p95/p99, SQL-запросы на запрос и время сериализации'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Запросов на эндпоинт')
+        parser.add_argument('--concurrency', type=int, default=4, help='Параллельных клиентов (потоков)')
+        parser.add_argument('--endpoints', type=str, default=None,
+                            help='Только перечисленные сценарии через запятую (например product-list,cart)')
+        parser.add_argument('--products', type=int, default=2000, help='Товаров во временной базе')
+        parser.add_argument('--orders', type=int, default=300, help='Заказов во временной базе')
+        parser.add_argument('--json', type=str, default=None, help='Сохранить результаты в JSON-файл')
+        parser.add_argument('--compare', type=str, default=None, help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--max-regression', type=float, default=None,
+                            help='Завершиться с ошибкой, если p95, запросы на запрос или rps хуже на N процентов')
+
+    def handle(self, *args, **kwargs):
+        endpoints = ENDPOINTS
+        if kwargs['endpoints']:
+            names = set(kwargs['endpoints'].split(','))
+            unknown = names - {endpoint.name for endpoint in ENDPOINTS}
+            if unknown:
+                raise CommandError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            endpoints = [endpoint for endpoint in ENDPOINTS if endpoint.name in names]
+        for name in uncovered_url_names():
+            self.stderr.write(self.style.WARNING(f'Нет сценария для маршрута {name} (orders.benchmarks.ENDPOINTS)'))
+        if 'silk' in settings.INSTALLED_APPS:
+            self.stderr.write(self.style.WARNING(
+                'Включен silk: его запросы попадут в замер, используйте --settings=procurement_project.settings_bench'
+            ))
+
+        results = self.run(endpoints, kwargs)
+        report = {
+            'commit': self.git_commit(),
+            'settings': os.environ.get('DJANGO_SETTINGS_MODULE'),
+            'requests': kwargs['requests'],
+            'concurrency': kwargs['concurrency'],
+            'dataset': {'products': kwargs['products'], 'orders': kwargs['orders']},
+            'endpoints': results,
+        }
+        self.print_table(results)
+        if kwargs['json']:
+            with open(kwargs['json'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {kwargs["json"]}')
+        if kwargs['compare']:
+            with open(kwargs['compare'], encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline['endpoints'], results, kwargs['max_regression'])
+            if regressions:
+                raise CommandError(f'Регрессии производительности: {", ".join(regressions)}')
+
+    def run(self, endpoints, kwargs):
+        # Временная база (копия схемы через миграции): сценарии создают заказы и пользователей
+        fd, db_name = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        database = connections['default'].settings_dict
+        if database['ENGINE'].endswith('sqlite3'):
+            # Файл, а не :memory:, чтобы потоки работали с одной базой; IMMEDIATE-транзакции
+            # ждут блокировку записи вместо мгновенного «database is locked»
+            database.setdefault('TEST', {})['NAME'] = db_name
+            database['OPTIONS'] = {**database.get('OPTIONS', {}), 'timeout': 30, 'transaction_mode': 'IMMEDIATE'}
+        rates = SimpleRateThrottle.THROTTLE_RATES
+        saved_rates = dict(rates)
+        always_eager = celery_app.conf.task_always_eager
+        try:
+            with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            ):
+                old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+                try:
+                    # Без тротлинга; фоновые задачи выполняются сразу, без брокера
+                    rates.update(dict.fromkeys(rates))
+                    celery_app.conf.task_always_eager = True
+                    self.stdout.write('Наполнение временной базы...')
+                    create_bench_data(kwargs['products'], kwargs['orders'], kwargs['concurrency'])
+                    results = {}
+                    for endpoint in endpoints:
+                        self.stdout.write(f'  {endpoint.name}...')
+                        results[endpoint.name] = run_endpoint(
+                            endpoint, kwargs['requests'], kwargs['concurrency'],
+                        ).as_dict()
+                    return results
+                finally:
+                    teardown_databases(old_config, verbosity=0)
+        finally:
+            rates.clear()
+            rates.update(saved_rates)
+            celery_app.conf.task_always_eager = always_eager
+            if os.path.exists(db_name):
+                os.remove(db_name)
+
+    def print_table(self, results):
+        self.stdout.write(
+            f'{"эндпоинт":<24} {"запр/с":>8} {"p50, мс":>8} {"p95, мс":>8} {"p99, мс":>8} '
+            f'{"SQL/запр":>9} {"сериал., мс":>11} {"ошибки":>7}'
+        )
+        for name, row in results.items():
+            self.stdout.write(
+                f'{name:<24} {row["rps"]:8.1f} {row["p50_ms"]:8.2f} {row["p95_ms"]:8.2f} {row["p99_ms"]:8.2f} '
+                f'{row["queries_per_request"]:9.2f} {row["serialize_ms"]:11.3f} {row["errors"]:7d}'
+            )
+
+    def compare(self, baseline, results, max_regression):
+        self.stdout.write('Сравнение с прошлым прогоном (изменение в %):')
+        regressions = []
+        for name, row in results.items():
+            old = baseline.get(name)
+            if not old:
+                continue
+            changes = {
+                metric: (row[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+                for metric in ('rps', *REGRESSION_METRICS)
+            }
+            self.stdout.write(f'  {name:<24} ' + '  '.join(f'{metric} {value:+.1f}' for metric, value in changes.items()))
+            if max_regression is None:
+                continue
+            worse = -changes['rps'] > max_regression or any(changes[m] > max_regression for m in REGRESSION_METRICS)
+            if worse:
+                regressions.append(name)
+        return regressions
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
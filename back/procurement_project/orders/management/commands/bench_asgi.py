@@ -0,0 +1,101 @@
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from orders.loadgen import run_load
+from orders.models import Order, Product
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочное сравнение WSGI (gunicorn) и ASGI (uvicorn) на эндпоинтах чтения: '
+        'пропускная способность и хвостовые задержки при высокой конкурентности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=3000, help='Запросов на сценарий')
+        parser.add_argument('--concurrency', type=int, default=200, help='Одновременных соединений')
+        parser.add_argument('--warmup', type=int, default=200, help='Прогревочных запросов перед замером')
+        parser.add_argument('--workers', type=int, default=1, help='Процессов сервера (gunicorn и uvicorn)')
+        parser.add_argument('--wsgi-threads', type=int, default=16, help='Потоков на процесс gunicorn')
+        parser.add_argument('--port', type=int, default=8765, help='Порт для запуска серверов')
+        parser.add_argument('--token', type=str, default=None,
+                            help='Токен пользователя: добавляет в нагрузку детали заказов')
+        parser.add_argument('--bench-settings', type=str, default='procurement_project.settings_bench',
+                            help='Модуль настроек для серверов (по умолчанию без silk, Sentry и тротлинга)')
+
+    def handle(self, *args, **kwargs):
+        for module in ('uvicorn', 'gunicorn'):
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f'Для замера нужен {module}: pip install uvicorn gunicorn')
+
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:20])
+        if not product_ids:
+            raise CommandError('В базе нет товаров: сначала наполните каталог')
+        sync_paths = ['/api/products/?page_size=20'] + [f'/api/products/{pk}/' for pk in product_ids]
+        headers = {}
+        if kwargs['token']:
+            headers['Authorization'] = f'Token {kwargs["token"]}'
+            order_ids = list(Order.objects.order_by('-id').values_list('id', flat=True)[:20])
+            sync_paths += [f'/api/orders/{pk}/' for pk in order_ids]
+        async_paths = [path.replace('/api/', '/api/async/', 1) for path in sync_paths]
+
+        scenarios = [
+            ('WSGI gunicorn + sync', self.gunicorn_command(kwargs), sync_paths),
+            ('ASGI uvicorn + sync', self.uvicorn_command(kwargs), sync_paths),
+            ('ASGI uvicorn + async', self.uvicorn_command(kwargs), async_paths),
+        ]
+        self.stdout.write(
+            f'Запросов: {kwargs["requests"]}, соединений: {kwargs["concurrency"]}, '
+            f'процессов: {kwargs["workers"]}, URL в ротации: {len(sync_paths)}'
+        )
+        self.stdout.write(f'  {"сценарий":<24} {"запр/с":>9} {"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9} {"ошибки":>7}')
+        for name, command, paths in scenarios:
+            result = self.run_scenario(command, paths, headers, kwargs)
+            self.stdout.write(
+                f'  {name:<24} {result.rps:9.0f} {result.percentile(0.5) * 1000:9.1f} '
+                f'{result.percentile(0.95) * 1000:9.1f} {result.percentile(0.99) * 1000:9.1f} {result.errors:7d}'
+            )
+
+    def gunicorn_command(self, kwargs):
+        return [
+            sys.executable, '-m', 'gunicorn', 'procurement_project.wsgi:application',
+            '--bind', f'127.0.0.1:{kwargs["port"]}', '--workers', str(kwargs['workers']),
+            '--threads', str(kwargs['wsgi_threads']), '--log-level', 'warning',
+        ]
+
+    def uvicorn_command(self, kwargs):
+        return [
+            sys.executable, '-m', 'uvicorn', 'procurement_project.asgi:application',
+            '--host', '127.0.0.1', '--port', str(kwargs['port']), '--workers', str(kwargs['workers']),
+            '--log-level', 'warning', '--no-access-log',
+        ]
+
+    def run_scenario(self, command, paths, headers, kwargs):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': kwargs['bench_settings']}
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            self.wait_for_port(kwargs['port'], server)
+            if kwargs['warmup']:
+                asyncio.run(run_load('127.0.0.1', kwargs['port'], paths, kwargs['warmup'], 10, headers))
+            return asyncio.run(run_load(
+                '127.0.0.1', kwargs['port'], paths, kwargs['requests'], kwargs['concurrency'], headers,
+            ))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_for_port(self, port, server, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'Сервер завершился с кодом {server.returncode}')
+            with socket.socket() as sock:
+                if sock.connect_ex(('127.0.0.1', port)) == 0:
+                    return
+            time.sleep(0.1)
+        raise CommandError(f'Сервер не начал принимать соединения на порту {port} за {timeout} с')
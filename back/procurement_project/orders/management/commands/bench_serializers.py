@@ -0,0 +1,57 @@
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from orders.models import Product
+from orders.renderers import ORJSONRenderer
+from orders.serializers import ProductReadSerializer, ProductSerializer, product_row
+
+class Command(BaseCommand):
+    help = 'Микробенчмарк сериализации списка товаров: ProductSerializer против быстрого пути'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Количество товаров в списке')
+        parser.add_argument('--repeat', type=int, default=3, help='Число повторов (берется лучший результат)')
+
+    def handle(self, *args, **kwargs):
+        rows, repeat = kwargs['rows'], kwargs['repeat']
+        now = datetime.now(timezone.utc)
+        # Данные строятся в памяти: измеряется только сериализация, без БД
+        products = [
+            Product(
+                id=i, supplier_id=i % 50 + 1, name=f'Товар {i}', description='Описание ' * 5,
+                price=Decimal(i % 1000) + Decimal('0.99'), custom_fields={'category': f'Категория {i % 20}'},
+                category=f'Категория {i % 20}', image='', updated_at=now,
+            )
+            for i in range(1, rows + 1)
+        ]
+        values = [product_row(product) for product in products]
+
+        def best(func):
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = func()
+                timings.append(time.perf_counter() - started)
+            return min(timings), result
+
+        drf_time, drf_data = best(lambda: ProductSerializer(products, many=True).data)
+        fast_time, fast_data = best(lambda: ProductReadSerializer(values, many=True).data)
+        if [dict(item) for item in drf_data] != list(fast_data):
+            self.stderr.write(self.style.WARNING('Внимание: выводы сериализаторов различаются'))
+
+        json_time, _ = best(lambda: JSONRenderer().render(fast_data))
+        orjson_time, _ = best(lambda: ORJSONRenderer().render(fast_data))
+
+        self.stdout.write(f'Строк: {rows}, лучший из {repeat} прогонов')
+        self.report('ProductSerializer (DRF)', rows, drf_time)
+        self.report('ProductReadSerializer', rows, fast_time, drf_time)
+        self.report('JSONRenderer', rows, json_time)
+        self.report('ORJSONRenderer', rows, orjson_time, json_time)
+
+    def report(self, name, rows, seconds, baseline=None):
+        line = f'  {name:<26} {seconds * 1000:9.1f} мс  {rows / seconds:12,.0f} строк/с'
+        if baseline:
+            line += f'  x{baseline / seconds:.1f}'
+        self.stdout.write(line)
@@ -1,5 +1,7 @@
 import csv
+import gzip
 from django.core.management.base import BaseCommand
+from orders.exports import EXPORT_FIELDNAMES, iter_product_rows
 from orders.models import Product
 
 class Command(BaseCommand):
@@ -7,24 +9,29 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Путь к CSV файлу для сохранения товаров')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжать файл gzip (включается автоматически для имен *.gz)')
+        parser.add_argument('--supplier', type=str, default=None,
+                            help='Экспортировать только товары поставщика с указанным username')
 
     def handle(self, *args, **kwargs):
         csv_file = kwargs['csv_file']
-        products = Product.objects.select_related('supplier').all()
+        products = Product.objects.all()
+        if kwargs['supplier']:
+            products = products.filter(supplier__user__username=kwargs['supplier'])
 
-        fieldnames = ['supplier_username', 'supplier_name', 'name', 'description', 'price', 'category']
-        with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+        if kwargs['gzip'] or csv_file.endswith('.gz'):
+            f = gzip.open(csv_file, 'wt', newline='', encoding='utf-8')
+        else:
+            f = open(csv_file, 'w', newline='', encoding='utf-8')
+
+        count = 0
+        with f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDNAMES)
             writer.writeheader()
 
-            for product in products:
-                writer.writerow({
-                    'supplier_username': product.supplier.user.username,
-                    'supplier_name': product.supplier.company_name,
-                    'name': product.name,
-                    'description': product.description,
-                    'price': str(product.price),
-                    'category': product.custom_fields.get('category', '')
-                })
+            for row in iter_product_rows(products):
+                writer.writerow(row)
+                count += 1
 
-        self.stdout.write(self.style.SUCCESS(f'Экспорт товаров завершен. Файл сохранен в {csv_file}'))
+        self.stdout.write(self.style.SUCCESS(f'Экспорт товаров завершен ({count} шт.). Файл сохранен в {csv_file}'))
@@ -1,6 +1,12 @@
 import csv
-from django.core.management.base import BaseCommand
+import time
+from itertools import islice
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from orders.cache import invalidate_product_cache
 from orders.models import Product, Supplier
+from orders.tasks import warm_product_renditions
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -10,20 +16,171 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Путь к CSV файлу с товарами')
+        parser.add_argument('--bulk', action='store_true',
+                            help='Пакетный режим: bulk_create порциями, обновление цен у существующих товаров')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Количество строк в одной транзакции (пакетный режим)')
+        parser.add_argument('--resume', action='store_true',
+                            help='Продолжить импорт с последней сохраненной порции (пакетный режим)')
+        parser.add_argument('--checkpoint', type=str, default=None,
+                            help='Файл контрольной точки (по умолчанию <csv_file>.progress)')
 
     def handle(self, *args, **kwargs):
         csv_file = kwargs['csv_file']
+        if kwargs['bulk']:
+            self.bulk_import(csv_file, kwargs['chunk_size'], kwargs['resume'], kwargs['checkpoint'])
+            return
         with open(csv_file, newline='', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 supplier_username = row.get('supplier_username')
                 user, created = User.objects.get_or_create(username=supplier_username, defaults={'role': 'supplier'})
                 supplier, _ = Supplier.objects.get_or_create(user=user, defaults={'company_name': row.get('supplier_name', 'Неизвестно')})
-                Product.objects.create(
+                # Повторный импорт того же файла обновляет товары, а не нарушает unique_product_per_supplier
+                Product.objects.update_or_create(
                     supplier=supplier,
                     name=row.get('name'),
-                    description=row.get('description', ''),
-                    price=row.get('price'),
-                    custom_fields={'category': row.get('category', '')}
+                    defaults={
+                        'description': row.get('description', ''),
+                        'price': row.get('price'),
+                        'custom_fields': {'category': row.get('category', '')},
+                        # Путь относительно MEDIA_ROOT; превью генерирует задача из orders.signals
+                        'image': row.get('image') or None,
+                    },
                 )
         self.stdout.write(self.style.SUCCESS('Импорт товаров завершен'))
+
+    def bulk_import(self, csv_file, chunk_size, resume, checkpoint):
+        if chunk_size < 1:
+            raise CommandError('--chunk-size должен быть положительным числом')
+        checkpoint = Path(checkpoint or f'{csv_file}.progress')
+        done = 0
+        if resume and checkpoint.exists():
+            done = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f'Продолжение импорта со строки {done + 1}')
+
+        # username -> supplier_id, общий для всех порций файла
+        suppliers = {}
+        started = time.monotonic()
+        imported = 0
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = islice(reader, done, None)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    self.resolve_suppliers(chunk, suppliers)
+                    new_images = self.upsert_products(chunk, suppliers)
+                # bulk_create не отправляет сигналы — кэш каталога сбрасывается явно,
+                # а превью новых изображений ставятся в очередь одной задачей на порцию
+                invalidate_product_cache()
+                if new_images:
+                    self.enqueue_renditions(new_images)
+                # Контрольная точка пишется только после коммита порции;
+                # повтор порции безопасен, так как запись идет через upsert
+                done += len(chunk)
+                imported += len(chunk)
+                checkpoint.write_text(str(done))
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'Обработано строк: {done} ({imported / elapsed:.0f} строк/с)')
+
+        checkpoint.unlink(missing_ok=True)
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт товаров завершен: {imported} строк за {elapsed:.1f} с ({rate:.0f} строк/с)'
+        ))
+
+    def enqueue_renditions(self, product_ids):
+        """
+        Ставит превью порции в очередь. Недоступность брокера не прерывает импорт:
+        порция уже закоммичена, а товары остаются с image_renditions_ready=False,
+        поэтому их подберет manage.py warm_product_images.
+        """
+        try:
+            warm_product_renditions.delay(product_ids)
+        except Exception as exc:
+            self.stderr.write(self.style.WARNING(
+                f'Не удалось поставить в очередь превью {len(product_ids)} товаров ({exc}); '
+                f'запустите manage.py warm_product_images'
+            ))
+
+    def resolve_suppliers(self, chunk, suppliers):
+        """
+        Находит или создает пользователей и поставщиков для новых username порции
+        несколькими запросами на всю порцию вместо get_or_create на каждую строку.
+        """
+        missing = {}
+        for row in chunk:
+            username = row.get('supplier_username')
+            if username not in suppliers and username not in missing:
+                missing[username] = row.get('supplier_name') or 'Неизвестно'
+        if not missing:
+            return
+
+        users = dict(User.objects.filter(username__in=missing).values_list('username', 'id'))
+        new_users = [User(username=username, role='supplier') for username in missing if username not in users]
+        if new_users:
+            User.objects.bulk_create(new_users, ignore_conflicts=True)
+            users = dict(User.objects.filter(username__in=missing).values_list('username', 'id'))
+
+        user_ids = list(users.values())
+        existing = dict(Supplier.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+        new_suppliers = [
+            Supplier(user_id=user_id, company_name=missing[username])
+            for username, user_id in users.items() if user_id not in existing
+        ]
+        if new_suppliers:
+            Supplier.objects.bulk_create(new_suppliers, ignore_conflicts=True)
+            existing = dict(Supplier.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+
+        for username, user_id in users.items():
+            suppliers[username] = existing[user_id]
+
+    def upsert_products(self, chunk, suppliers):
+        """Upsert порции товаров. Возвращает id товаров, у которых сменилось изображение."""
+        with_images = 'image' in chunk[0]
+        # Дубликаты (поставщик, название) внутри порции схлопываются: побеждает последняя строка
+        products = {}
+        for row in chunk:
+            supplier_id = suppliers[row.get('supplier_username')]
+            custom_fields = {'category': row.get('category', '')}
+            product = Product(
+                supplier_id=supplier_id,
+                name=row.get('name'),
+                description=row.get('description', ''),
+                price=row.get('price'),
+                custom_fields=custom_fields,
+                # bulk_create не вызывает save(), поэтому категория заполняется здесь
+                category=Product.category_from_custom_fields(custom_fields),
+            )
+            if with_images:
+                product.image = row.get('image') or None
+            products[(supplier_id, row.get('name'))] = product
+
+        update_fields = ['description', 'price', 'custom_fields', 'category', 'updated_at']
+        changed = []
+        if with_images:
+            update_fields += ['image', 'image_renditions_ready']
+            existing = {
+                (supplier_id, name): (image or '', ready)
+                for supplier_id, name, image, ready in Product.objects.filter(
+                    supplier_id__in={key[0] for key in products}, name__in={key[1] for key in products},
+                ).values_list('supplier_id', 'name', 'image', 'image_renditions_ready')
+            }
+            for key, product in products.items():
+                image, ready = existing.get(key, (None, False))
+                # Готовность превью сохраняется, только если изображение осталось прежним
+                product.image_renditions_ready = ready and image == product.image.name
+                if product.image and not product.image_renditions_ready:
+                    changed.append(product)
+
+        Product.objects.bulk_create(
+            products.values(),
+            update_conflicts=True,
+            unique_fields=['supplier', 'name'],
+            update_fields=update_fields,
+        )
+        return [product.pk for product in changed]
@@ -0,0 +1,25 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from orders.analytics import rebuild_sales_rollups
+
+class Command(BaseCommand):
+    help = 'Пересборка дневных агрегатов продаж (аналитики поставщиков), полностью или начиная с даты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str, default=None,
+                            help='Пересчитать дни начиная с YYYY-MM-DD (по умолчанию — всю историю)')
+
+    def handle(self, *args, **kwargs):
+        since = kwargs['since']
+        if since is not None:
+            try:
+                since = date.fromisoformat(since)
+            except ValueError:
+                raise CommandError('--since должен быть в формате YYYY-MM-DD')
+
+        started = time.monotonic()
+        rows = rebuild_sales_rollups(since)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересборка завершена: строк агрегатов {rows} за {time.monotonic() - started:.1f} с'
+        ))
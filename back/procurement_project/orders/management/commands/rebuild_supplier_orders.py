@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from orders.models import Order
+from orders.services import refresh_supplier_orders
+
+class Command(BaseCommand):
+    help = 'Пересборка таблицы связей заказов с поставщиками (ленты заказов поставщиков)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество заказов в одной транзакции')
+
+    def handle(self, *args, **kwargs):
+        chunk_size = kwargs['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size должен быть положительным числом')
+
+        started = time.monotonic()
+        orders, links, last_id = 0, 0, 0
+        while True:
+            ids = list(Order.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            links += refresh_supplier_orders(ids)
+            orders += len(ids)
+            last_id = ids[-1]
+            self.stdout.write(f'Обработано заказов: {orders}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересборка завершена: заказов {orders}, связей {links} за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,156 @@
+import os
+import time
+from datetime import datetime, timezone
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from orders.analytics import rebuild_sales_rollups
+from orders.cache import invalidate_product_cache
+from orders.search import drop_product_fts, install_product_fts
+from orders.seeding import COLUMNS, PRESETS, Plan, Scale, generate
+
+# Модели, первые свободные id которых нужны плану (остальные id назначает СУБД);
+# архивные заказы сохраняют id, поэтому новые id заказов идут и после них
+BASE_MODELS = {
+    'user_base': ('orders.User',),
+    'supplier_base': ('orders.Supplier',),
+    'product_base': ('orders.Product',),
+    'order_base': ('orders.Order', 'orders.ArchivedOrder'),
+    'cart_base': ('orders.Cart',),
+}
+
+class Command(BaseCommand):
+    help = (
+        'Наполнение базы синтетическими поставщиками, товарами, заказами и корзинами '
+        'с реалистичным перекосом распределений; результат детерминирован для --seed и --until'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=sorted(PRESETS), default='small', help='Масштаб данных')
+        for name in Scale.__dataclass_fields__:
+            parser.add_argument(f'--{name}', type=int, default=None, help='Переопределить значение пресета')
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора')
+        parser.add_argument('--days', type=int, default=365, help='Длина истории заказов в днях')
+        parser.add_argument('--until', type=str, default=None,
+                            help='Дата конца истории заказов YYYY-MM-DD (по умолчанию сегодня)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Процессов генерации (вставка идет в одном соединении)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Псевдоним базы данных')
+
+    def handle(self, *args, **kwargs):
+        connection = connections[kwargs['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('seed поддерживает только SQLite')
+        scale = PRESETS[kwargs['preset']]
+        overrides = {name: kwargs[name] for name in Scale.__dataclass_fields__ if kwargs[name] is not None}
+        scale = Scale(**{**scale.__dict__, **overrides})
+        if kwargs['workers'] < 1 or kwargs['days'] < 1 or min(scale.__dict__.values()) < 0:
+            raise CommandError('--workers и --days должны быть положительными, размеры — неотрицательными')
+        if (scale.products or scale.orders or scale.carts) and not (scale.suppliers and scale.customers):
+            raise CommandError('Для товаров, заказов и корзин нужны хотя бы один поставщик и один покупатель')
+
+        plan = Plan(
+            scale=scale, seed=kwargs['seed'], until=self.until(kwargs['until']), days=kwargs['days'],
+            **{name: self.next_id(labels, kwargs['database']) for name, labels in BASE_MODELS.items()},
+        )
+        started = time.monotonic()
+        counts, loaded = self.load(connection, plan, kwargs['workers'])
+        loaded -= started
+        if counts['orders.Order']:
+            # Агрегаты аналитики поддерживаются приращениями, которые прямая вставка обходит
+            self.stdout.write('Пересборка агрегатов продаж...')
+            rebuild_sales_rollups(using=kwargs['database'])
+        invalidate_product_cache()
+
+        total = sum(counts.values())
+        for label, count in counts.items():
+            self.stdout.write(f'  {label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {total} за {loaded:.1f} с ({total / max(loaded, 1e-9):,.0f} строк/с), '
+            f'всего {time.monotonic() - started:.1f} с'
+        ))
+
+    def until(self, value):
+        if value is None:
+            today = datetime.now(timezone.utc).date()
+        else:
+            try:
+                today = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--until должен быть в формате YYYY-MM-DD')
+        return datetime(today.year, today.month, today.day, tzinfo=timezone.utc).timestamp()
+
+    def next_id(self, labels, using):
+        return max(
+            apps.get_model(label).objects.using(using).aggregate(last=Max('id'))['last'] or 0 for label in labels
+        ) + 1
+
+    def load(self, connection, plan, workers):
+        """
+        Вставляет сгенерированные порции одной транзакцией через executemany
+        драйвера (без обертки курсора Django). Проверка внешних ключей откладывается
+        до конца загрузки (как в loaddata); индексы, в том числе уникальные, удаляются
+        и строятся заново после вставки — заодно проверяя уникальность; триггеры FTS
+        снимаются; журнал и fsync на время загрузки отключаются.
+        """
+        statements = {label: self.insert_sql(connection, label) for label in COLUMNS}
+        tables = [apps.get_model(label)._meta.db_table for label in COLUMNS]
+        counts = dict.fromkeys(COLUMNS, 0)
+        pragmas = self.fast_pragmas(connection)
+        # Триггеры FTS обновляли бы индекс построчно; после загрузки он перестраивается целиком
+        drop_product_fts(connection.alias)
+        try:
+            with connection.constraint_checks_disabled(), transaction.atomic(using=connection.alias):
+                cursor = connection.connection.cursor()
+                indexes = self.drop_indexes(cursor, tables)
+                for chunk in generate(plan, workers):
+                    for label, rows in chunk.items():
+                        if rows:
+                            cursor.executemany(statements[label], rows)
+                            counts[label] += len(rows)
+                    self.stdout.write(f'Вставлено строк: {sum(counts.values())}')
+                self.stdout.write(f'Построение индексов: {len(indexes)}...')
+                for sql in indexes:
+                    cursor.execute(sql)
+                self.stdout.write('Проверка внешних ключей...')
+                connection.check_constraints(table_names=tables)
+            loaded = time.monotonic()
+        finally:
+            with connection.cursor() as cursor:
+                for name, value in pragmas.items():
+                    cursor.execute(f'PRAGMA {name} = {value}')
+            self.stdout.write('Перестроение полнотекстового индекса товаров...')
+            install_product_fts(connection.alias, rebuild=True)
+        return counts, loaded
+
+    def insert_sql(self, connection, label):
+        model = apps.get_model(label)
+        columns = {field.attname: field.column for field in model._meta.concrete_fields}
+        quote = connection.ops.quote_name
+        names = ', '.join(quote(columns[name]) for name in COLUMNS[label])
+        # Запрос идет в драйвер sqlite3 напрямую, поэтому параметры в его формате
+        placeholders = ', '.join(['?'] * len(COLUMNS[label]))
+        return f'INSERT INTO {quote(model._meta.db_table)} ({names}) VALUES ({placeholders})'
+
+    def drop_indexes(self, cursor, tables):
+        """Удаляет индексы таблиц (откатится вместе с транзакцией), возвращает их CREATE INDEX."""
+        placeholders = ', '.join(['?'] * len(tables))
+        indexes = cursor.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+            f"AND tbl_name IN ({placeholders})", tables,
+        ).fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+        return [sql for _, sql in indexes]
+
+    def fast_pragmas(self, connection):
+        """Отключает fsync и журнал на диске, возвращает прежние значения для восстановления."""
+        if connection.in_atomic_block:
+            # Внутри внешней транзакции (call_command из кода, тесты) SQLite их не меняет
+            return {}
+        with connection.cursor() as cursor:
+            saved = {name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in ('synchronous', 'journal_mode')}
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute('PRAGMA journal_mode = MEMORY')
+        return saved
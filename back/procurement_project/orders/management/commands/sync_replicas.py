@@ -0,0 +1,39 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def sqlite_path(alias):
+    # Реплики открываются по URI file:<путь>?mode=ro
+    name = str(connections[alias].settings_dict['NAME'])
+    return name.removeprefix('file:').split('?')[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирование основной SQLite-базы в файлы реплик (settings.REPLICA_DATABASES) '
+        'онлайн-бэкапом: локальная замена репликации; запуск по расписанию имитирует отставание'
+    )
+
+    def handle(self, *args, **kwargs):
+        replicas = getattr(settings, 'REPLICA_DATABASES', [])
+        if not replicas:
+            raise CommandError('Реплики не настроены: задайте DATABASE_REPLICAS')
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('sync_replicas работает только с SQLite')
+
+        source = sqlite3.connect(sqlite_path(DEFAULT_DB_ALIAS))
+        try:
+            for alias in replicas:
+                started = time.monotonic()
+                target = sqlite3.connect(sqlite_path(alias))
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: обновлена за {time.monotonic() - started:.2f} с')
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS(f'Реплик обновлено: {len(replicas)}'))
@@ -0,0 +1,63 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from orders.images import warm_product_images
+from orders.models import Product
+from orders.tasks import warm_product_renditions
+
+class Command(BaseCommand):
+    help = 'Генерация превью изображений для товаров каталога, у которых их еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Количество товаров в одной задаче')
+        parser.add_argument('--workers', type=int, default=4, help='Число параллельных потоков (режим --sync)')
+        parser.add_argument('--sync', action='store_true',
+                            help='Генерировать в этом процессе, а не ставить задачи в очередь Celery')
+        parser.add_argument('--all', action='store_true', help='Перегенерировать превью и для готовых товаров')
+
+    def handle(self, *args, **kwargs):
+        batch_size, workers = kwargs['batch_size'], kwargs['workers']
+        if batch_size < 1 or workers < 1:
+            raise CommandError('--batch-size и --workers должны быть положительными числами')
+
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not kwargs['all']:
+            products = products.filter(image_renditions_ready=False)
+        ids = list(products.order_by('id').values_list('id', flat=True))
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+
+        if not kwargs['sync']:
+            for batch in batches:
+                warm_product_renditions.delay(batch)
+            self.stdout.write(self.style.SUCCESS(
+                f'Поставлено задач: {len(batches)} (товаров: {len(ids)})'
+            ))
+            return
+
+        started = time.monotonic()
+        warmed, failed = 0, []
+        for batch_warmed, batch_failed in self.warm_batches(batches, workers):
+            warmed += batch_warmed
+            failed += batch_failed
+        elapsed = time.monotonic() - started
+        for image in failed:
+            self.stderr.write(self.style.WARNING(f'Не удалось обработать изображение: {image}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Превью сгенерированы: товаров {len(ids)}, превью {warmed}, ошибок {len(failed)} за {elapsed:.1f} с'
+        ))
+
+    def warm_batches(self, batches, workers):
+        if workers == 1:
+            # Без потоков: текущее соединение с БД, удобно для отладки и тестов
+            yield from map(warm_product_images, batches)
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(self.warm_batch, batches)
+
+    def warm_batch(self, batch):
+        # У каждого потока свое соединение с БД — закрываем его по завершении пачки
+        try:
+            return warm_product_images(batch)
+        finally:
+            connections.close_all()
@@ -0,0 +1,95 @@
+"""
+Гистограммы запросов в памяти процесса и их выдача в текстовом формате Prometheus.
+
+Значения копятся отдельно в каждом процессе: при нескольких воркерах gunicorn
+Prometheus должен опрашивать каждый воркер (или сервис запускается одним процессом).
+"""
+import bisect
+import threading
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Счетчики по корзинам (последняя — +Inf), сумма и число наблюдений
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, [list(counts), total, count]) for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, number in zip((*map(_format_number, self.buckets), '+Inf'), counts):
+                cumulative += number
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, labels)} {_format_number(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, labels)} {count}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса',
+    ['view', 'method', 'status'], DURATION_BUCKETS,
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Суммарное время SQL-запросов за запрос',
+    ['view'], DURATION_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Число SQL-запросов за запрос',
+    ['view'], QUERY_BUCKETS,
+)
+SERIALIZE_DURATION = Histogram(
+    'http_request_serialize_duration_seconds', 'Время сериализации ответа',
+    ['view'], DURATION_BUCKETS,
+)
+
+REGISTRY = [REQUEST_DURATION, DB_DURATION, DB_QUERIES, SERIALIZE_DURATION]
+
+
+def observe_request(view, method, status, total, stats):
+    REQUEST_DURATION.observe(total, view, method, str(status))
+    DB_DURATION.observe(stats.query_time, view)
+    DB_QUERIES.observe(stats.queries, view)
+    if 'serialize' in stats.timings:
+        SERIALIZE_DURATION.observe(stats.timings['serialize'], view)
+
+
+def render_metrics():
+    return '\n'.join(line for metric in REGISTRY for line in metric.collect()) + '\n'
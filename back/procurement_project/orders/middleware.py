@@ -0,0 +1,92 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .db_routing import begin_request, end_request, mark_sticky, replica_databases
+from .instrumentation import collect_request_stats
+from .metrics import observe_request
+
+
+class ServerTimingMiddleware:
+    """
+    Число и время SQL-запросов, время сериализации и общее время каждого запроса:
+    в заголовке Server-Timing (видно во вкладке Network браузера) и в гистограммах
+    по имени представления для /metrics. Ставится первым в MIDDLEWARE, чтобы
+    общее время включало остальные middleware. Для потоковых ответов учитывается
+    время до первого байта.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with collect_request_stats() as stats:
+            response = self.get_response(request)
+        self.finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with collect_request_stats() as stats:
+            response = await self.get_response(request)
+        self.finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def finish(self, request, response, stats, total):
+        match = request.resolver_match
+        # Имя маршрута, а не путь: число серий в метриках не растет с числом id
+        view = match.view_name if match else 'unmatched'
+        observe_request(view, request.method, response.status_code, total, stats)
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = server_timing(stats, total)
+
+
+def server_timing(stats, total):
+    parts = [f'db;dur={stats.query_time * 1000:.2f};desc="{stats.queries} queries"']
+    parts += [f'{name};dur={duration * 1000:.2f}' for name, duration in stats.timings.items()]
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Состояние маршрутизации чтения на реплики на время запроса (orders.db_routing).
+    Если запрос что-то записал, клиент закрепляется за основной базой на
+    REPLICA_STICKY_SECONDS. Ставится после AuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        state, token = begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, state)
+
+    def finish(self, request, response, state):
+        if state.wrote and replica_databases():
+            mark_sticky(request, response)
+        return response
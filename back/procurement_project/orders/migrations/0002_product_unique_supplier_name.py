@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:37
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_products(apps, schema_editor):
+    # Повторный импорт без --bulk создавал товары с тем же (поставщик, название).
+    # Старейший товар сохраняет название, остальные получают суффикс с id:
+    # на них могут ссылаться позиции заказов и корзин, поэтому они не удаляются
+    Product = apps.get_model('orders', 'Product')
+    db = schema_editor.connection.alias
+    duplicates = (
+        Product.objects.using(db).values('supplier_id', 'name')
+        .annotate(count=Count('id')).filter(count__gt=1).order_by()
+    )
+    for group in duplicates.iterator():
+        products = Product.objects.using(db).filter(supplier_id=group['supplier_id'], name=group['name']).order_by('id')
+        for product in products[1:]:
+            suffix = f' (#{product.id})'
+            product.name = product.name[:255 - len(suffix)] + suffix
+            product.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_products, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('supplier', 'name'), name='unique_product_per_supplier'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+from orders.search import drop_product_fts, install_product_fts
+
+
+def fill_category(apps, schema_editor):
+    Product = apps.get_model('orders', 'Product')
+    products = []
+    for product in Product.objects.using(schema_editor.connection.alias).only('id', 'custom_fields').iterator():
+        custom_fields = product.custom_fields if isinstance(product.custom_fields, dict) else {}
+        product.category = str(custom_fields.get('category') or '')[:255]
+        products.append(product)
+    Product.objects.using(schema_editor.connection.alias).bulk_update(products, ['category'], batch_size=1000)
+
+
+def create_fts(apps, schema_editor):
+    install_product_fts(schema_editor.connection.alias, rebuild=True)
+
+
+def remove_fts(apps, schema_editor):
+    drop_product_fts(schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_order_created_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='category',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['supplier', 'price'], name='product_supplier_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.RunPython(fill_category, migrations.RunPython.noop),
+        migrations.RunPython(create_fts, remove_fts),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:45
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_duplicate_cart_items(apps, schema_editor):
+    CartItem = apps.get_model('orders', 'CartItem')
+    items = CartItem.objects.using(schema_editor.connection.alias)
+    duplicates = (
+        items.values('cart_id', 'product_id')
+        .annotate(rows=Count('id'), total=Sum('quantity'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        rows = items.filter(cart_id=duplicate['cart_id'], product_id=duplicate['product_id']).order_by('id')
+        keep = rows.first()
+        rows.exclude(id=keep.id).delete()
+        items.filter(id=keep.id).update(quantity=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_product_category_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
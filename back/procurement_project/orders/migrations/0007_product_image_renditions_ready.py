@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_product_order_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_renditions_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+
+
+def fill_supplier_orders(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    SupplierOrder = apps.get_model('orders', 'SupplierOrder')
+    db = schema_editor.connection.alias
+    rows = (
+        OrderItem.objects.using(db)
+        .values('order_id', 'product__supplier_id')
+        .annotate(
+            created_at=Max('order__created_at'),
+            item_count=Count('id'),
+            quantity_sum=Sum('quantity'),
+            total=Sum(ExpressionWrapper(
+                F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2),
+            )),
+        )
+        .order_by()
+    )
+    SupplierOrder.objects.using(db).bulk_create((
+        SupplierOrder(
+            order_id=row['order_id'], supplier_id=row['product__supplier_id'], created_at=row['created_at'],
+            item_count=row['item_count'], quantity=row['quantity_sum'], total=row['total'],
+        )
+        for row in rows.iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_product_image_renditions_ready'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_links', to='orders.order')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_links', to='orders.supplier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['supplier', '-created_at', '-order'], name='supplier_order_feed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('order', 'supplier'), name='unique_supplier_order')],
+            },
+        ),
+        migrations.RunPython(fill_supplier_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:43
+
+import django.db.models.deletion
+from collections import defaultdict
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def fill_sales_rollups(apps, schema_editor):
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    ArchivedOrder = apps.get_model('orders', 'ArchivedOrder')
+    Product = apps.get_model('orders', 'Product')
+    SalesRollup = apps.get_model('orders', 'SalesRollup')
+    db = schema_editor.connection.alias
+    totals = defaultdict(lambda: [None, 0, Decimal(0)])
+    rows = (
+        OrderItem.objects.using(db)
+        .values('product_id', 'product__supplier_id', 'order__status', day=TruncDate('order__created_at'))
+        .annotate(units=Sum('quantity'), revenue=Sum(ExpressionWrapper(
+            F('quantity') * F('product__price'), output_field=DecimalField(max_digits=14, decimal_places=2),
+        )))
+        .order_by()
+    )
+    for row in rows.iterator():
+        total = totals[row['product_id'], row['day'], row['order__status']]
+        total[0] = row['product__supplier_id']
+        total[1] += row['units']
+        total[2] += row['revenue']
+    products = {
+        product_id: (supplier_id, price)
+        for product_id, supplier_id, price in Product.objects.using(db).values_list('id', 'supplier_id', 'price')
+    }
+    for order in ArchivedOrder.objects.using(db).values('created_at', 'status', 'items').iterator():
+        day = timezone.localdate(order['created_at'])
+        for _, product_id, quantity in order['items']:
+            if product_id in products:
+                supplier_id, price = products[product_id]
+                total = totals[product_id, day, order['status']]
+                total[0] = supplier_id
+                total[1] += quantity
+                total[2] += quantity * price
+    SalesRollup.objects.using(db).bulk_create((
+        SalesRollup(supplier_id=supplier_id, product_id=product_id, day=day, status=status, units=units, revenue=revenue)
+        for (product_id, day, status), (supplier_id, units, revenue) in totals.items()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_archivedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('confirmed', 'Подтвержден'), ('shipped', 'Отгружен'), ('delivered', 'Доставлен')], max_length=10)),
+                ('units', models.BigIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='orders.product')),
+                ('supplier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='orders.supplier')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['supplier', 'day'], name='sales_rollup_supplier_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day', 'status'), name='unique_sales_rollup')],
+            },
+        ),
+        migrations.RunPython(fill_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_prices_and_totals(apps, schema_editor):
+    # Цены на момент заказа неизвестны: позиции получают текущие цены товаров
+    Product = apps.get_model('orders', 'Product')
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    ArchivedOrder = apps.get_model('orders', 'ArchivedOrder')
+    db = schema_editor.connection.alias
+    OrderItem.objects.using(db).update(
+        unit_price=Subquery(Product.objects.using(db).filter(pk=OuterRef('product_id')).values('price')),
+    )
+    items = OrderItem.objects.using(db).filter(order_id=OuterRef('pk')).order_by().values('order_id')
+    money = DecimalField(max_digits=12, decimal_places=2)
+    Order.objects.using(db).update(
+        total=Coalesce(
+            Subquery(items.annotate(total=Sum(ExpressionWrapper(F('quantity') * F('unit_price'), output_field=money)))
+                     .values('total')),
+            Value(Decimal(0)), output_field=money,
+        ),
+        item_count=Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), 0),
+    )
+
+    prices = dict(Product.objects.using(db).values_list('id', 'price'))
+    archived = []
+    for order in ArchivedOrder.objects.using(db).only('id', 'items').iterator():
+        # Позиции удаленных товаров сохраняются с нулевой ценой
+        order.items = [
+            [item_id, product_id, quantity, f'{prices.get(product_id, Decimal(0)):.2f}']
+            for item_id, product_id, quantity in order.items
+        ]
+        order.total = sum((quantity * Decimal(price) for _, _, quantity, price in order.items), Decimal(0))
+        order.item_count = len(order.items)
+        archived.append(order)
+        if len(archived) == 1000:
+            ArchivedOrder.objects.using(db).bulk_update(archived, ['items', 'total', 'item_count'])
+            archived = []
+    ArchivedOrder.objects.using(db).bulk_update(archived, ['items', 'total', 'item_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='unit_price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='archivedorder',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_prices_and_totals, migrations.RunPython.noop),
+    ]
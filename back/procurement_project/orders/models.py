@@ -22,11 +22,62 @@ class Product(models.Model):
     description = models.TextField(blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     custom_fields = models.JSONField(blank=True, null=True)
+    # Категория, вынесенная из custom_fields в отдельную колонку ради индексов
+    category = models.CharField(max_length=255, blank=True, editable=False)
     image = VersatileImageField(upload_to='product_images/', blank=True, null=True)
+    # Превью из набора 'product_image' сгенерированы фоновой задачей для текущего image
+    image_renditions_ready = models.BooleanField(default=False, editable=False)
+    # Время последнего изменения — основа ETag/Last-Modified для каталога
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            # Повторный импорт прайс-листа обновляет товар, а не создает дубликат
+            models.UniqueConstraint(fields=['supplier', 'name'], name='unique_product_per_supplier'),
+        ]
+        indexes = [
+            models.Index(fields=['supplier', 'price'], name='product_supplier_price_idx'),
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @staticmethod
+    def category_from_custom_fields(custom_fields):
+        if not isinstance(custom_fields, dict):
+            return ''
+        return str(custom_fields.get('category') or '')[:255]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженное изображение, чтобы save() заметил его замену
+        if 'image' in instance.__dict__:
+            instance._loaded_image = instance.image.name
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.category = self.category_from_custom_fields(self.custom_fields)
+        update_fields = kwargs.get('update_fields')
+        if hasattr(self, '_loaded_image'):
+            self.image_changed = self.image.name != self._loaded_image
+        else:
+            self.image_changed = self._state.adding
+        if update_fields is not None and 'image' not in update_fields:
+            self.image_changed = False
+        if self.image_changed:
+            # Превью для нового изображения еще не готовы (см. orders.signals)
+            self.image_renditions_ready = False
+        if update_fields is not None:
+            extra_fields = {'category'} if 'custom_fields' in update_fields else set()
+            if self.image_changed:
+                extra_fields.add('image_renditions_ready')
+            kwargs['update_fields'] = {*update_fields, *extra_fields}
+        super().save(*args, **kwargs)
+        self._loaded_image = self.image.name
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Ожидает'),
@@ -34,10 +85,30 @@ class Order(models.Model):
         ('shipped', 'Отгружен'),
         ('delivered', 'Доставлен'),
     )
+    # Допустимые переходы статуса (orders.services): заказ движется только вперед
+    TRANSITIONS = {
+        'pending': ('confirmed', 'shipped', 'delivered'),
+        'confirmed': ('shipped', 'delivered'),
+        'shipped': ('delivered',),
+        'delivered': (),
+    }
     customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     delivery_address = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Сумма по ценам позиций на момент заказа и число позиций: списки и отчеты
+    # не обращаются к Product. Заполняются orders.services, при правке позиций —
+    # refresh_order_totals
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Курсорная пагинация списков заказов идет по created_at
+            models.Index(fields=['customer', '-created_at'], name='order_customer_created_idx'),
+            models.Index(fields=['-created_at'], name='order_created_idx'),
+        ]
 
     def __str__(self):
         return f"Заказ #{self.id} от {self.customer.username}"
@@ -46,10 +117,100 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField()
+    # Цена товара на момент заказа: последующие изменения Product.price заказ не меняют
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def save(self, *args, **kwargs):
+        # Позиция, добавленная в обход orders.services (например, из админки), получает текущую цену
+        if self.unit_price is None:
+            self.unit_price = self.product.price
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+class SupplierOrder(models.Model):
+    """
+    Денормализованная связь заказа с поставщиком его товаров: по строке на пару
+    (заказ, поставщик) с числом позиций и суммой. Лента заказов поставщика читается
+    диапазоном по индексу (supplier, created_at) без join по позициям и DISTINCT.
+    Поддерживается orders.services; пересобирается командой rebuild_supplier_orders.
+    """
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='order_links')
+    # Без внешнего ключа в БД: связь переживает перенос заказа в ArchivedOrder,
+    # а при удалении заказа строки удаляет сигнал (orders.signals)
+    order = models.ForeignKey(
+        Order, on_delete=models.DO_NOTHING, db_constraint=False, related_name='supplier_links',
+    )
+    # Копия Order.created_at, чтобы сортировка ленты шла по индексу этой таблицы
+    created_at = models.DateTimeField()
+    item_count = models.PositiveIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'supplier'], name='unique_supplier_order'),
+        ]
+        indexes = [
+            models.Index(fields=['supplier', '-created_at', '-order'], name='supplier_order_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"Заказ #{self.order_id} для поставщика #{self.supplier_id}"
+
+class ArchivedOrder(models.Model):
+    """
+    Доставленный заказ, перенесенный из Order архивацией (orders.archive): одна
+    строка на заказ, позиции хранятся в ней же списком [id позиции, id товара, количество, цена]
+    (цена — строкой, как ее отдает DecimalField в JSON).
+    id совпадает с id исходного заказа, поэтому ссылки и URL заказа не меняются.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    delivery_address = models.CharField(max_length=255)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)
+    items = models.JSONField(default=list)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', '-created_at'], name='archived_customer_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Архивный заказ #{self.id}"
+
+class SalesRollup(models.Model):
+    """
+    Дневной агрегат продаж товара: единицы и выручка (по ценам позиций) по заказам, созданным в этот день
+    (по TIME_ZONE), с разбивкой по текущему статусу заказа. Поддерживается инкрементально
+    (orders.analytics) и пересобирается командой rebuild_sales_rollups; архивация заказов
+    его не меняет.
+    """
+    supplier = models.ForeignKey(Supplier, on_delete=models.CASCADE, related_name='sales_rollups')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_rollups')
+    day = models.DateField()
+    status = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    units = models.BigIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'day', 'status'], name='unique_sales_rollup'),
+        ]
+        indexes = [
+            # /api/analytics/ читает диапазон дней одного поставщика
+            models.Index(fields=['supplier', 'day'], name='sales_rollup_supplier_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Продажи товара #{self.product_id} за {self.day} ({self.status})"
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
 
@@ -57,3 +218,9 @@ class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            # Повторное добавление товара увеличивает количество, а не создает новую строку
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
@@ -0,0 +1,103 @@
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class BoundedCursorPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация: страница выбирается условием по индексированной
+    колонке, а не OFFSET, поэтому глубокие страницы стоят столько же, сколько первая,
+    а вставка новых строк не сдвигает уже выданные страницы.
+    Размер страницы задается ?page_size=, но не больше API_MAX_PAGE_SIZE.
+    """
+    page_size_query_param = 'page_size'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+
+
+class ProductCursorPagination(BoundedCursorPagination):
+    ordering = 'id'
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Async-вариант для orders.async_views: страница читается через aiterator().
+        Листание только вперед: id уникален, поэтому курсору достаточно позиции
+        без смещения, и курсоры совместимы с синхронным списком товаров.
+        """
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        queryset = queryset.order_by('id')
+        if cursor is not None:
+            if cursor.reverse or cursor.offset or not (cursor.position or '').isdigit():
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(id__gt=int(cursor.position))
+        page = [row async for row in queryset[:page_size + 1].aiterator()]
+        self.next_link = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            position = self._get_position_from_instance(page[-1], ['id'])
+            self.next_link = self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+        return page
+
+
+class OrderCursorPagination(BoundedCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class MergedOrderCursorPagination(OrderCursorPagination):
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Одна лента из нескольких источников заказов (оперативная таблица и архив)
+        в общем порядке (-created_at, -id). Позиция курсора — пара (created_at, id),
+        из каждого источника читается не больше страницы по его индексу, результаты сливаются.
+        """
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor.reverse
+        rows = []
+        for queryset in querysets:
+            if cursor is not None:
+                created_at, pk = self._parse_position(cursor)
+                if reverse:
+                    keyset = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                else:
+                    keyset = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                queryset = queryset.filter(keyset)
+            ordering = ('created_at', 'id') if reverse else ('-created_at', '-id')
+            rows.extend(queryset.order_by(*ordering)[:self.page_size + 1])
+        rows.sort(key=lambda row: (row.created_at, row.id), reverse=not reverse)
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        return self.page
+
+    def _parse_position(self, cursor):
+        try:
+            created_at, pk = (cursor.position or '').rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, row, reverse):
+        position = f'{row.created_at.isoformat()}|{row.id}'
+        return self.encode_cursor(Cursor(offset=0, reverse=reverse, position=position))
+
+    def get_next_link(self):
+        return self._link(self.page[-1], False) if self.has_next and self.page else None
+
+    def get_previous_link(self):
+        return self._link(self.page[0], True) if self.has_previous and self.page else None
+
+
+class SupplierOrderCursorPagination(BoundedCursorPagination):
+    # Лента поставщика листается по индексу supplier_order_feed_idx
+    ordering = ('-created_at', '-order_id')
@@ -0,0 +1,81 @@
+import re
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+PRODUCT_FTS_TABLE = 'orders_product_fts'
+
+# Внешний FTS5-индекс по name/description, синхронизируется триггерами,
+# поэтому покрывает и save(), и bulk_create/upsert при импорте.
+PRODUCT_FTS_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {PRODUCT_FTS_TABLE} USING fts5(
+        name, description, content='orders_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_ai AFTER INSERT ON orders_product BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_ad AFTER DELETE ON orders_product BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {PRODUCT_FTS_TABLE}_au AFTER UPDATE OF name, description ON orders_product BEGIN
+        INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {PRODUCT_FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+
+def fts_enabled(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def install_product_fts(using='default', rebuild=False):
+    """
+    Создает FTS5-таблицу и триггеры, если их нет.
+    Вызывается из миграции и после каждого migrate: SQLite пересоздает таблицу
+    orders_product при изменении схемы, и триггеры при этом теряются.
+    """
+    if not fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        for statement in PRODUCT_FTS_SQL:
+            cursor.execute(statement)
+        if rebuild:
+            cursor.execute(f"INSERT INTO {PRODUCT_FTS_TABLE}({PRODUCT_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_product_fts(using='default'):
+    if not fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {PRODUCT_FTS_TABLE}_{suffix}')
+        cursor.execute(f'DROP TABLE IF EXISTS {PRODUCT_FTS_TABLE}')
+
+
+def _fts_query(text):
+    # Каждое слово ищется как префикс; кавычки экранируются, операторы FTS5 не пропускаются
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset, text):
+    """Полнотекстовый поиск по name/description (FTS5 на SQLite, icontains на прочих СУБД)."""
+    if not fts_enabled(queryset.db):
+        return queryset.filter(Q(name__icontains=text) | Q(description__icontains=text))
+    query = _fts_query(text)
+    if not query:
+        return queryset
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {PRODUCT_FTS_TABLE} WHERE {PRODUCT_FTS_TABLE} MATCH %s', (query,)
+    ))
@@ -0,0 +1,299 @@
+"""
+Детерминированная генерация синтетических данных для manage.py seed.
+
+Модуль не обращается к БД и не импортирует модели: порции строк строятся
+чистыми функциями от (план, диапазон индексов) и могут считаться в отдельных
+процессах. Одинаковые seed и план дают одинаковые строки при любом числе
+процессов.
+
+Распределения с перекосом, как в реальных данных:
+- товары принадлежат поставщикам по закону Ципфа (несколько крупных, длинный хвост);
+- позиции заказов и корзин выбирают популярные товары чаще (Ципф по товарам);
+- число заказов покупателей — тоже Ципф: немного постоянных клиентов и много разовых;
+- поток заказов растет к концу периода, статус зависит от возраста заказа.
+"""
+import bisect
+import itertools
+import json
+import math
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from statistics import NormalDist
+
+_MASK = (1 << 64) - 1
+_EPOCH = datetime(1970, 1, 1)
+_NORMAL = NormalDist()
+
+# Колонки (attname) каждой таблицы в порядке значений в сгенерированных строках
+COLUMNS = {
+    'orders.User': (
+        'id', 'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name',
+        'email', 'is_staff', 'is_active', 'date_joined', 'role',
+    ),
+    'orders.Supplier': ('id', 'user_id', 'company_name'),
+    'orders.Product': (
+        'id', 'supplier_id', 'name', 'description', 'price', 'custom_fields', 'category',
+        'image', 'image_renditions_ready', 'updated_at',
+    ),
+    'orders.Order': (
+        'id', 'customer_id', 'status', 'delivery_address', 'created_at', 'updated_at', 'total', 'item_count',
+    ),
+    # id позиций, связей и строк корзины назначает СУБД: их число в порции заранее неизвестно
+    'orders.OrderItem': ('order_id', 'product_id', 'quantity', 'unit_price'),
+    'orders.SupplierOrder': ('supplier_id', 'order_id', 'created_at', 'item_count', 'quantity', 'total'),
+    'orders.Cart': ('id', 'user_id'),
+    'orders.CartItem': ('cart_id', 'product_id', 'quantity'),
+}
+
+CATEGORIES = [
+    'Канцелярия', 'Бумага', 'Хозтовары', 'Электроника', 'Мебель', 'Инструменты', 'Упаковка',
+    'Продукты', 'Напитки', 'Посуда', 'Текстиль', 'Освещение', 'Сантехника', 'Электрика',
+    'Крепеж', 'Краски', 'Спецодежда', 'Бытовая химия', 'Оргтехника', 'Расходные материалы',
+]
+WORDS = [
+    'стандарт', 'премиум', 'эконом', 'усиленный', 'компактный', 'профессиональный', 'набор',
+    'комплект', 'универсальный', 'белый', 'черный', 'большой', 'малый', 'прочный', 'легкий',
+]
+STREETS = ['Ленина', 'Мира', 'Садовая', 'Советская', 'Лесная', 'Заводская', 'Школьная', 'Новая']
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Екатеринбург', 'Новосибирск', 'Самара']
+QUANTITIES = [1, 2, 3, 5, 10]
+QUANTITY_WEIGHTS = list(itertools.accumulate([60, 20, 10, 7, 3]))
+# Значение JSONField так, как его сохраняет Django
+CATEGORY_JSON = {category: json.dumps({'category': category}) for category in CATEGORIES}
+
+# Строк в порции; от него зависят генераторы случайных чисел порций, поэтому он не настраивается
+CHUNK_SIZE = 20_000
+
+
+@dataclass(frozen=True)
+class Scale:
+    suppliers: int
+    customers: int
+    products: int
+    orders: int
+    carts: int
+
+
+PRESETS = {
+    'small': Scale(suppliers=20, customers=2_000, products=20_000, orders=50_000, carts=1_000),
+    'medium': Scale(suppliers=200, customers=50_000, products=500_000, orders=1_000_000, carts=20_000),
+    'large': Scale(suppliers=1_000, customers=500_000, products=2_000_000, orders=5_000_000, carts=100_000),
+}
+
+
+@dataclass(frozen=True)
+class Plan:
+    """Что генерировать: масштаб, seed, период заказов и первые свободные id таблиц."""
+    scale: Scale
+    seed: int
+    until: float  # конец периода заказов, секунды от эпохи (UTC)
+    days: int
+    user_base: int
+    supplier_base: int
+    product_base: int
+    order_base: int
+    cart_base: int
+
+    @property
+    def users(self):
+        return self.scale.suppliers + self.scale.customers
+
+
+def _mix(value):
+    # splitmix64: дешевое детерминированное перемешивание целого
+    value = (value + 0x9E3779B97F4A7C15) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+
+def _uniform(seed, salt, index):
+    """Число из [0, 1), зависящее только от (seed, salt, index)."""
+    return _mix(_mix(seed * 1_000_003 + salt) ^ index) / 2.0 ** 64
+
+
+def _rng(plan, salt, start):
+    return random.Random(_mix(_mix(plan.seed * 1_000_003 + salt) ^ start))
+
+
+@lru_cache(maxsize=8)
+def _zipf(n, exponent):
+    """Накопленные веса распределения Ципфа по рангам 0..n-1."""
+    return list(itertools.accumulate(1.0 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def _pick(cum_weights, u):
+    return bisect.bisect(cum_weights, u * cum_weights[-1])
+
+
+def _timestamp(seconds):
+    # Формат, в котором Django хранит DateTimeField в SQLite (UTC без зоны)
+    return str(_EPOCH + timedelta(seconds=round(seconds, 6)))
+
+
+def _money(cents):
+    return f'{cents // 100}.{cents % 100:02d}'
+
+
+def product_supplier(plan, index):
+    """Индекс поставщика товара: несколько крупных поставщиков держат большую часть каталога."""
+    return _pick(_zipf(plan.scale.suppliers, 1.1), _uniform(plan.seed, 1, index))
+
+
+def product_price_cents(plan, index):
+    # Логнормальная цена: медиана около 500 ₽, редкие позиции дороже 50 000 ₽
+    z = _NORMAL.inv_cdf(min(max(_uniform(plan.seed, 2, index), 1e-12), 1 - 1e-12))
+    return max(100, min(int(math.exp(math.log(50_000) + 1.3 * z)), 99_999_999))
+
+
+def product_category(plan, index):
+    return CATEGORIES[_pick(_zipf(len(CATEGORIES), 0.8), _uniform(plan.seed, 3, index))]
+
+
+def users_chunk(plan, start, stop):
+    rng = _rng(plan, 10, start)
+    joined_from = plan.until - plan.days * 86400 * 2
+    rows = []
+    for index in range(start, stop):
+        role = 'supplier' if index < plan.scale.suppliers else 'customer'
+        username = f'seed-{role}-{plan.user_base + index}'
+        rows.append((
+            plan.user_base + index, '!', None, False, username, '', '', f'{username}@example.com',
+            False, True, _timestamp(joined_from + rng.random() * plan.days * 86400), role,
+        ))
+    return {'orders.User': rows}
+
+
+def suppliers_chunk(plan, start, stop):
+    return {'orders.Supplier': [
+        (plan.supplier_base + index, plan.user_base + index, f'Поставщик {plan.supplier_base + index}')
+        for index in range(start, stop)
+    ]}
+
+
+def products_chunk(plan, start, stop):
+    rng = _rng(plan, 20, start)
+    updated = _timestamp(plan.until)
+    rows = []
+    for index in range(start, stop):
+        product_id = plan.product_base + index
+        category = product_category(plan, index)
+        words = rng.sample(WORDS, 3)
+        rows.append((
+            product_id, plan.supplier_base + product_supplier(plan, index),
+            f'{category} {words[0]} {product_id}', f'{category}: {" ".join(words)}',
+            _money(product_price_cents(plan, index)), CATEGORY_JSON[category], category,
+            None, False, updated,
+        ))
+    return {'orders.Product': rows}
+
+
+def _order_time(plan, index):
+    # Плотность заказов растет линейно к концу периода
+    share = math.sqrt((index + 0.5) / plan.scale.orders)
+    return plan.until - plan.days * 86400 * (1 - share)
+
+
+def _order_status(rng, age_days):
+    if age_days > 14:
+        return 'delivered'
+    if age_days > 7:
+        return 'delivered' if rng.random() < 0.7 else 'shipped'
+    if age_days > 2:
+        return rng.choice(('confirmed', 'shipped', 'shipped', 'delivered'))
+    return 'pending' if rng.random() < 0.6 else 'confirmed'
+
+
+def orders_chunk(plan, start, stop):
+    """Заказы с итогами, позиции с ценами и строки SupplierOrder (как их строит orders.services.create_order)."""
+    rng = _rng(plan, 30, start)
+    customers = _zipf(plan.scale.customers, 0.8)
+    products = _zipf(plan.scale.products, 0.9)
+    orders, items, links = [], [], []
+    # Популярные товары встречаются в порции много раз: поставщик и цена считаются один раз
+    known = {}
+    for index in range(start, stop):
+        order_id = plan.order_base + index
+        created = _order_time(plan, index)
+        status = _order_status(rng, (plan.until - created) / 86400)
+        updated = created if status == 'pending' else min(created + rng.random() * 7 * 86400, plan.until)
+        created_at = _timestamp(created)
+        customer = plan.user_base + plan.scale.suppliers + _pick(customers, rng.random())
+        address = f'г. {rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, д. {rng.randint(1, 120)}'
+        chosen = {_pick(products, rng.random()) for _ in range(1 + min(int(rng.expovariate(0.5)), 9))}
+        per_supplier = {}
+        for product in sorted(chosen):
+            quantity = QUANTITIES[bisect.bisect(QUANTITY_WEIGHTS, rng.random() * QUANTITY_WEIGHTS[-1])]
+            if product not in known:
+                known[product] = (product_supplier(plan, product), product_price_cents(plan, product))
+            supplier, price = known[product]
+            items.append((order_id, plan.product_base + product, quantity, _money(price)))
+            link = per_supplier.setdefault(supplier, [0, 0, 0])
+            link[0] += 1
+            link[1] += quantity
+            link[2] += quantity * price
+        order_total = sum(total for _, _, total in per_supplier.values())
+        orders.append((
+            order_id, customer, status, address, created_at, _timestamp(updated), _money(order_total), len(chosen),
+        ))
+        for supplier, (count, quantity, total) in sorted(per_supplier.items()):
+            links.append((plan.supplier_base + supplier, order_id, created_at, count, quantity, _money(total)))
+    return {'orders.Order': orders, 'orders.OrderItem': items, 'orders.SupplierOrder': links}
+
+
+def carts_chunk(plan, start, stop):
+    rng = _rng(plan, 40, start)
+    products = _zipf(plan.scale.products, 0.9)
+    # Корзины равномерно распределены по покупателям
+    step = max(plan.scale.customers // max(plan.scale.carts, 1), 1)
+    carts, items = [], []
+    for index in range(start, stop):
+        cart_id = plan.cart_base + index
+        carts.append((cart_id, plan.user_base + plan.scale.suppliers + index * step))
+        chosen = {_pick(products, rng.random()) for _ in range(rng.randint(1, 6))}
+        items.extend((cart_id, plan.product_base + product, rng.choice(QUANTITIES[:3])) for product in sorted(chosen))
+    return {'orders.Cart': carts, 'orders.CartItem': items}
+
+
+# Этапы в порядке вставки: (генератор, число строк этапа)
+STAGES = [
+    (users_chunk, lambda plan: plan.users),
+    (suppliers_chunk, lambda plan: plan.scale.suppliers),
+    (products_chunk, lambda plan: plan.scale.products),
+    (orders_chunk, lambda plan: plan.scale.orders),
+    (carts_chunk, lambda plan: min(plan.scale.carts, plan.scale.customers)),
+]
+
+
+def _run_chunk(task):
+    generator, plan, start, stop = task
+    return generator(plan, start, stop)
+
+
+def generate(plan, workers=1):
+    """
+    Порции строк {метка модели: [строки]} в порядке вставки.
+    При workers > 1 порции считаются в процессах; в памяти одновременно
+    не больше 2 * workers готовых порций.
+    """
+    tasks = [
+        (generator, plan, start, min(start + CHUNK_SIZE, total))
+        for generator, count in STAGES
+        for total in [count(plan)]
+        for start in range(0, total, CHUNK_SIZE)
+    ]
+    if workers == 1:
+        yield from map(_run_chunk, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_run_chunk, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
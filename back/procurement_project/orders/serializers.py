@@ -1,35 +1,257 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from operator import itemgetter
+from .images import product_rendition_urls
+from .instrumentation import timed
 from .models import Product, Order, OrderItem, Cart, CartItem
+from .services import create_order
 
 User = get_user_model()
 
-class ProductSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """
+    Время формирования .data учитывается как этап 'serialize' (orders.instrumentation).
+    Нужен только сериализаторам ответов верхнего уровня: у вложенных .data не вызывается.
+    """
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        # many=True: список замеряется так же, если Meta не задает свой list_serializer_class.
+        # TimedListSerializer не добавляет состояния, поэтому подмена класса безопасна
+        serializer = super().many_init(*args, **kwargs)
+        if type(serializer) is serializers.ListSerializer:
+            serializer.__class__ = TimedListSerializer
+        return serializer
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    image_renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = '__all__'
 
+    def get_image_renditions(self, product):
+        return product_rendition_urls(product.image, product.image_renditions_ready, self.context.get('request'))
+
+# Поля товара в том порядке, в котором их отдает ProductSerializer (fields = '__all__')
+PRODUCT_READ_FIELDS = (
+    'id', 'image_renditions', 'name', 'description', 'price', 'custom_fields', 'category',
+    'image', 'image_renditions_ready', 'updated_at', 'supplier',
+)
+
+# Колонки БД, из которых строятся вычисляемые поля
+PRODUCT_FIELD_COLUMNS = {'image_renditions': ('image', 'image_renditions_ready')}
+
+def parse_product_fields(params):
+    """Поля из ?fields=id,name,price; без параметра — все поля ProductSerializer."""
+    raw = params.get('fields')
+    if not raw:
+        return PRODUCT_READ_FIELDS
+    fields = [name for name in raw.split(',') if name]
+    unknown = [name for name in fields if name not in PRODUCT_READ_FIELDS]
+    if unknown or not fields:
+        raise serializers.ValidationError(
+            {'fields': f'Неизвестные поля: {", ".join(unknown)}' if unknown else 'Пустой список полей'}
+        )
+    return fields
+
+def product_columns(fields):
+    """Список колонок для .values() под выбранные поля; id нужен пагинации всегда."""
+    columns = ['id']
+    for name in fields:
+        for column in PRODUCT_FIELD_COLUMNS.get(name, (name,)):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+def _format_datetime(value):
+    # Как serializers.DateTimeField: текущая таймзона, UTC записывается как Z
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+def _format_decimal(value):
+    # Как serializers.DecimalField(decimal_places=2) с COERCE_DECIMAL_TO_STRING
+    return None if value is None else f'{value:.2f}'
+
+def product_row(product):
+    """Словарь полей товара (как из .values()) для экземпляра модели."""
+    return {
+        'id': product.id,
+        'supplier': product.supplier_id,
+        'name': product.name,
+        'description': product.description,
+        'price': product.price,
+        'custom_fields': product.custom_fields,
+        'category': product.category,
+        'image': product.image.name,
+        'image_renditions_ready': product.image_renditions_ready,
+        'updated_at': product.updated_at,
+    }
+
+class ProductReadSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    Быстрый read-only сериализатор товара для списков.
+    Принимает словари из .values() (или product_row) и формирует тот же JSON,
+    что ProductSerializer, без построения и обхода полей DRF на каждую строку.
+    Набор полей задается в context['fields'] (sparse fieldsets).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.request = self.context.get('request')
+        self.image_field = Product._meta.get_field('image')
+        getters = {
+            'price': lambda row: _format_decimal(row['price']),
+            'updated_at': lambda row: _format_datetime(row['updated_at']),
+            'image': lambda row: self.format_image(row['image']),
+            'image_renditions': self.format_renditions,
+        }
+        self.field_getters = [
+            (name, getters.get(name, itemgetter(name))) for name in self.context.get('fields') or PRODUCT_READ_FIELDS
+        ]
+
+    def format_image(self, name):
+        if not name:
+            return None
+        url = self.image_field.storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def format_renditions(self, row):
+        if not row['image'] or not row['image_renditions_ready']:
+            return None
+        image = self.image_field.attr_class(None, self.image_field, row['image'])
+        # Сайзеры (thumbnail и др.) создаются при установке точки интереса
+        image.ppoi = (0.5, 0.5)
+        return product_rendition_urls(image, True, self.request)
+
+    def to_representation(self, row):
+        return {name: getter(row) for name, getter in self.field_getters}
+
 class OrderItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), source='product', write_only=True)
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'product_id', 'quantity']
+        fields = ['id', 'product', 'product_id', 'quantity', 'unit_price']
+        # Цена фиксируется при создании заказа (orders.services.create_order)
+        read_only_fields = ['unit_price']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
     class Meta:
         model = Order
-        fields = ['id', 'customer', 'status', 'delivery_address', 'created_at', 'items']
+        fields = ['id', 'customer', 'status', 'delivery_address', 'created_at', 'total', 'item_count', 'items']
+        # Заказчик всегда берется из request.user в OrderCreateView; итоги считает create_order
+        read_only_fields = ['customer', 'total', 'item_count']
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
-        return order
+        return create_order(items=items_data, **validated_data)
+
+class OrderBatchItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+class OrderBatchEntrySerializer(serializers.Serializer):
+    """
+    Заказ в пакетной загрузке. В отличие от OrderItemSerializer товары здесь
+    не ищутся по одному: их существование проверяет validate_order_batch для всей пачки.
+    """
+    delivery_address = serializers.CharField(max_length=255)
+    items = OrderBatchItemSerializer(many=True, allow_empty=False)
+
+def validate_order_batch(rows):
+    """
+    Проверяет пачку заказов: структуру — OrderBatchEntrySerializer по каждому заказу,
+    существование товаров — одним запросом WHERE id IN (...) на всю пачку.
+    Возвращает (список (индекс, данные для services.create_orders), {индекс: ошибки}).
+    """
+    # Один экземпляр на всю пачку: создание сериализатора копирует поля и стоит дороже проверки
+    serializer = OrderBatchEntrySerializer()
+    entries, errors = [], {}
+    for index, row in enumerate(rows):
+        try:
+            entries.append((index, serializer.run_validation(row)))
+        except serializers.ValidationError as exc:
+            errors[index] = exc.detail
+    ids = {item['product_id'] for _, data in entries for item in data['items']}
+    # Для позиций и SupplierOrder нужны только поставщик и цена (она же фиксируется в позиции)
+    products = Product.objects.only('id', 'supplier_id', 'price').in_bulk(ids) if ids else {}
+    message = serializers.PrimaryKeyRelatedField.default_error_messages['does_not_exist']
+    orders = []
+    for index, data in entries:
+        missing = {
+            position: {'product_id': [message.format(pk_value=item['product_id'])]}
+            for position, item in enumerate(data['items'])
+            if item['product_id'] not in products
+        }
+        if missing:
+            errors[index] = {'items': missing}
+            continue
+        orders.append((index, {
+            'delivery_address': data['delivery_address'],
+            'items': [{'product': products[item['product_id']], 'quantity': item['quantity']} for item in data['items']],
+        }))
+    return orders, errors
+
+class OrderReadSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    """
+    Быстрый read-only сериализатор для списка заказов с предзагруженными позициями.
+    Формирует тот же JSON, что OrderSerializer.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.product_serializer = ProductReadSerializer(context=self.context)
+
+    def to_representation(self, order):
+        product_to_representation = self.product_serializer.to_representation
+        return {
+            'id': order.id,
+            'customer': order.customer_id,
+            'status': order.status,
+            'delivery_address': order.delivery_address,
+            'created_at': _format_datetime(order.created_at),
+            'total': _format_decimal(order.total),
+            'item_count': order.item_count,
+            'items': [
+                {
+                    'id': item.id,
+                    'product': product_to_representation(product_row(item.product)),
+                    'quantity': item.quantity,
+                    'unit_price': _format_decimal(item.unit_price),
+                }
+                for item in order.items.all()
+            ],
+        }
+
+class OrderStatusBulkSerializer(serializers.Serializer):
+    """Запрос массовой смены статуса: id заказов (не больше ORDER_BULK_STATUS_MAX_IDS) и новый статус."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
+    def validate_ids(self, ids):
+        limit = getattr(settings, 'ORDER_BULK_STATUS_MAX_IDS', 1000)
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > limit:
+            raise serializers.ValidationError(f'Не больше {limit} заказов за запрос')
+        return ids
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
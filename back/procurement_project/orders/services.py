@@ -0,0 +1,233 @@
+from django.db import IntegrityError, transaction
+from decimal import Decimal
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .analytics import record_orders_created, record_status_change
+from .models import Cart, CartItem, Order, OrderItem, SupplierOrder
+from .tasks import (
+    send_admin_notification_email, send_order_confirmation_email, send_orders_created_emails, send_status_update_emails,
+)
+
+# Максимум заказов в одной задаче рассылки о смене статуса
+STATUS_NOTIFICATION_BATCH_SIZE = 500
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+ITEM_TOTAL = ExpressionWrapper(F('quantity') * F('unit_price'), output_field=MONEY)
+
+
+def notify_order_created(order_id):
+    """
+    Ставит письма о новом заказе в очередь Celery после коммита транзакции.
+    robust=True: недоступность брокера логируется и не ломает уже созданный заказ.
+    """
+    transaction.on_commit(lambda: send_order_confirmation_email.delay(order_id), robust=True)
+    transaction.on_commit(lambda: send_admin_notification_email.delay(order_id), robust=True)
+
+
+def can_transition(source, target):
+    return target in Order.TRANSITIONS.get(source, ())
+
+
+def notify_orders_created(order_ids):
+    """Письма о пачке новых заказов: по задаче на STATUS_NOTIFICATION_BATCH_SIZE заказов, после коммита."""
+    for start in range(0, len(order_ids), STATUS_NOTIFICATION_BATCH_SIZE):
+        batch = order_ids[start:start + STATUS_NOTIFICATION_BATCH_SIZE]
+        transaction.on_commit(lambda batch=batch: send_orders_created_emails.delay(batch), robust=True)
+
+
+def transition_sources(target):
+    """Статусы, из которых допустим переход в target."""
+    return [source for source, targets in Order.TRANSITIONS.items() if target in targets]
+
+
+def change_order_status(order, target, expected=None):
+    """
+    Compare-and-set статуса одного заказа: UPDATE ... WHERE status = expected
+    (по умолчанию — статус, прочитанный вместе с order), пишутся только status и updated_at.
+    Допустимость перехода проверяет вызывающий код (can_transition).
+    Возвращает False, если статус заказа уже изменил кто-то другой.
+    """
+    expected = order.status if expected is None else expected
+    now = timezone.now()
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, status=expected).update(status=target, updated_at=now):
+            return False
+        record_status_change([order.pk], target, source=expected)
+    order.status, order.updated_at = target, now
+    notify_status_changed([order.pk])
+    return True
+
+
+def transition_orders(queryset, target):
+    """
+    Переводит заказы из queryset в статус target одним UPDATE; заказы, из статуса
+    которых переход недопустим (Order.TRANSITIONS), не меняются.
+    Возвращает список id заказов, статус которых действительно изменился.
+    """
+    sources = transition_sources(target)
+    with transaction.atomic():
+        ids = list(queryset.select_for_update().filter(status__in=sources).values_list('id', flat=True))
+        if ids:
+            record_status_change(ids, target)
+            Order.objects.filter(id__in=ids).update(status=target, updated_at=timezone.now())
+    return ids
+
+
+def notify_status_changed(order_ids):
+    """Ставит в очередь пачки писем о смене статуса после коммита транзакции."""
+    for start in range(0, len(order_ids), STATUS_NOTIFICATION_BATCH_SIZE):
+        batch = order_ids[start:start + STATUS_NOTIFICATION_BATCH_SIZE]
+        transaction.on_commit(lambda batch=batch: send_status_update_emails.delay(batch), robust=True)
+
+
+def build_order_items(items):
+    """Несохраненные позиции с ценами товаров на момент заказа и итоги для полей Order."""
+    order_items = [
+        OrderItem(product=item['product'], quantity=item['quantity'], unit_price=item['product'].price)
+        for item in items
+    ]
+    totals = {
+        'total': sum((item.quantity * item.unit_price for item in order_items), Decimal(0)),
+        'item_count': len(order_items),
+    }
+    return order_items, totals
+
+
+def create_order(customer, delivery_address, items, **extra):
+    """
+    Создает заказ и его позиции одним bulk_create; цены позиций и итоги заказа
+    фиксируются по текущим ценам товаров.
+    items — последовательность словарей {'product': Product, 'quantity': int}.
+    """
+    order_items, totals = build_order_items(items)
+    with transaction.atomic():
+        order = Order.objects.create(customer=customer, delivery_address=delivery_address, **totals, **extra)
+        for item in order_items:
+            item.order = order
+        OrderItem.objects.bulk_create(order_items)
+        SupplierOrder.objects.bulk_create(build_supplier_orders(order, order_items))
+        record_orders_created([(order, order_items)])
+    return order
+
+
+def create_orders(customer, orders):
+    """
+    Создает пачку заказов в одной транзакции: заказы, позиции и строки SupplierOrder —
+    по одному bulk_create на таблицу (Django сам делит вставку на пачки по лимиту параметров).
+    orders — последовательность словарей {'delivery_address': str, 'items': [{'product': Product, 'quantity': int}]},
+    товары уже загружены. Возвращает созданные заказы в том же порядке.
+    """
+    built = [build_order_items(data['items']) for data in orders]
+    with transaction.atomic():
+        created = Order.objects.bulk_create(
+            Order(customer=customer, delivery_address=data['delivery_address'], **totals)
+            for data, (_, totals) in zip(orders, built)
+        )
+        items_by_order = [order_items for order_items, _ in built]
+        for order, order_items in zip(created, items_by_order):
+            for item in order_items:
+                item.order = order
+        OrderItem.objects.bulk_create(item for items in items_by_order for item in items)
+        SupplierOrder.objects.bulk_create(
+            link for order, items in zip(created, items_by_order) for link in build_supplier_orders(order, items)
+        )
+        record_orders_created(zip(created, items_by_order))
+    return created
+
+
+def refresh_order_totals(order_ids):
+    """
+    Пересчитывает Order.total и item_count по сохраненным позициям одним UPDATE
+    с подзапросами. Используется при правке позиций в обход create_order.
+    """
+    items = OrderItem.objects.filter(order_id=OuterRef('pk')).order_by().values('order_id')
+    return Order.objects.filter(id__in=list(order_ids)).update(
+        total=Coalesce(
+            Subquery(items.annotate(total=Sum(ITEM_TOTAL)).values('total')), Value(Decimal(0)), output_field=MONEY,
+        ),
+        item_count=Coalesce(Subquery(items.annotate(count=Count('id')).values('count')), 0),
+        updated_at=timezone.now(),
+    )
+
+
+def build_supplier_orders(order, order_items):
+    """Строки SupplierOrder для нового заказа по уже загруженным товарам, без запросов к БД."""
+    links = {}
+    for item in order_items:
+        supplier_id = item.product.supplier_id
+        link = links.get(supplier_id)
+        if link is None:
+            link = links[supplier_id] = SupplierOrder(
+                supplier_id=supplier_id, order=order, created_at=order.created_at,
+            )
+        link.item_count += 1
+        link.quantity += item.quantity
+        link.total += item.quantity * item.unit_price
+    return list(links.values())
+
+
+def refresh_supplier_orders(order_ids):
+    """
+    Пересчитывает строки SupplierOrder для заказов одним агрегирующим запросом.
+    Используется при правке позиций в обход create_order и при полной пересборке.
+    """
+    order_ids = list(order_ids)
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('order_id', 'product__supplier_id')
+        .annotate(
+            created_at=Max('order__created_at'),
+            item_count=Count('id'),
+            quantity_sum=Sum('quantity'),
+            total=Sum(ITEM_TOTAL),
+        )
+    )
+    links = [
+        SupplierOrder(
+            order_id=row['order_id'], supplier_id=row['product__supplier_id'], created_at=row['created_at'],
+            item_count=row['item_count'], quantity=row['quantity_sum'], total=row['total'],
+        )
+        for row in rows
+    ]
+    with transaction.atomic():
+        SupplierOrder.objects.filter(order_id__in=order_ids).delete()
+        SupplierOrder.objects.bulk_create(links)
+    return len(links)
+
+
+def add_to_cart(user, product, quantity=1):
+    """
+    Атомарно добавляет товар в корзину: существующая позиция увеличивается
+    через UPDATE ... SET quantity = quantity + n, новая создается вставкой.
+    Возвращает (позиция, создана ли она).
+    """
+    for _ in range(2):
+        updated = CartItem.objects.filter(cart__user=user, product=product).update(quantity=F('quantity') + quantity)
+        if updated:
+            return CartItem.objects.select_related('product').get(cart__user=user, product=product), False
+        cart, _ = Cart.objects.get_or_create(user=user)
+        try:
+            with transaction.atomic():
+                return CartItem.objects.create(cart=cart, product=product, quantity=quantity), True
+        except IntegrityError:
+            # Позицию параллельно создал другой запрос — повторяем как инкремент
+            continue
+    raise IntegrityError('Не удалось добавить товар в корзину')
+
+
+def checkout_cart(user, delivery_address):
+    """
+    Оформляет корзину в заказ в одной транзакции: заказ, позиции через bulk_create
+    и очистка корзины. Возвращает заказ или None, если корзина пуста.
+    """
+    with transaction.atomic():
+        cart_items = list(CartItem.objects.select_for_update().select_related('product').filter(cart__user=user))
+        if not cart_items:
+            return None
+        order = create_order(user, delivery_address, [
+            {'product': item.product, 'quantity': item.quantity} for item in cart_items
+        ])
+        CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+        notify_order_created(order.id)
+    return order
@@ -0,0 +1,170 @@
+from contextvars import ContextVar
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .analytics import SalesDeltas, record_status_change
+from .archive import is_archiving
+from .authentication import invalidate_tokens, invalidate_user_tokens
+from .cache import invalidate_product_cache
+from .models import ArchivedOrder, Order, OrderItem, Product, Supplier, SupplierOrder, User
+from .services import refresh_order_totals, refresh_supplier_orders
+from .tasks import warm_product_renditions
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Supplier)
+def product_changed(sender, **kwargs):
+    # После коммита: иначе параллельный запрос успеет закэшировать старые данные
+    transaction.on_commit(invalidate_product_cache)
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, **kwargs):
+    if getattr(instance, 'image_changed', False) and instance.image:
+        product_id = instance.pk
+        transaction.on_commit(lambda: warm_product_renditions.delay([product_id]), robust=True)
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_changed(sender, instance, **kwargs):
+    # create_order заполняет SupplierOrder и итоги заказа сам (bulk_create не шлет сигналы);
+    # здесь ловятся единичные правки позиций, например из админки
+    refresh_supplier_orders([instance.order_id])
+    refresh_order_totals([instance.order_id])
+
+
+class ItemDeletion:
+    """
+    Позиции, удаляемые одной операцией delete() (в том числе каскадом от заказа,
+    товара или пользователя), и заказы и товары, удаляемые вместе с ними. Коллектор
+    Django шлет pre_delete всем объектам до удаления, поэтому заказы и агрегаты продаж
+    пересчитываются один раз — после post_delete последней позиции, а не на каждую позицию.
+    """
+
+    def __init__(self, origin):
+        self.origin = origin
+        self.items = {}
+        self.pending = set()
+        self.deleted_orders = set()
+        self.deleted_products = set()
+
+    def add_item(self, item):
+        self.items[item.pk] = item
+        self.pending.add(item.pk)
+
+    def item_deleted(self, item):
+        """Отмечает удаление позиции; True — удалена последняя позиция операции."""
+        self.pending.discard(item.pk)
+        return not self.pending
+
+    def flush(self):
+        # Агрегаты продаж удаляемых товаров удалит каскад, вычитать из них нечего
+        deltas = SalesDeltas()
+        deltas.add_deleted([item for item in self.items.values() if item.product_id not in self.deleted_products])
+        deltas.apply()
+        # Итоги удаляемых заказов не нужны, их SupplierOrder удалит order_deleted
+        order_ids = {item.order_id for item in self.items.values()} - self.deleted_orders
+        if order_ids:
+            refresh_supplier_orders(order_ids)
+            refresh_order_totals(order_ids)
+
+
+_deletion = ContextVar('order_item_deletion', default=None)
+
+
+def _current_deletion(origin, create=False):
+    # Операции различаются по origin; состояние прерванной операции (откат) заменяется
+    deletion = _deletion.get()
+    if deletion is not None and deletion.origin is origin:
+        return deletion
+    if not create:
+        return None
+    deletion = ItemDeletion(origin)
+    _deletion.set(deletion)
+    return deletion
+
+
+@receiver(pre_delete, sender=OrderItem)
+def order_item_deleting(sender, instance, origin=None, **kwargs):
+    # При переносе в архив связи и итоги заказа должны остаться как есть
+    if not is_archiving():
+        _current_deletion(origin, create=True).add_item(instance)
+
+
+@receiver(pre_delete, sender=Order)
+def order_deleting(sender, instance, origin=None, **kwargs):
+    if not is_archiving():
+        _current_deletion(origin, create=True).deleted_orders.add(instance.pk)
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, origin=None, **kwargs):
+    _current_deletion(origin, create=True).deleted_products.add(instance.pk)
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted(sender, instance, origin=None, **kwargs):
+    deletion = _current_deletion(origin)
+    if deletion is not None and deletion.item_deleted(instance):
+        _deletion.set(None)
+        deletion.flush()
+
+
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=ArchivedOrder)
+def order_deleted(sender, instance, **kwargs):
+    # У SupplierOrder нет внешнего ключа в БД на заказ, каскада нет
+    if not is_archiving():
+        SupplierOrder.objects.filter(order_id=instance.pk).delete()
+
+
+@receiver(pre_save, sender=OrderItem)
+def order_item_saving(sender, instance, raw=False, **kwargs):
+    # Единичная правка позиции (админка): прежнее состояние вычитается из агрегатов продаж,
+    # новое прибавляется после сохранения. bulk_create в services сигналов не шлет
+    instance._sales_deltas = SalesDeltas()
+    if instance.pk and not raw:
+        instance._sales_deltas.add_stored(OrderItem.objects.filter(pk=instance.pk), sign=-1)
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_sales_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        deltas = getattr(instance, '_sales_deltas', None) or SalesDeltas()
+        deltas.add_stored(OrderItem.objects.filter(pk=instance.pk))
+        deltas.apply()
+
+
+@receiver(post_delete, sender=ArchivedOrder)
+def archived_order_sales_deleted(sender, instance, **kwargs):
+    deltas = SalesDeltas()
+    deltas.add_archived(instance, sign=-1)
+    deltas.apply()
+
+
+@receiver(pre_save, sender=Order)
+def order_saving(sender, instance, raw=False, **kwargs):
+    instance._status_before = None
+    if instance.pk and not raw:
+        instance._status_before = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def order_status_saved(sender, instance, **kwargs):
+    # Смена статуса через save() (форма админки); services меняют статус UPDATE-ом и учитывают ее сами
+    before = getattr(instance, '_status_before', None)
+    if before and before != instance.status:
+        record_status_change([instance.pk], instance.status, source=before)
+
+
+@receiver([post_save, post_delete], sender=Token)
+def token_changed(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, **kwargs):
+    # Снимок пользователя в кэше токенов устаревает при любом изменении (is_active, role)
+    if not created:
+        invalidate_user_tokens(instance.pk)
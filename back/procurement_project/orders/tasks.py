@@ -1,12 +1,52 @@
 from celery import shared_task
-from django.core.mail import send_mail
+from celery.utils.time import get_exponential_backoff_interval
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.conf import settings
+from .archive import archive_orders
+from .images import warm_product_images
 from .models import Order
 
-@shared_task
+# Повтор с экспоненциальной задержкой при сбоях SMTP (smtplib.SMTPException — подкласс OSError)
+MAIL_RETRY_OPTIONS = {
+    'autoretry_for': (OSError,),
+    'retry_backoff': True,
+    'retry_backoff_max': 600,
+    'retry_jitter': True,
+    'max_retries': 5,
+}
+
+# Пачки писем не повторяются целиком: часть писем к моменту сбоя уже доставлена,
+# поэтому задача сама перезапускается только с неотправленными (send_each)
+MAIL_BATCH_RETRY_OPTIONS = {'bind': True, 'max_retries': MAIL_RETRY_OPTIONS['max_retries']}
+
+
+def send_each(task, messages, retry_args):
+    """
+    Отправляет письма по одному через одно SMTP-соединение. messages — пары (ключ, EmailMessage).
+    При сбое SMTP задача повторяется с экспоненциальной задержкой и аргументами
+    retry_args(ключи неотправленных писем), так что доставленные письма не дублируются.
+    """
+    sent = 0
+    try:
+        with get_connection() as connection:
+            for _, message in messages:
+                connection.send_messages([message])
+                sent += 1
+    except OSError as exc:
+        remaining = [key for key, _ in messages[sent:]]
+        if not remaining:
+            # Сбой при закрытии соединения: все письма уже отправлены
+            return sent
+        countdown = get_exponential_backoff_interval(
+            factor=1, retries=task.request.retries, maximum=MAIL_RETRY_OPTIONS['retry_backoff_max'], full_jitter=True,
+        )
+        raise task.retry(args=retry_args(remaining), exc=exc, countdown=countdown)
+    return sent
+
+@shared_task(**MAIL_RETRY_OPTIONS)
 def send_order_confirmation_email(order_id):
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('customer').get(id=order_id)
         send_mail(
             subject='Подтверждение заказа',
             message=f'Ваш заказ #{order.id} принят. Спасибо за покупку!',
@@ -16,10 +56,10 @@ def send_order_confirmation_email(order_id):
     except Order.DoesNotExist:
         pass
 
-@shared_task
+@shared_task(**MAIL_RETRY_OPTIONS)
 def send_admin_notification_email(order_id):
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('customer').get(id=order_id)
         send_mail(
             subject='Новый заказ',
             message=f'Заказ #{order.id} от {order.customer.username}',
@@ -28,3 +68,74 @@ def send_admin_notification_email(order_id):
         )
     except Order.DoesNotExist:
         pass
+
+ADMIN_SUMMARY = 'admin'
+
+@shared_task(**MAIL_BATCH_RETRY_OPTIONS)
+def send_orders_created_emails(self, order_ids, notify_admin=True):
+    """
+    Письма о пачке заказов из пакетной загрузки через одно SMTP-соединение:
+    одно сводное письмо администратору (первым, пока пачка целая) и подтверждение
+    каждому клиенту. При сбое повторяются только неотправленные письма.
+    """
+    messages = []
+    if notify_admin:
+        messages.append((ADMIN_SUMMARY, EmailMessage(
+            subject='Новые заказы',
+            body=f'Загружено заказов: {len(order_ids)} (#{min(order_ids)}–#{max(order_ids)})',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[settings.DEFAULT_FROM_EMAIL],
+        )))
+    orders = (
+        Order.objects.filter(id__in=order_ids).select_related('customer').only('id', 'customer__email').order_by('id')
+    )
+    messages.extend(
+        (order.id, EmailMessage(
+            subject='Подтверждение заказа',
+            body=f'Ваш заказ #{order.id} принят. Спасибо за покупку!',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[order.customer.email],
+        ))
+        for order in orders.iterator()
+        if order.customer.email
+    )
+
+    def retry_args(remaining):
+        return [[key for key in remaining if key != ADMIN_SUMMARY], ADMIN_SUMMARY in remaining]
+
+    if messages:
+        send_each(self, messages, retry_args)
+
+@shared_task(**MAIL_BATCH_RETRY_OPTIONS)
+def send_status_update_emails(self, order_ids):
+    """Письма о смене статуса для пачки заказов через одно SMTP-соединение; повтор — только неотправленных."""
+    orders = (
+        Order.objects.filter(id__in=order_ids)
+        .select_related('customer')
+        .only('id', 'status', 'customer__email')
+        .order_by('id')
+    )
+    messages = [
+        (order.id, EmailMessage(
+            subject='Статус заказа обновлен',
+            body=f'Ваш заказ #{order.id} теперь имеет статус: {order.get_status_display()}.',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[order.customer.email],
+        ))
+        for order in orders.iterator()
+        if order.customer.email
+    ]
+    if messages:
+        send_each(self, messages, lambda remaining: [remaining])
+
+@shared_task
+def warm_product_renditions(product_ids):
+    """Фоновая генерация превью изображений для пачки товаров."""
+    warmed, failed = warm_product_images(product_ids)
+    return {'warmed': warmed, 'failed': failed}
+
+
+@shared_task
+def archive_delivered_orders():
+    """Периодический перенос давно доставленных заказов в архив (CELERY_BEAT_SCHEDULE)."""
+    return archive_orders()
@@ -1,12 +1,93 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.conf import settings
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth import get_user_model
-from .models import Product, Supplier
+from django.utils import timezone
+from PIL import Image
+from .analytics import rebuild_sales_rollups
+from .archive import archive_orders
+from .authentication import CachedTokenAuthentication, _token_cache_key, token_local_cache
+from .benchmarks import EndpointResult, uncovered_url_names
+from .cache import LocalLRUCache
+from .db_routing import STICKY_COOKIE, ReplicaRouter, begin_request, end_request
+from .instrumentation import collect_request_stats, timed
+from .metrics import REGISTRY as METRICS_REGISTRY, Histogram
+from .images import warm_product_images
+from .renderers import ORJSONRenderer
+from .search import search_products
+from .seeding import COLUMNS, PRESETS, Plan, orders_chunk
+from .serializers import OrderSerializer, ProductSerializer
+from .models import ArchivedOrder, Cart, CartItem, Order, OrderItem, Product, SalesRollup, Supplier, SupplierOrder
+from .services import (
+    change_order_status, create_order, create_orders, refresh_order_totals, refresh_supplier_orders, transition_orders,
+)
+from .tasks import send_orders_created_emails, send_status_update_emails
+from .throttling import UserSlidingThrottle
 
 User = get_user_model()
 
+def json_roundtrip(data):
+    return json.loads(JSONRenderer().render(data))
+
+class QueryBudgetMixin:
+    """
+    Проверка бюджета запросов: число SQL-запросов эндпоинта не должно расти
+    вместе с количеством строк в ответе (защита от N+1).
+    """
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+        # Служебные запросы профилировщика (silk) и управление транзакциями не учитываются
+        return sum(
+            1 for query in context.captured_queries
+            if 'silk_' not in query['sql'] and not query['sql'].startswith(
+                ('EXPLAIN', 'BEGIN', 'COMMIT', 'SAVEPOINT', 'RELEASE', 'ROLLBACK')
+            )
+        )
+
+    def assertConstantQueries(self, add_rows, request, small=2, large=10):
+        """
+        add_rows(n) добавляет n строк к данным эндпоинта, request() выполняет запрос.
+        Первый запрос прогревочный (создание корзины, кэши и т.п.) и не учитывается.
+        """
+        add_rows(small)
+        request()
+        baseline = self.count_queries(request)
+        add_rows(large - small)
+        grown = self.count_queries(request)
+        self.assertEqual(grown, baseline, f'Запросов стало {grown} вместо {baseline} при росте данных {small} -> {large}')
+
 class UserRegistrationTests(APITestCase):
+    def setUp(self):
+        # RegisterView ограничен scope 'register' (10/hour на IP): счетчики других тестов не должны мешать
+        cache.clear()
+        self.addCleanup(cache.clear)
+
     def test_register_user(self):
         url = reverse('register')
         data = {
@@ -16,7 +97,6 @@ class UserRegistrationTests(APITestCase):
             'role': 'customer'
         }
         response = self.client.post(url, data, format='json')
-        # Отключили тротлинг в RegisterView, ожидаем 201
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertIn('id', response.data)
 
@@ -44,7 +124,7 @@ class ProductListTests(APITestCase):
         url = reverse('product-list')
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertGreaterEqual(len(response.data), 2)
+        self.assertGreaterEqual(len(response.data['results']), 2)
 
 class ThrottlingTests(APITestCase):
     def test_throttling(self):
@@ -59,3 +139,1451 @@ class ErrorTestTests(APITestCase):
         url = reverse('error-test')
         with self.assertRaises(Exception):
             self.client.get(url, format='json')
+
+class ImportProductsTests(TestCase):
+    fieldnames = ['supplier_username', 'supplier_name', 'name', 'description', 'price', 'category']
+
+    def write_csv(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def row(self, username, name, price):
+        return {'supplier_username': username, 'supplier_name': f'{username} LLC', 'name': name,
+                'description': '', 'price': price, 'category': 'Cat'}
+
+    def test_bulk_import_upserts_prices(self):
+        path = self.write_csv([self.row('s1', 'A', '1.00'), self.row('s1', 'B', '2.00'), self.row('s2', 'A', '3.00')])
+        call_command('import_products', path, '--bulk', '--chunk-size', '2', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Supplier.objects.count(), 2)
+
+        path = self.write_csv([self.row('s1', 'A', '5.00')])
+        call_command('import_products', path, '--bulk', stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(str(Product.objects.get(supplier__user__username='s1', name='A').price), '5.00')
+
+    def test_plain_import_is_idempotent(self):
+        path = self.write_csv([self.row('s1', 'A', '1.00'), self.row('s1', 'B', '2.00')])
+        call_command('import_products', path, stdout=StringIO())
+        call_command('import_products', path, stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 2)
+
+        call_command('import_products', self.write_csv([self.row('s1', 'A', '4.00')]), stdout=StringIO())
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(str(Product.objects.get(name='A').price), '4.00')
+
+    def test_bulk_import_resumes_from_checkpoint(self):
+        path = self.write_csv([self.row('s1', 'A', '1.00'), self.row('s1', 'B', '2.00'), self.row('s1', 'C', '3.00')])
+        with open(f'{path}.progress', 'w') as f:
+            f.write('2')
+        call_command('import_products', path, '--bulk', '--resume', stdout=StringIO())
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['C'])
+        self.assertFalse(os.path.exists(f'{path}.progress'))
+
+class ExportProductsTests(APITestCase):
+    def setUp(self):
+        self.supplier_user = User.objects.create_user(username='exporter', password='StrongPassword123', role='supplier')
+        supplier = Supplier.objects.create(user=self.supplier_user, company_name='Exporter')
+        other = Supplier.objects.create(user=User.objects.create_user(username='other', role='supplier'), company_name='Other')
+        for i in range(5):
+            Product.objects.create(supplier=supplier, name=f'P{i}', price=i, custom_fields=None if i % 2 else {'category': 'C'})
+        Product.objects.create(supplier=other, name='Foreign', price=1)
+
+    def test_export_command_streams_in_fixed_queries(self):
+        fd, path = tempfile.mkstemp(suffix='.csv.gz')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        with CaptureQueriesContext(connection) as small:
+            call_command('export_products', path, stdout=StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['supplier_username'], 'exporter')
+        self.assertEqual(rows[1]['category'], '')
+
+        supplier = Supplier.objects.get(company_name='Other')
+        Product.objects.bulk_create(Product(supplier=supplier, name=f'Extra {i}', price=1) for i in range(20))
+        with CaptureQueriesContext(connection) as large:
+            call_command('export_products', path, stdout=StringIO())
+        self.assertEqual(len(large), len(small))
+
+    def test_export_endpoint_returns_own_catalog(self):
+        self.client.force_authenticate(self.supplier_user)
+        response = self.client.get(reverse('product-export'), {'compress': 'gzip'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row['name'] for row in rows], [f'P{i}' for i in range(5)])
+
+    def test_export_endpoint_is_supplier_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='buyer', role='customer'))
+        response = self.client.get(reverse('product-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class PaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        supplier_user = User.objects.create_user(username='pager', role='supplier')
+        self.supplier = Supplier.objects.create(user=supplier_user, company_name='Pager')
+        for i in range(5):
+            Product.objects.create(supplier=self.supplier, name=f'P{i}', price=i)
+
+    def test_product_cursor_is_stable_under_inserts(self):
+        response = self.client.get(reverse('product-list'), {'page_size': 2})
+        self.assertEqual([p['name'] for p in response.data['results']], ['P0', 'P1'])
+        Product.objects.create(supplier=self.supplier, name='Late', price=1)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([p['name'] for p in response.data['results']], ['P2', 'P3'])
+
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_is_bounded(self):
+        response = self.client.get(reverse('product-list'), {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_order_list_is_paginated_newest_first(self):
+        customer = User.objects.create_user(username='pager-customer', role='customer')
+        orders = [Order.objects.create(customer=customer, delivery_address=f'Addr {i}') for i in range(3)]
+        self.client.force_authenticate(customer)
+        response = self.client.get(reverse('order-list'), {'page_size': 2})
+        self.assertEqual([o['id'] for o in response.data['results']], [orders[2].id, orders[1].id])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([o['id'] for o in response.data['results']], [orders[0].id])
+
+class ProductFilterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.supplier = Supplier.objects.create(user=User.objects.create_user(username='filter1', role='supplier'), company_name='F1')
+        other = Supplier.objects.create(user=User.objects.create_user(username='filter2', role='supplier'), company_name='F2')
+        Product.objects.create(supplier=self.supplier, name='Steel bolt', description='M8 zinc plated', price=5, custom_fields={'category': 'Hardware'})
+        Product.objects.create(supplier=self.supplier, name='Copper wire', description='2.5 mm', price=50, custom_fields={'category': 'Electrical'})
+        Product.objects.create(supplier=other, name='Steel nut', description='M8', price=2, custom_fields={'category': 'Hardware'})
+
+    def names(self, **params):
+        response = self.client.get(reverse('product-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sorted(p['name'] for p in response.data['results'])
+
+    def test_filters(self):
+        self.assertEqual(self.names(supplier=self.supplier.id), ['Copper wire', 'Steel bolt'])
+        self.assertEqual(self.names(category='Hardware', price_max=3), ['Steel nut'])
+        self.assertEqual(self.names(price_min=10), ['Copper wire'])
+
+    def test_invalid_filter_returns_400(self):
+        response = self.client.get(reverse('product-list'), {'price_min': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_finite_price_returns_400(self):
+        for params in ({'price_min': 'NaN'}, {'price_min': 'sNaN'}, {'price_max': 'Infinity'}, {'price_max': '-inf'}):
+            response = self.client.get(reverse('product-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn(next(iter(params)), response.data)
+
+    def test_full_text_search_follows_updates(self):
+        self.assertEqual(self.names(search='stee'), ['Steel bolt', 'Steel nut'])
+        self.assertEqual(self.names(search='zinc m8'), ['Steel bolt'])
+        product = Product.objects.get(name='Copper wire')
+        product.description = 'zinc coated'
+        product.save()
+        cache.clear()
+        self.assertEqual(self.names(search='zinc'), ['Copper wire', 'Steel bolt'])
+
+class QueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='budget-customer', role='customer')
+        self.supplier_user = User.objects.create_user(username='budget-supplier', role='supplier')
+        self.supplier = Supplier.objects.create(user=self.supplier_user, company_name='Budget')
+        self.product_count = 0
+
+    def new_product(self):
+        self.product_count += 1
+        return Product.objects.create(supplier=self.supplier, name=f'Budget {self.product_count}', price=1)
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(customer=self.customer, delivery_address='Addr')
+            OrderItem.objects.bulk_create(OrderItem(order=order, product=self.new_product(), quantity=1, unit_price=1) for _ in range(2))
+
+    def test_order_list_customer(self):
+        self.client.force_authenticate(self.customer)
+        self.assertConstantQueries(self.add_orders, lambda: self.client.get(reverse('order-list')))
+
+    def test_order_list_supplier(self):
+        self.client.force_authenticate(self.supplier_user)
+        self.assertConstantQueries(self.add_orders, lambda: self.client.get(reverse('order-list')))
+
+    def test_order_detail(self):
+        order = Order.objects.create(customer=self.customer, delivery_address='Addr')
+
+        def add_items(count):
+            OrderItem.objects.bulk_create(OrderItem(order=order, product=self.new_product(), quantity=1, unit_price=1) for _ in range(count))
+
+        self.client.force_authenticate(self.customer)
+        self.assertConstantQueries(add_items, lambda: self.client.get(reverse('order-detail', args=[order.id])))
+
+    def test_cart(self):
+        cart = Cart.objects.create(user=self.customer)
+
+        def add_items(count):
+            CartItem.objects.bulk_create(CartItem(cart=cart, product=self.new_product()) for _ in range(count))
+
+        self.client.force_authenticate(self.customer)
+        self.assertConstantQueries(add_items, lambda: self.client.get(reverse('cart')))
+
+    def test_product_list(self):
+        def add_products(count):
+            for _ in range(count):
+                self.new_product()
+
+        def get_uncached():
+            cache.clear()
+            return self.client.get(reverse('product-list'))
+
+        self.assertConstantQueries(add_products, get_uncached)
+
+class OrderCreateTests(APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='buyer1', email='buyer1@example.com', role='customer')
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='seller1', role='supplier'), company_name='S')
+        self.product = Product.objects.create(supplier=supplier, name='Item', price=10)
+        self.client.force_authenticate(self.customer)
+
+    @mock.patch('orders.services.send_admin_notification_email.delay')
+    @mock.patch('orders.services.send_order_confirmation_email.delay')
+    def test_notifications_are_enqueued_on_commit(self, confirmation, admin_notification):
+        data = {'delivery_address': 'Addr', 'items': [{'product_id': self.product.id, 'quantity': 2}]}
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('order-create'), data, format='json')
+            confirmation.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for callback in callbacks:
+            callback()
+        confirmation.assert_called_once_with(response.data['id'])
+        admin_notification.assert_called_once_with(response.data['id'])
+
+    @mock.patch('orders.services.send_admin_notification_email.delay', side_effect=ConnectionError)
+    @mock.patch('orders.services.send_order_confirmation_email.delay', side_effect=ConnectionError)
+    def test_broker_outage_does_not_fail_order(self, confirmation, admin_notification):
+        data = {'delivery_address': 'Addr', 'items': [{'product_id': self.product.id, 'quantity': 1}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('order-create'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 1)
+
+class OrderBatchCreateTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='erp', email='erp@example.com', role='customer')
+        suppliers = [
+            Supplier.objects.create(user=User.objects.create_user(username=f'batch-seller{i}', role='supplier'), company_name=f'B{i}')
+            for i in range(2)
+        ]
+        self.products = [Product.objects.create(supplier=suppliers[i % 2], name=f'Batch {i}', price=i + 1) for i in range(4)]
+        self.client.force_authenticate(self.customer)
+
+    def batch(self, orders):
+        return self.client.post(reverse('order-batch-create'), {'orders': orders}, format='json')
+
+    def entry(self, *product_ids):
+        return {'delivery_address': 'ERP', 'items': [{'product_id': pk, 'quantity': 2} for pk in product_ids]}
+
+    @mock.patch('orders.services.send_orders_created_emails.delay')
+    def test_creates_valid_orders_and_reports_errors(self, delay):
+        ids = [product.id for product in self.products]
+        orders = [self.entry(*ids), self.entry(ids[0], 999999), {'items': []}, self.entry(ids[1])]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.batch(orders)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+        results = response.data['results']
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertIn('product_id', results[1]['errors']['items'][1])
+        self.assertEqual(set(results[2]['errors']), {'delivery_address', 'items'})
+
+        first = Order.objects.get(id=results[0]['id'])
+        self.assertEqual(first.customer, self.customer)
+        self.assertEqual(first.items.count(), 4)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(SupplierOrder.objects.filter(order=first).count(), 2)
+        self.assertEqual(str(SupplierOrder.objects.get(order_id=results[3]['id']).total), '4.00')
+        delay.assert_called_once_with([results[0]['id'], results[3]['id']])
+
+    def test_created_emails_retry_only_unsent(self):
+        orders = create_orders(self.customer, [
+            {'delivery_address': 'ERP', 'items': [{'product': self.products[0], 'quantity': 1}]} for _ in range(3)
+        ])
+        ids = [order.id for order in orders]
+        send_messages = locmem.EmailBackend.send_messages
+        calls = []
+
+        def flaky(backend, messages):
+            calls.append(messages)
+            if len(calls) == 3:
+                raise ConnectionResetError('SMTP оборвал соединение')
+            return send_messages(backend, messages)
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', flaky), \
+                mock.patch.object(send_orders_created_emails, 'retry', side_effect=RuntimeError) as retry:
+            with self.assertRaises(RuntimeError):
+                send_orders_created_emails(ids)
+            # Сводка и первое подтверждение ушли до сбоя
+            self.assertEqual(retry.call_args.kwargs['args'], [ids[1:], False])
+            send_orders_created_emails(*retry.call_args.kwargs['args'])
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual(len({(tuple(message.to), message.body) for message in mail.outbox}), 4)
+        self.assertIn('Загружено заказов: 3', mail.outbox[0].body)
+
+    def test_queries_do_not_grow_with_batch(self):
+        ids = [product.id for product in self.products]
+        size = [0]
+
+        def grow(count):
+            size[0] += count
+
+        self.assertConstantQueries(grow, lambda: self.batch([self.entry(*ids)] * size[0]))
+        with CaptureQueriesContext(connection) as queries:
+            self.batch([self.entry(*ids)] * 20)
+        product_queries = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "orders_product"' in query['sql']
+        ]
+        self.assertEqual(len(product_queries), 1)
+
+    def test_rejects_empty_oversized_and_fully_invalid_batches(self):
+        self.assertEqual(self.batch([]).status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(ORDER_BATCH_MAX_ORDERS=1):
+            self.assertEqual(self.batch([self.entry(self.products[0].id)] * 2).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.batch([self.entry(999999)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertFalse(Order.objects.exists())
+
+class OrderPriceSnapshotTests(APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='snapshot-buyer', role='customer')
+        supplier = Supplier.objects.create(
+            user=User.objects.create_user(username='snapshot-seller', role='supplier'), company_name='Snapshot',
+        )
+        self.products = [Product.objects.create(supplier=supplier, name=f'Snapshot {i}', price=i + 2) for i in range(2)]
+        self.client.force_authenticate(self.customer)
+
+    @mock.patch('orders.services.send_admin_notification_email.delay')
+    @mock.patch('orders.services.send_order_confirmation_email.delay')
+    def test_order_keeps_prices_after_product_change(self, confirmation, admin_notification):
+        response = self.client.post(reverse('order-create'), {'delivery_address': 'Addr', 'items': [
+            {'product_id': self.products[0].id, 'quantity': 3}, {'product_id': self.products[1].id, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['total'], response.data['item_count']), ('9.00', 2))
+        self.assertEqual([item['unit_price'] for item in response.data['items']], ['2.00', '3.00'])
+
+        Product.objects.filter(id=self.products[0].id).update(price=100)
+        order = Order.objects.get(id=response.data['id'])
+        refresh_supplier_orders([order.id])
+        self.assertEqual(str(SupplierOrder.objects.get(order=order).total), '9.00')
+        detail = self.client.get(reverse('order-detail', args=[order.id])).data
+        self.assertEqual((detail['total'], detail['items'][0]['unit_price']), ('9.00', '2.00'))
+        listed = self.client.get(reverse('order-list')).json()['results'][0]
+        self.assertEqual((listed['total'], listed['item_count'], listed['items'][0]['unit_price']), ('9.00', 2, '2.00'))
+
+    def test_batch_orders_store_totals(self):
+        entry = {'delivery_address': 'ERP', 'items': [{'product_id': self.products[1].id, 'quantity': 4}]}
+        response = self.client.post(reverse('order-batch-create'), {'orders': [entry]}, format='json')
+        order = Order.objects.get(id=response.data['results'][0]['id'])
+        self.assertEqual((order.total, order.item_count), (Decimal('12.00'), 1))
+        self.assertEqual(order.items.get().unit_price, Decimal('3.00'))
+
+    def test_single_item_edits_refresh_totals(self):
+        order = create_order(self.customer, 'Addr', [{'product': self.products[0], 'quantity': 1}])
+        Product.objects.filter(id=self.products[1].id).update(price=5)
+        item = OrderItem.objects.create(order=order, product=Product.objects.get(id=self.products[1].id), quantity=2)
+        self.assertEqual(item.unit_price, 5)
+        order.refresh_from_db()
+        self.assertEqual((order.total, order.item_count), (Decimal('12.00'), 2))
+
+        item.delete()
+        order.refresh_from_db()
+        self.assertEqual((order.total, order.item_count), (Decimal('2.00'), 1))
+
+class OrderAdminTransitionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='StrongPassword123', email='admin@example.com')
+        customer = User.objects.create_user(username='admin-buyer', email='buyer@example.com')
+        self.orders = [Order.objects.create(customer=customer, delivery_address='Addr') for _ in range(3)]
+        Order.objects.filter(id=self.orders[0].id).update(status='shipped')
+        self.client.force_login(self.admin)
+
+    @mock.patch('orders.services.send_status_update_emails.delay')
+    def test_bulk_transition_updates_once_and_batches_mail(self, delay):
+        url = reverse('admin:orders_order_changelist')
+        data = {'action': 'mark_as_shipped', '_selected_action': [o.id for o in self.orders]}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, data)
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 3)
+        delay.assert_called_once()
+        self.assertEqual(sorted(delay.call_args.args[0]), [self.orders[1].id, self.orders[2].id])
+
+    def test_status_emails_share_one_batch(self):
+        send_status_update_emails([o.id for o in self.orders])
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['buyer@example.com'])
+
+    def test_status_emails_retry_only_unsent(self):
+        ids = [o.id for o in self.orders]
+        send_messages = locmem.EmailBackend.send_messages
+        calls = []
+
+        def flaky(backend, messages):
+            calls.append(messages)
+            if len(calls) == 2:
+                raise ConnectionResetError('SMTP оборвал соединение')
+            return send_messages(backend, messages)
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', flaky), \
+                mock.patch.object(send_status_update_emails, 'retry', side_effect=RuntimeError) as retry:
+            with self.assertRaises(RuntimeError):
+                send_status_update_emails(ids)
+            self.assertEqual(retry.call_args.kwargs['args'], [ids[1:]])
+            send_status_update_emails(*retry.call_args.kwargs['args'])
+        # Первое письмо доставлено до сбоя и при повторе не отправляется снова
+        bodies = [message.body for message in mail.outbox]
+        self.assertEqual(len(bodies), 3)
+        self.assertEqual(len(set(bodies)), 3)
+
+class OrderStatusTransitionTests(APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='status-buyer', role='customer')
+        self.supplier_user = User.objects.create_user(username='status-seller', role='supplier')
+        supplier = Supplier.objects.create(user=self.supplier_user, company_name='Status')
+        other = Supplier.objects.create(user=User.objects.create_user(username='status-other', role='supplier'), company_name='O')
+        product = Product.objects.create(supplier=supplier, name='Status', price=1)
+        foreign = Product.objects.create(supplier=other, name='Foreign status', price=1)
+        self.orders = [create_order(self.customer, 'Addr', [{'product': product, 'quantity': 1}]) for _ in range(3)]
+        self.foreign = create_order(self.customer, 'Addr', [{'product': foreign, 'quantity': 1}])
+
+    def patch(self, order, **data):
+        self.client.force_authenticate(self.customer)
+        return self.client.patch(reverse('order-status-update', args=[order.id]), data, format='json')
+
+    def test_patch_writes_only_status_and_rejects_backward_moves(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(self.orders[0], status='confirmed')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'confirmed')
+        [update] = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "orders_order"')]
+        self.assertNotIn('delivery_address', update)
+        # Compare-and-set: ожидаемый статус в условии UPDATE
+        self.assertIn('"orders_order"."status" = ', update)
+
+        response = self.patch(self.orders[0], status='pending')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['status'], 'confirmed')
+        self.assertEqual(self.patch(self.orders[0], status='lost').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stale_status_conflicts(self):
+        response = self.patch(self.orders[0], status='shipped', expected_status='confirmed')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['status'], 'pending')
+
+        stale = Order.objects.get(pk=self.orders[0].pk)
+        Order.objects.filter(pk=stale.pk).update(status='delivered')
+        self.assertFalse(change_order_status(stale, 'shipped'))
+        self.assertEqual(Order.objects.get(pk=stale.pk).status, 'delivered')
+
+    @mock.patch('orders.services.send_status_update_emails.delay')
+    def test_bulk_moves_own_orders_in_one_update(self, delay):
+        Order.objects.filter(id=self.orders[2].id).update(status='delivered')
+        ids = [order.id for order in self.orders] + [self.foreign.id, 999999]
+        self.client.force_authenticate(self.supplier_user)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('order-status-bulk'), {'ids': ids, 'status': 'shipped'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], [self.orders[0].id, self.orders[1].id])
+        self.assertEqual(response.data['skipped'], [self.orders[2].id, self.foreign.id, 999999])
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "orders_order"') for query in queries.captured_queries), 1)
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 2)
+        delay.assert_called_once()
+
+    def test_bulk_validation_and_permissions(self):
+        url = reverse('order-status-bulk')
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.post(url, {'ids': [1], 'status': 'shipped'}, format='json').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(self.supplier_user)
+        self.assertEqual(self.client.post(url, {'ids': [], 'status': 'shipped'}, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        with override_settings(ORDER_BULK_STATUS_MAX_IDS=2):
+            response = self.client.post(url, {'ids': [1, 2, 3], 'status': 'shipped'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ids', response.data)
+
+class CartTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='cart-buyer', role='customer')
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='cart-seller', role='supplier'), company_name='S')
+        self.products = [Product.objects.create(supplier=supplier, name=f'Cart {i}', price=i + 1) for i in range(12)]
+        self.client.force_authenticate(self.customer)
+
+    def test_adding_same_product_increments_quantity(self):
+        url = reverse('cart')
+        response = self.client.post(url, {'product_id': self.products[0].id, 'quantity': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(url, {'product_id': self.products[0].id, 'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['quantity'], 5)
+        self.assertEqual(CartItem.objects.count(), 1)
+
+    @mock.patch('orders.services.send_admin_notification_email.delay')
+    @mock.patch('orders.services.send_order_confirmation_email.delay')
+    def test_checkout_creates_order_and_clears_cart(self, confirmation, admin_notification):
+        cart = Cart.objects.create(user=self.customer)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=2)
+        CartItem.objects.create(cart=cart, product=self.products[1], quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('cart-checkout'), {'delivery_address': 'Addr'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(item['quantity'] for item in response.data['items']), [1, 2])
+        self.assertFalse(CartItem.objects.exists())
+        confirmation.assert_called_once_with(response.data['id'])
+
+    def test_checkout_of_empty_cart_is_rejected(self):
+        response = self.client.post(reverse('cart-checkout'), {'delivery_address': 'Addr'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    @mock.patch('orders.services.send_admin_notification_email.delay')
+    @mock.patch('orders.services.send_order_confirmation_email.delay')
+    def test_checkout_queries_do_not_grow_with_cart(self, confirmation, admin_notification):
+        cart = Cart.objects.create(user=self.customer)
+        checkout = lambda: self.client.post(reverse('cart-checkout'), {'delivery_address': 'Addr'}, format='json')
+        counts = []
+        for products in (self.products[:2], self.products[2:12]):
+            CartItem.objects.bulk_create(CartItem(cart=cart, product=product) for product in products)
+            counts.append(self.count_queries(checkout))
+        self.assertEqual(counts[0], counts[1])
+
+class ProductCacheTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.supplier = Supplier.objects.create(user=User.objects.create_user(username='cached', role='supplier'), company_name='Cached')
+        self.product = Product.objects.create(supplier=self.supplier, name='Cached item', price=10)
+
+    def get_price(self):
+        response = self.client.get(reverse('product-list'))
+        return response.data['results'][0]['price']
+
+    def test_repeated_request_is_served_from_cache(self):
+        url = reverse('product-detail', args=[self.product.id])
+        self.client.get(url)
+        self.assertEqual(self.count_queries(lambda: self.client.get(url)), 0)
+
+    def test_save_invalidates_cached_list(self):
+        self.assertEqual(self.get_price(), '10.00')
+        self.product.price = 12
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.get_price(), '12.00')
+
+    def test_bulk_import_invalidates_cached_list(self):
+        self.assertEqual(self.get_price(), '10.00')
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            f.write('supplier_username,supplier_name,name,description,price,category\n')
+            f.write('cached,Cached,Cached item,,15.00,\n')
+        self.addCleanup(os.remove, path)
+        call_command('import_products', path, '--bulk', stdout=StringIO())
+        self.assertEqual(self.get_price(), '15.00')
+
+    def test_local_lru_evicts_oldest(self):
+        lru = LocalLRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertNotEqual(lru.get('b'), 2)
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(username='poller', role='customer')
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='polled', role='supplier'), company_name='P')
+        self.product = Product.objects.create(supplier=supplier, name='Polled', price=10)
+        self.order = Order.objects.create(customer=self.customer, delivery_address='Addr')
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=1)
+        self.client.force_authenticate(self.customer)
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def change_price(self):
+        self.product.price = 11
+        self.product.save()
+
+    def test_product_list(self):
+        self.assertRevalidates(reverse('product-list'), self.change_price)
+
+    def test_product_detail(self):
+        self.assertRevalidates(reverse('product-detail', args=[self.product.id]), self.change_price)
+
+    def test_order_detail_tracks_nested_products(self):
+        self.assertRevalidates(reverse('order-detail', args=[self.order.id]), self.change_price)
+
+class FastReadPathTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user(username='fast-buyer', role='customer')
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='fast-seller', role='supplier'), company_name='F')
+        self.product = Product.objects.create(
+            supplier=supplier, name='Fast', description='Ёлка \u2028', price='12.50',
+            custom_fields={'category': 'Cat', 'size': 3}, image='product_images/fast.png',
+        )
+        Product.objects.create(supplier=supplier, name='Plain', price=1)
+        order = Order.objects.create(customer=self.customer, delivery_address='Addr')
+        OrderItem.objects.create(order=order, product=self.product, quantity=2)
+        self.client.force_authenticate(self.customer)
+
+    def test_product_list_matches_model_serializer(self):
+        response = self.client.get(reverse('product-list'))
+        request = APIRequestFactory().get(reverse('product-list'))
+        expected = ProductSerializer(Product.objects.order_by('id'), many=True, context={'request': request}).data
+        self.assertEqual(response.json()['results'], json_roundtrip(expected))
+
+    def test_order_list_matches_model_serializer(self):
+        response = self.client.get(reverse('order-list'))
+        request = APIRequestFactory().get(reverse('order-list'))
+        expected = OrderSerializer(Order.objects.all(), many=True, context={'request': request}).data
+        self.assertEqual(response.json()['results'], json_roundtrip(expected))
+
+    def test_sparse_fieldset_narrows_columns(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('product-list'), {'fields': 'name,price'})
+        self.assertEqual(response.data['results'][0], {'name': 'Fast', 'price': '12.50'})
+        select = next(q['sql'] for q in context.captured_queries if q['sql'].startswith('SELECT "orders_product"."id"'))
+        self.assertNotIn('description', select)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('product-list'), {'fields': 'name,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        data = self.client.get(reverse('product-list')).data
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+class ProductImageRenditionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        # on_commit-инвалидация в TestCase не срабатывает — не оставляем кэш каталога следующим тестам
+        self.addCleanup(cache.clear)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(self.media_root, 'product_images'))
+        Image.new('RGB', (1000, 800), 'red').save(os.path.join(self.media_root, 'product_images', 'red.png'))
+        self.supplier = Supplier.objects.create(
+            user=User.objects.create_user(username='image-seller', role='supplier'), company_name='Img',
+        )
+        self.client.force_authenticate(User.objects.create_user(username='image-buyer', role='customer'))
+
+    def create_product(self, name='Red'):
+        with mock.patch('orders.signals.warm_product_renditions.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                product = Product.objects.create(
+                    supplier=self.supplier, name=name, price=1, image='product_images/red.png',
+                )
+        delay.assert_called_once_with([product.id])
+        return product
+
+    def test_upload_enqueues_renditions_and_hides_urls_until_ready(self):
+        product = self.create_product()
+        self.assertFalse(product.image_renditions_ready)
+        response = self.client.get(reverse('product-detail', args=[product.id]))
+        self.assertIsNone(response.data['image_renditions'])
+
+    def test_warm_generates_files_and_exposes_urls(self):
+        product = self.create_product()
+        warm_product_images([product.id])
+        product.refresh_from_db()
+        self.assertTrue(product.image_renditions_ready)
+
+        for url in (
+            self.client.get(reverse('product-detail', args=[product.id])).data['image_renditions'],
+            self.client.get(reverse('product-list')).data['results'][0]['image_renditions'],
+        ):
+            self.assertEqual(set(url), {'thumbnail', 'list', 'detail'})
+            for rendition in url.values():
+                path = rendition.split(settings.MEDIA_URL, 1)[1]
+                self.assertTrue(os.path.exists(os.path.join(self.media_root, path)), path)
+
+    def test_new_image_resets_ready_flag(self):
+        product = self.create_product()
+        warm_product_images([product.id])
+        product.refresh_from_db()
+        product.image = 'product_images/other.png'
+        with mock.patch('orders.signals.warm_product_renditions.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+        delay.assert_called_once_with([product.id])
+        product.refresh_from_db()
+        self.assertFalse(product.image_renditions_ready)
+
+        # Сохранение без замены изображения задачу не ставит
+        with mock.patch('orders.signals.warm_product_renditions.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.save()
+        delay.assert_not_called()
+
+    def test_backfill_command_sync(self):
+        products = [self.create_product(f'Red {i}') for i in range(3)]
+        out = StringIO()
+        call_command('warm_product_images', '--sync', '--batch-size', '2', '--workers', '1', stdout=out)
+        self.assertIn('ошибок 0', out.getvalue())
+        self.assertEqual(Product.objects.filter(id__in=[p.id for p in products], image_renditions_ready=True).count(), 3)
+
+    def test_backfill_command_enqueues_batches(self):
+        for i in range(3):
+            self.create_product(f'Red {i}')
+        with mock.patch('orders.management.commands.warm_product_images.warm_product_renditions.delay') as delay:
+            call_command('warm_product_images', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual([len(call.args[0]) for call in delay.call_args_list], [2, 1])
+
+    def test_bulk_import_enqueues_only_changed_images(self):
+        path = os.path.join(self.media_root, 'products.csv')
+
+        def run_import(image):
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['supplier_username', 'name', 'price', 'image'])
+                writer.writerow(['image-seller', 'Imported', '5', image])
+            with mock.patch('orders.management.commands.import_products.warm_product_renditions.delay') as delay:
+                call_command('import_products', path, '--bulk', stdout=StringIO())
+            return delay
+
+        delay = run_import('product_images/red.png')
+        product = Product.objects.get(name='Imported')
+        delay.assert_called_once_with([product.id])
+
+        warm_product_images([product.id])
+        run_import('product_images/red.png').assert_not_called()
+        product.refresh_from_db()
+        self.assertTrue(product.image_renditions_ready)
+
+    def test_bulk_import_survives_broker_outage(self):
+        path = os.path.join(self.media_root, 'products.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['supplier_username', 'name', 'price', 'image'])
+            writer.writerow(['image-seller', 'Imported', '5', 'product_images/red.png'])
+        err = StringIO()
+        with mock.patch('orders.management.commands.import_products.warm_product_renditions.delay',
+                        side_effect=ConnectionError):
+            call_command('import_products', path, '--bulk', stdout=StringIO(), stderr=err)
+        self.assertIn('warm_product_images', err.getvalue())
+        self.assertFalse(os.path.exists(f'{path}.progress'))
+        self.assertFalse(Product.objects.get(name='Imported').image_renditions_ready)
+
+class SupplierOrderFeedTests(APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='feed-buyer', role='customer')
+        self.supplier_user = User.objects.create_user(username='feed-seller', role='supplier')
+        self.supplier = Supplier.objects.create(user=self.supplier_user, company_name='Feed')
+        other = Supplier.objects.create(user=User.objects.create_user(username='feed-other', role='supplier'), company_name='Other')
+        self.product = Product.objects.create(supplier=self.supplier, name='Mine', price=Decimal('2.50'))
+        self.second = Product.objects.create(supplier=self.supplier, name='Mine 2', price=1)
+        self.foreign = Product.objects.create(supplier=other, name='Foreign', price=7)
+
+    def test_create_order_fills_links(self):
+        order = create_order(self.customer, 'Addr', [
+            {'product': self.product, 'quantity': 2},
+            {'product': self.second, 'quantity': 3},
+            {'product': self.foreign, 'quantity': 1},
+        ])
+        links = {link.supplier_id: link for link in SupplierOrder.objects.filter(order=order)}
+        self.assertEqual(len(links), 2)
+        mine = links[self.supplier.id]
+        self.assertEqual((mine.item_count, mine.quantity, str(mine.total)), (2, 5, '8.00'))
+        self.assertEqual(mine.created_at, order.created_at)
+
+    def test_feed_lists_only_supplier_orders_newest_first(self):
+        mine = [create_order(self.customer, f'Addr {i}', [{'product': self.product, 'quantity': 1}]) for i in range(3)]
+        create_order(self.customer, 'Foreign', [{'product': self.foreign, 'quantity': 1}])
+        self.client.force_authenticate(self.supplier_user)
+
+        first = self.client.get(reverse('order-list'), {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        ids = [order['id'] for order in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, [order.id for order in reversed(mine)])
+        self.assertEqual(first.data['results'][0]['items'][0]['product']['name'], 'Mine')
+
+    def test_feed_query_uses_link_index(self):
+        links = SupplierOrder.objects.filter(supplier__user=self.supplier_user).order_by('-created_at', '-order_id')
+        plan = links.explain()
+        self.assertIn('supplier_order_feed_idx', plan)
+        self.assertNotIn('orders_orderitem', str(links.query))
+
+    def test_single_item_changes_refresh_links(self):
+        order = create_order(self.customer, 'Addr', [{'product': self.foreign, 'quantity': 1}])
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=4)
+        link = SupplierOrder.objects.get(order=order, supplier=self.supplier)
+        self.assertEqual((link.item_count, link.quantity, str(link.total)), (1, 4, '10.00'))
+        item.delete()
+        self.assertFalse(SupplierOrder.objects.filter(order=order, supplier=self.supplier).exists())
+
+    def test_cascade_delete_refreshes_each_order_once(self):
+        orders = [create_order(self.customer, 'Addr', [
+            {'product': self.product, 'quantity': 1}, {'product': self.foreign, 'quantity': 2},
+        ]) for _ in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            self.product.delete()
+        # Один пересчет итогов и SupplierOrder на всю операцию, а не на каждую позицию
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "orders_order"')]
+        self.assertEqual(len(updates), 1)
+        self.assertFalse(SupplierOrder.objects.filter(supplier=self.supplier).exists())
+        self.assertEqual(SupplierOrder.objects.filter(supplier=self.foreign.supplier).count(), 5)
+        self.assertEqual(
+            set(Order.objects.values_list('total', 'item_count')), {(Decimal('14.00'), 1)},
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            Order.objects.filter(id__in=[order.id for order in orders[:3]]).delete()
+        # Удаляемые заказы не пересчитываются
+        self.assertFalse([query for query in queries.captured_queries if query['sql'].startswith('UPDATE "orders_order"')])
+        self.assertEqual(SupplierOrder.objects.count(), 2)
+
+    def test_rebuild_command(self):
+        orders = [create_order(self.customer, 'Addr', [
+            {'product': self.product, 'quantity': 1}, {'product': self.foreign, 'quantity': 2},
+        ]) for _ in range(3)]
+        expected = sorted(SupplierOrder.objects.values_list('order_id', 'supplier_id', 'quantity', 'total'))
+        SupplierOrder.objects.all().delete()
+        SupplierOrder.objects.create(order=orders[0], supplier=self.supplier, created_at=orders[0].created_at, quantity=99)
+
+        out = StringIO()
+        call_command('rebuild_supplier_orders', '--chunk-size', '2', stdout=out)
+        self.assertIn('связей 6', out.getvalue())
+        self.assertEqual(sorted(SupplierOrder.objects.values_list('order_id', 'supplier_id', 'quantity', 'total')), expected)
+
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.customer = User.objects.create_user(username='async-buyer', role='customer')
+        self.token = Token.objects.create(user=self.customer)
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='async-seller', role='supplier'), company_name='A')
+        self.products = [
+            Product.objects.create(supplier=supplier, name=f'Async {i}', price=i + 1, custom_fields={'category': 'Cat'})
+            for i in range(3)
+        ]
+        self.order = create_order(self.customer, 'Addr', [{'product': self.products[0], 'quantity': 2}])
+
+    async def test_product_list_matches_sync_view(self):
+        sync = (await self.async_client.get(reverse('product-list'), {'page_size': 2})).json()
+        first = await self.async_client.get(reverse('async-product-list'), {'page_size': 2})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.json()['results'], sync['results'])
+        second = await self.async_client.get(first.json()['next'])
+        self.assertEqual([row['name'] for row in second.json()['results']], ['Async 2'])
+        self.assertIsNone(second.json()['next'])
+
+    async def test_product_list_filters_and_errors(self):
+        response = await self.async_client.get(reverse('async-product-list'), {'price_min': 2, 'fields': 'name'})
+        self.assertEqual(response.json()['results'], [{'name': 'Async 1'}, {'name': 'Async 2'}])
+        response = await self.async_client.get(reverse('async-product-list'), {'price_min': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('price_min', response.json())
+
+    async def test_product_detail_and_conditional_get(self):
+        url = reverse('async-product-detail', args=[self.products[1].id])
+        response = await self.async_client.get(url)
+        sync = await self.async_client.get(reverse('product-detail', args=[self.products[1].id]))
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(response['ETag'], sync['ETag'])
+        cached = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        missing = await self.async_client.get(reverse('async-product-detail', args=[999999]))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_order_detail_requires_token(self):
+        url = reverse('async-order-detail', args=[self.order.id])
+        self.assertEqual((await self.async_client.get(url)).status_code, status.HTTP_401_UNAUTHORIZED)
+        bad = await self.async_client.get(url, headers={'Authorization': 'Token nope'})
+        self.assertEqual(bad.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        headers = {'Authorization': f'Token {self.token.key}'}
+        response = await self.async_client.get(url, headers=headers)
+        sync = await self.async_client.get(reverse('order-detail', args=[self.order.id]), headers=headers)
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(response.json()['items'][0]['quantity'], 2)
+
+    async def test_async_routes_share_sync_throttles(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'products': '2/minute', 'anon': '1/minute'}):
+            self.assertEqual((await self.async_client.get(reverse('product-list'))).status_code, status.HTTP_200_OK)
+            self.assertEqual((await self.async_client.get(reverse('async-product-list'))).status_code, status.HTTP_200_OK)
+            throttled = await self.async_client.get(reverse('async-product-list'))
+            self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn('Retry-After', throttled)
+            self.assertIn('detail', throttled.json())
+
+            url = reverse('async-product-detail', args=[self.products[0].id])
+            self.assertEqual((await self.async_client.get(url)).status_code, status.HTTP_200_OK)
+            self.assertEqual((await self.async_client.get(url)).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            # Пользователь с токеном считается по своему лимиту, а не по анонимному
+            headers = {'Authorization': f'Token {self.token.key}'}
+            self.assertEqual((await self.async_client.get(url, headers=headers)).status_code, status.HTTP_200_OK)
+
+class SlidingWindowThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.now = 1000 * 60.0
+
+    def make_throttle(self):
+        throttle = UserSlidingThrottle()
+        throttle.rate, throttle.num_requests, throttle.duration = '3/min', 3, 60
+        throttle.timer = lambda: self.now
+        return throttle
+
+    def allow(self, throttle=None):
+        request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1')
+        request.user = AnonymousUser()
+        return (throttle or self.make_throttle()).allow_request(request, None)
+
+    def test_limit_is_shared_between_instances(self):
+        # Каждый экземпляр — как отдельный процесс: счетчик общий, лимит не умножается
+        self.assertEqual([self.allow() for _ in range(4)], [True, True, True, False])
+
+    def test_rejected_requests_do_not_consume_limit(self):
+        for _ in range(10):
+            self.allow()
+        self.now += 60
+        # Предыдущее окно учитывается с весом 1: отклоненные запросы в счетчик не попали
+        self.assertFalse(self.allow())
+        self.now += 30
+        self.assertEqual([self.allow() for _ in range(2)], [True, False])
+
+    def test_wait_reports_time_to_next_window(self):
+        for _ in range(3):
+            self.allow()
+        self.now += 15
+        throttle = self.make_throttle()
+        self.assertFalse(self.allow(throttle))
+        self.assertAlmostEqual(throttle.wait(), 45)
+
+    def test_register_has_own_scope(self):
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'register': '2/minute'}):
+            codes = [
+                self.client.post(reverse('register'), {'username': f'new{i}', 'password': 'StrongPassword123'}).status_code
+                for i in range(3)
+            ]
+        self.assertEqual(codes, [status.HTTP_201_CREATED, status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS])
+
+    def test_authenticated_user_skips_anon_scope(self):
+        self.client.force_authenticate(User.objects.create_user(username='throttle-user'))
+        with mock.patch.dict(api_settings.DEFAULT_THROTTLE_RATES, {'anon': '1/minute'}):
+            codes = {self.client.get(reverse('order-list')).status_code for _ in range(3)}
+        self.assertEqual(codes, {status.HTTP_200_OK})
+
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        token_local_cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(token_local_cache.clear)
+        self.user = User.objects.create_user(username='token-user', password='StrongPassword123', role='customer')
+        response = self.client.post(reverse('login'), {'username': 'token-user', 'password': 'StrongPassword123'})
+        self.key = response.data['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [q['sql'] for q in context.captured_queries if 'authtoken_token' in q['sql'] and 'silk_' not in q['sql'] and 'EXPLAIN' not in q['sql']]
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(len(self.token_queries()), 1)
+        self.assertEqual(self.token_queries(), [])
+        # Из общего кэша, если LRU процесса пуст (другой процесс)
+        token_local_cache.clear()
+        self.assertEqual(self.token_queries(), [])
+
+    def test_deleted_token_is_rejected(self):
+        self.token_queries()
+        Token.objects.filter(key=self.key).first().delete()
+        self.assertEqual(self.client.get(reverse('cart')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.token_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('cart')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_role_change_is_visible(self):
+        self.token_queries()
+        self.user.role = 'supplier'
+        self.user.save()
+        response = self.client.get(reverse('product-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_snapshot_has_no_password_and_user_stays_saveable(self):
+        user, _ = CachedTokenAuthentication().authenticate_credentials(self.key)
+        self.assertNotIn(self.user.password, cache.get(_token_cache_key(self.key))['user'])
+        self.assertIn('password', user.get_deferred_fields())
+        user.first_name = 'Cached'
+        user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Cached')
+        self.assertTrue(self.user.check_password('StrongPassword123'))
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='instr-seller', role='supplier'), company_name='I')
+        Product.objects.create(supplier=supplier, name='Instr', price=1)
+
+    def test_collects_queries_and_serializer_time(self):
+        with collect_request_stats() as stats:
+            response = self.client.get(reverse('product-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(stats.queries, 0)
+        self.assertGreater(stats.query_time, 0)
+        self.assertGreater(stats.timings['serialize'], 0)
+
+    def test_nested_timed_blocks_are_not_double_counted(self):
+        with collect_request_stats() as stats, mock.patch('orders.instrumentation.time.perf_counter', side_effect=[0, 10]):
+            with timed('serialize'):
+                with timed('serialize'):
+                    pass
+        self.assertEqual(stats.timings['serialize'], 10)
+
+    def test_timed_outside_collection_is_noop(self):
+        with timed('serialize'):
+            pass
+
+    def test_bench_covers_all_routes(self):
+        self.assertEqual(uncovered_url_names(), [])
+        stats = EndpointResult('x', latencies=[0.001, 0.002, 0.003, 0.004], queries=[1, 1, 2, 2],
+                               serialize=[0.001] * 4, statuses={200: 3, 500: 1}, elapsed=0.5).as_dict()
+        self.assertEqual((stats['rps'], stats['p50_ms'], stats['queries_per_request'], stats['errors']), (8.0, 3.0, 1.5, 1))
+
+class SeedCommandTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def seed(self, **options):
+        options = {'suppliers': 3, 'customers': 20, 'products': 60, 'orders': 40, 'carts': 5,
+                   'until': '2026-01-01', 'workers': 1, **options}
+        call_command('seed', stdout=StringIO(), **options)
+
+    def test_columns_cover_models(self):
+        from django.apps import apps
+        for label, columns in COLUMNS.items():
+            fields = {field.attname for field in apps.get_model(label)._meta.concrete_fields}
+            self.assertEqual(fields - {'id'}, set(columns) - {'id'}, label)
+
+    def test_seed_creates_consistent_data(self):
+        self.seed()
+        self.assertEqual(Supplier.objects.count(), 3)
+        self.assertEqual(Product.objects.count(), 60)
+        self.assertEqual(Order.objects.count(), 40)
+        self.assertEqual(Cart.objects.count(), 5)
+        self.assertTrue(OrderItem.objects.exists())
+        self.assertFalse(Order.objects.exclude(customer__role='customer').exists())
+        self.assertEqual(Product.objects.filter(custom_fields__category=F('category')).count(), 60)
+        links = list(SupplierOrder.objects.order_by('order_id', 'supplier_id').values_list('order_id', 'supplier_id', 'total'))
+        refresh_supplier_orders(Order.objects.values_list('id', flat=True))
+        self.assertEqual(links, list(SupplierOrder.objects.order_by('order_id', 'supplier_id').values_list('order_id', 'supplier_id', 'total')))
+        totals = list(Order.objects.order_by('id').values_list('id', 'total', 'item_count'))
+        refresh_order_totals(Order.objects.values_list('id', flat=True))
+        self.assertEqual(totals, list(Order.objects.order_by('id').values_list('id', 'total', 'item_count')))
+        product = Product.objects.first()
+        self.assertIn(product, search_products(Product.objects.all(), product.name.split()[0]))
+
+    def test_seed_appends_after_existing_rows(self):
+        self.seed()
+        self.seed(seed=7)
+        self.assertEqual(Product.objects.count(), 120)
+        self.assertEqual(User.objects.count(), 46)
+
+    def test_generation_is_deterministic(self):
+        plan = Plan(PRESETS['small'], 5, 1.7e9, 30, 1, 1, 1, 1, 1)
+        first = orders_chunk(plan, 100, 200)
+        self.assertEqual(first, orders_chunk(plan, 100, 200))
+        self.assertNotEqual(first, orders_chunk(Plan(PRESETS['small'], 6, 1.7e9, 30, 1, 1, 1, 1, 1), 100, 200))
+
+    def test_rejects_other_vendors(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'), self.assertRaises(CommandError):
+            self.seed()
+
+class ServerTimingMiddlewareTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for metric in METRICS_REGISTRY:
+            metric.clear()
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='timing-seller', role='supplier'), company_name='T')
+        self.product = Product.objects.create(supplier=supplier, name='Timing', price=1)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('product-list'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertRegex(timing, r'serialize;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+$')
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('product-list')))
+
+    async def test_async_views_count_queries(self):
+        response = await self.async_client.get(reverse('async-product-detail', args=[self.product.id]))
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('product-list'))
+        self.client.get(reverse('product-detail', args=[self.product.id]))
+        self.client.force_login(User.objects.create_user(username='timing-staff', is_staff=True))
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{view="product-list",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{view="product-detail",le="+Inf"} 1', body)
+        self.assertIn('http_request_serialize_duration_seconds_count{view="product-list"} 1', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN=None)
+    def test_metrics_closed_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_login(User.objects.create_user(username='timing-buyer'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_login(User.objects.create_user(username='timing-staff', is_staff=True))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_200_OK)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', 'Тест', ['view'], (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, 'x')
+        self.assertEqual(histogram.collect()[2:], [
+            'test_seconds_bucket{view="x",le="0.1"} 2',
+            'test_seconds_bucket{view="x",le="1.0"} 3',
+            'test_seconds_bucket{view="x",le="+Inf"} 4',
+            'test_seconds_sum{view="x"} 3.65',
+            'test_seconds_count{view="x"} 4',
+        ])
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # Без внешней транзакции TestCase: внутри транзакции чтение всегда идет в default.
+    # Роль реплики играет сама default, выбор реплики перехватывается моком.
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.customer = User.objects.create_user(username='replica-buyer', role='customer')
+        self.token = Token.objects.create(user=self.customer)
+        supplier = Supplier.objects.create(user=User.objects.create_user(username='replica-seller', role='supplier'), company_name='R')
+        self.product = Product.objects.create(supplier=supplier, name='Replica', price=3)
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+        cache.clear()
+
+    def replica_reads(self, method, url, **kwargs):
+        with override_settings(REPLICA_DATABASES=['default']), \
+                mock.patch('orders.db_routing.random.choice', side_effect=lambda replicas: replicas[0]) as choice:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, choice.call_count
+
+    def test_read_views_use_replica(self):
+        response, reads = self.replica_reads('get', reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(reads, 0)
+        response, reads = self.replica_reads('get', reverse('order-list'), headers=self.headers)
+        self.assertGreater(reads, 0)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_other_views_read_primary(self):
+        _, reads = self.replica_reads('get', reverse('cart'), headers=self.headers)
+        self.assertEqual(reads, 0)
+
+    def test_write_makes_client_sticky(self):
+        response, _ = self.replica_reads('post', reverse('cart'), data={'product_id': self.product.id, 'quantity': 1},
+                                         content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        # Закрепление по пользователю работает и для клиента без cookie
+        self.client.cookies.clear()
+        _, reads = self.replica_reads('get', reverse('order-list'), headers=self.headers)
+        self.assertEqual(reads, 0)
+
+    def test_sticky_cookie_reads_primary(self):
+        self.client.cookies[STICKY_COOKIE] = '1'
+        _, reads = self.replica_reads('get', reverse('product-detail', args=[self.product.id]))
+        self.assertEqual(reads, 0)
+
+    def test_write_detection(self):
+        state, token = begin_request()
+        self.addCleanup(end_request, token)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.execute("UPDATE django_session SET expire_date = expire_date WHERE session_key = 'x'")
+        self.assertFalse(state.wrote)
+        Product.objects.filter(id=self.product.id).update(price=4)
+        self.assertTrue(state.wrote)
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(ReplicaRouter().allow_migrate('replica1', 'orders'))
+        self.assertIsNone(ReplicaRouter().allow_migrate('default', 'orders'))
+
+
+class OrderArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.customer = User.objects.create_user(username='archive-buyer', role='customer')
+        self.supplier_user = User.objects.create_user(username='archive-seller', role='supplier')
+        supplier = Supplier.objects.create(user=self.supplier_user, company_name='Archive')
+        self.products = [Product.objects.create(supplier=supplier, name=f'Archive {i}', price=i + 1) for i in range(2)]
+        # Старые доставленные, старый недоставленный, недавно доставленный
+        self.orders = [
+            create_order(self.customer, f'Addr {i}', [
+                {'product': self.products[0], 'quantity': i + 1}, {'product': self.products[1], 'quantity': 1},
+            ])
+            for i in range(4)
+        ]
+        Order.objects.filter(id__in=[order.id for order in self.orders[:2]]).update(status='delivered')
+        Order.objects.filter(id=self.orders[3].id).update(status='delivered')
+        Order.objects.filter(id__in=[order.id for order in self.orders[:3]]).update(
+            updated_at=timezone.now() - timedelta(days=100),
+        )
+        self.archived_ids = {self.orders[0].id, self.orders[1].id}
+        self.client.force_authenticate(self.customer)
+
+    def order_ids(self, response):
+        return [order['id'] for order in response.data['results']]
+
+    def test_archives_old_delivered_orders_in_batches(self):
+        url = reverse('order-detail', args=[self.orders[0].id])
+        before = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(archive_orders(days=30, batch_size=1), 2)
+        # По транзакции на пачку
+        self.assertEqual(sum(query['sql'].startswith('SAVEPOINT') for query in queries.captured_queries), 2)
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), self.archived_ids)
+        self.assertFalse(Order.objects.filter(id__in=self.archived_ids).exists())
+        self.assertFalse(OrderItem.objects.filter(order_id__in=self.archived_ids).exists())
+        self.assertEqual(SupplierOrder.objects.filter(order_id__in=self.archived_ids).count(), 2)
+        archived = ArchivedOrder.objects.get(id=self.orders[0].id)
+        self.assertEqual([item[1:] for item in archived.items], [[self.products[0].id, 1, '1.00'], [self.products[1].id, 1, '2.00']])
+
+        after = self.client.get(url)
+        self.assertEqual(after.status_code, status.HTTP_200_OK)
+        self.assertEqual(after.json(), before.json())
+        self.assertEqual(after['ETag'], before['ETag'])
+        self.assertEqual(archive_orders(days=30), 0)
+
+    def test_customer_list_merges_hot_and_archived_orders(self):
+        archive_orders(days=30)
+        expected = [order.id for order in reversed(self.orders)]
+        first = self.client.get(reverse('order-list'), {'page_size': 3})
+        self.assertIsNone(first.data['previous'])
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.order_ids(first) + self.order_ids(second), expected)
+        self.assertIsNone(second.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(self.order_ids(back), expected[:3])
+        archived = next(order for order in second.data['results'] if order['id'] == self.orders[0].id)
+        self.assertEqual(archived['items'][0]['product']['name'], 'Archive 0')
+        self.assertEqual(self.client.get(reverse('order-list'), {'cursor': 'bad'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_supplier_feed_includes_archived_orders(self):
+        archive_orders(days=30)
+        self.client.force_authenticate(self.supplier_user)
+        response = self.client.get(reverse('order-list'))
+        self.assertEqual(self.order_ids(response), [order.id for order in reversed(self.orders)])
+
+    async def test_async_order_detail_reads_archive(self):
+        await sync_to_async(archive_orders)(days=30)
+        token = await Token.objects.acreate(user=self.customer)
+        headers = {'Authorization': f'Token {token.key}'}
+        response = await self.async_client.get(reverse('async-order-detail', args=[self.orders[1].id]), headers=headers)
+        sync = await self.async_client.get(reverse('order-detail', args=[self.orders[1].id]), headers=headers)
+        self.assertEqual(response.json(), sync.json())
+        self.assertEqual(response.json()['items'][0]['quantity'], 2)
+
+    def test_command_and_deletion_cleanup(self):
+        out = StringIO()
+        call_command('archive_orders', days=30, batch_size=10, stdout=out)
+        self.assertIn('Перенесено в архив заказов: 2', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('archive_orders', batch_size=0, stdout=StringIO())
+        self.customer.delete()
+        self.assertFalse(ArchivedOrder.objects.exists())
+        self.assertFalse(SupplierOrder.objects.exists())
+
+class SalesRollupTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(username='rollup-buyer', role='customer')
+        self.supplier_user = User.objects.create_user(username='rollup-seller', role='supplier')
+        supplier = Supplier.objects.create(user=self.supplier_user, company_name='Rollup')
+        other = Supplier.objects.create(user=User.objects.create_user(username='rollup-other', role='supplier'), company_name='O')
+        self.products = [Product.objects.create(supplier=supplier, name=f'Rollup {i}', price=i + 2) for i in range(2)]
+        self.foreign = Product.objects.create(supplier=other, name='Foreign rollup', price=10)
+        self.orders = [
+            create_order(self.customer, 'Addr', [
+                {'product': self.products[0], 'quantity': 3}, {'product': self.foreign, 'quantity': 1},
+            ]),
+            create_order(self.customer, 'Addr', [{'product': self.products[1], 'quantity': 2}]),
+        ]
+        self.today = timezone.localdate()
+
+    def rollups(self):
+        return {
+            (row.product_id, row.day, row.status): (row.units, row.revenue)
+            for row in SalesRollup.objects.exclude(units=0)
+        }
+
+    def assertRebuildMatches(self):
+        incremental = self.rollups()
+        rebuild_sales_rollups()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_rollups_follow_creation_and_status_changes(self):
+        self.assertEqual(self.rollups(), {
+            (self.products[0].id, self.today, 'pending'): (3, Decimal('6.00')),
+            (self.foreign.id, self.today, 'pending'): (1, Decimal('10.00')),
+            (self.products[1].id, self.today, 'pending'): (2, Decimal('6.00')),
+        })
+        self.assertEqual(SalesRollup.objects.get(product=self.foreign).supplier_id, self.foreign.supplier_id)
+
+        change_order_status(self.orders[0], 'confirmed')
+        transition_orders(Order.objects.all(), 'shipped')
+        self.assertEqual(self.rollups(), {
+            (self.products[0].id, self.today, 'shipped'): (3, Decimal('6.00')),
+            (self.foreign.id, self.today, 'shipped'): (1, Decimal('10.00')),
+            (self.products[1].id, self.today, 'shipped'): (2, Decimal('6.00')),
+        })
+        self.assertRebuildMatches()
+
+    def test_single_item_edits_and_deletes_update_rollups(self):
+        item = OrderItem.objects.get(order=self.orders[0], product=self.products[0])
+        item.quantity = 5
+        item.save()
+        OrderItem.objects.create(order=self.orders[1], product=self.products[0], quantity=1)
+        OrderItem.objects.get(order=self.orders[0], product=self.foreign).delete()
+        order = Order.objects.get(pk=self.orders[1].pk)
+        order.status = 'delivered'
+        order.save()
+        self.assertEqual(self.rollups(), {
+            (self.products[0].id, self.today, 'pending'): (5, Decimal('10.00')),
+            (self.products[0].id, self.today, 'delivered'): (1, Decimal('2.00')),
+            (self.products[1].id, self.today, 'delivered'): (2, Decimal('6.00')),
+        })
+        self.assertRebuildMatches()
+
+        Order.objects.get(pk=self.orders[0].pk).delete()
+        self.assertNotIn((self.products[0].id, self.today, 'pending'), self.rollups())
+
+    def test_cascade_deletes_update_rollups_once(self):
+        for _ in range(5):
+            create_order(self.customer, 'Addr', [
+                {'product': self.products[0], 'quantity': 1}, {'product': self.products[1], 'quantity': 1},
+            ])
+
+        def rollup_queries(delete):
+            with CaptureQueriesContext(connection) as queries:
+                delete()
+            return [
+                query['sql'] for query in queries.captured_queries
+                if 'orders_salesrollup' in query['sql'] and 'silk_' not in query['sql'] and not query['sql'].startswith('EXPLAIN')
+            ]
+
+        # Агрегаты удаляемого товара удаляет каскад, без вычитания по позициям
+        self.assertEqual(len(rollup_queries(self.products[0].delete)), 1)
+        self.assertEqual(self.rollups(), {
+            (self.foreign.id, self.today, 'pending'): (1, Decimal('10.00')),
+            (self.products[1].id, self.today, 'pending'): (7, Decimal('21.00')),
+        })
+        # Удаление покупателя со всеми заказами: одно вычитание на всю операцию
+        self.assertLessEqual(len(rollup_queries(self.customer.delete)), 3)
+        self.assertEqual(self.rollups(), {})
+
+    def test_batch_creation_updates_in_constant_queries(self):
+        self.client.force_authenticate(self.customer)
+        entry = {'delivery_address': 'ERP', 'items': [{'product_id': self.products[0].id, 'quantity': 1}]}
+        size = [0]
+
+        def grow(count):
+            size[0] += count
+
+        self.assertConstantQueries(
+            grow, lambda: self.client.post(reverse('order-batch-create'), {'orders': [entry] * size[0]}, format='json'),
+        )
+        self.assertRebuildMatches()
+
+    def test_archiving_keeps_rollups(self):
+        transition_orders(Order.objects.all(), 'delivered')
+        Order.objects.update(updated_at=timezone.now() - timedelta(days=100))
+        before = self.rollups()
+        self.assertEqual(archive_orders(days=30), 2)
+        self.assertEqual(self.rollups(), before)
+        self.assertRebuildMatches()
+
+        ArchivedOrder.objects.get(pk=self.orders[1].pk).delete()
+        self.assertNotIn((self.products[1].id, self.today, 'delivered'), self.rollups())
+
+    def test_rebuild_command(self):
+        SalesRollup.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_sales_rollups', '--since', self.today.isoformat(), stdout=out)
+        self.assertIn('строк агрегатов 3', out.getvalue())
+        self.assertEqual(SalesRollup.objects.count(), 3)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sales_rollups', '--since', 'yesterday')
+
+    def test_analytics_reads_only_requested_range(self):
+        url = reverse('sales-analytics')
+        old = self.today - timedelta(days=40)
+        SalesRollup.objects.create(
+            supplier=self.products[0].supplier, product=self.products[0], day=old, status='delivered',
+            units=7, revenue=Decimal('14.00'),
+        )
+        self.client.force_authenticate(self.supplier_user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['date_to'], self.today.isoformat())
+        self.assertEqual(response.data['totals'], {'units': 5, 'revenue': '12.00'})
+        self.assertEqual([row['product'] for row in response.data['rows']], [self.products[0].id, self.products[1].id])
+
+        response = self.client.get(url, {'date_from': old.isoformat(), 'date_to': old.isoformat()})
+        self.assertEqual(response.data['rows'], [
+            {'day': old.isoformat(), 'product': self.products[0].id, 'units': 7, 'revenue': '14.00'},
+        ])
+        response = self.client.get(url, {'product': self.products[1].id, 'status': 'pending'})
+        self.assertEqual(response.data['totals'], {'units': 2, 'revenue': '6.00'})
+
+        for params in ({'date_from': 'вчера'}, {'date_from': '2020-01-02', 'date_to': '2020-01-01'},
+                       {'date_from': '2020-01-01', 'date_to': '2021-06-01'}, {'product': 'x'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST, params)
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
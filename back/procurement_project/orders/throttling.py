@@ -0,0 +1,60 @@
+import contextlib
+from rest_framework.throttling import AnonRateThrottle, ScopedRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Тротлинг скользящим окном на двух счетчиках в общем кэше (settings.CACHES).
+
+    Вместо списка отметок времени (SimpleRateThrottle — O(n) на запрос и
+    перезапись всего списка) хранится по счетчику на фиксированное окно.
+    Число запросов за последние duration секунд оценивается как
+    prev * (доля предыдущего окна, попавшая в скользящее) + current.
+    На запрос приходятся атомарный cache.incr и один cache.get, поэтому лимит
+    соблюдается сразу для всех процессов, работающих с одним Redis.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        current_key = f'{self.key}:{window}'
+        current = self.increment(current_key)
+        previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        self.elapsed = (self.now % self.duration) / self.duration
+        if previous * (1 - self.elapsed) + current <= self.num_requests:
+            return True
+        # Отклоненный запрос не расходует лимит
+        with contextlib.suppress(ValueError):
+            self.cache.decr(current_key)
+        return self.throttle_failure()
+
+    def increment(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Первый запрос в окне; ключ живет два окна, пока нужен как «предыдущий»
+            if self.cache.add(key, 1, timeout=self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def wait(self):
+        # Не позже начала следующего окна счетчик текущего начинает убывать
+        return self.duration * (1 - self.elapsed)
+
+
+class AnonSlidingThrottle(AnonRateThrottle, SlidingWindowThrottle):
+    """Лимит для анонимных запросов по IP (scope 'anon')."""
+
+
+class UserSlidingThrottle(UserRateThrottle, SlidingWindowThrottle):
+    """Лимит на пользователя, для анонимных — на IP (scope 'user')."""
+
+
+class ScopedSlidingThrottle(ScopedRateThrottle, SlidingWindowThrottle):
+    """Отдельный лимит эндпоинта: scope берется из атрибута представления throttle_scope."""
@@ -1,19 +1,29 @@
 from django.urls import path
+from .async_views import OrderDetailAsyncView, ProductDetailAsyncView, ProductListAsyncView
 from .views import (
-    RegisterView, LoginView, ProductListView, ProductDetailView,
-    CartView, OrderCreateView, OrderListView, OrderDetailView,
-    OrderStatusUpdateView, ErrorTestView
+    RegisterView, LoginView, ProductListView, ProductDetailView, ProductExportView,
+    CartView, CartCheckoutView, OrderCreateView, OrderBatchCreateView, OrderListView, OrderDetailView,
+    OrderStatusUpdateView, OrderBulkStatusView, SalesAnalyticsView, ErrorTestView
 )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('products/', ProductListView.as_view(), name='product-list'),
+    path('products/export/', ProductExportView.as_view(), name='product-export'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
     path('cart/', CartView.as_view(), name='cart'),
+    path('cart/checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
     path('orders/create/', OrderCreateView.as_view(), name='order-create'),
+    path('orders/batch/', OrderBatchCreateView.as_view(), name='order-batch-create'),
     path('orders/', OrderListView.as_view(), name='order-list'),
+    path('orders/status/', OrderBulkStatusView.as_view(), name='order-status-bulk'),
     path('orders/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/<int:pk>/status/', OrderStatusUpdateView.as_view(), name='order-status-update'),
+    path('analytics/', SalesAnalyticsView.as_view(), name='sales-analytics'),
+    # Async-варианты эндпоинтов чтения (выигрыш дают только под ASGI-сервером)
+    path('async/products/', ProductListAsyncView.as_view(), name='async-product-list'),
+    path('async/products/<int:pk>/', ProductDetailAsyncView.as_view(), name='async-product-detail'),
+    path('async/orders/<int:pk>/', OrderDetailAsyncView.as_view(), name='async-order-detail'),
     path('error-test/', ErrorTestView.as_view(), name='error-test'),
 ]
@@ -1,22 +1,45 @@
 from rest_framework import generics, status, views
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.views.decorators.cache import cache_page
-from django.utils.decorators import method_decorator
-from rest_framework.throttling import UserRateThrottle
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db.models import Count, Max, Prefetch, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.crypto import constant_time_compare
 
 # Импорт для авторизации через токены
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 
-from .models import Product, Order, Cart, CartItem
-from .serializers import ProductSerializer, OrderSerializer, CartSerializer, CartItemSerializer, UserSerializer
+from .archive import archived_order_stats, restore_orders
+from .cache import get_or_compute_products
+from .conditional import ConditionalGetMixin, make_etag
+from .db_routing import ReplicaReadMixin
+from .filters import filter_products, filter_sales
+from .metrics import render_metrics
+from .exports import iter_csv, iter_gzip, iter_product_rows
+from .models import ArchivedOrder, Product, Order, OrderItem, Cart, CartItem, SalesRollup, SupplierOrder
+from .pagination import (
+    MergedOrderCursorPagination, OrderCursorPagination, ProductCursorPagination, SupplierOrderCursorPagination,
+)
+from .throttling import ScopedSlidingThrottle
+from .services import (
+    add_to_cart, can_transition, change_order_status, checkout_cart, create_orders, notify_order_created,
+    notify_orders_created, notify_status_changed, transition_orders,
+)
+from .serializers import (
+    parse_product_fields, product_columns, ProductSerializer, ProductReadSerializer, OrderSerializer, OrderReadSerializer,
+    OrderStatusBulkSerializer, CartSerializer, CartItemSerializer, UserSerializer, validate_order_batch,
+)
 
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
+# Весь граф заказа/корзины загружается фиксированным числом запросов:
+# позиции одним запросом, товары через JOIN (поставщик в ответе — только id).
+ORDER_ITEMS_PREFETCH = Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+CART_ITEMS_PREFETCH = Prefetch('items', queryset=CartItem.objects.select_related('product'))
+
 class RegisterView(generics.CreateAPIView):
     """
     API endpoint для регистрации пользователя.
@@ -24,7 +47,9 @@ class RegisterView(generics.CreateAPIView):
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    throttle_classes = []  # отключаем тротлинг для регистрации
+    # Отдельный строгий лимит на IP против массовой регистрации
+    throttle_classes = [ScopedSlidingThrottle]
+    throttle_scope = 'register'
 
 class LoginView(ObtainAuthToken):
     """
@@ -37,26 +62,90 @@ class LoginView(ObtainAuthToken):
         token, created = Token.objects.get_or_create(user=user)
         return Response({'token': token.key, 'user_id': user.pk, 'username': user.username})
 
-class ProductListView(generics.ListAPIView):
+class ProductListView(ReplicaReadMixin, ConditionalGetMixin, generics.ListAPIView):
     """
     API endpoint для получения списка товаров.
-    Применяется кэширование на 15 минут и тротлинг.
+    Поддерживает фильтры supplier, price_min, price_max, category, поиск search
+    и выбор полей ?fields=id,name,price (в SQL читаются только эти колонки).
+    Список формируется быстрым ProductReadSerializer из .values().
+    Применяется курсорная пагинация, тротлинг, условный GET (ETag/Last-Modified)
+    и кэширование с точной инвалидацией при изменении товаров и поставщиков (orders.cache).
+    Чтение идет с реплики БД, если она настроена (orders.db_routing).
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    throttle_classes = [UserRateThrottle]
+    pagination_class = ProductCursorPagination
+    throttle_classes = [ScopedSlidingThrottle]
+    throttle_scope = 'products'
+
+    def get_queryset(self):
+        return filter_products(super().get_queryset(), self.request.query_params)
+
+    def get_validators(self, request, *args, **kwargs):
+        params = sorted(request.query_params.lists())
 
-    @method_decorator(cache_page(60 * 15))
-    def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        def compute():
+            stats = self.get_queryset().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+            return make_etag('product-list', params, stats['last_modified'], stats['count']), stats['last_modified']
 
-class ProductDetailView(generics.RetrieveAPIView):
+        return get_or_compute_products(('list-validators', params), compute)
+
+    def list(self, request, *args, **kwargs):
+        # Ссылки курсорной пагинации абсолютные, поэтому хост входит в ключ
+        parts = ('list', request.build_absolute_uri('/'), sorted(request.query_params.lists()))
+        return Response(get_or_compute_products(parts, self.render_page))
+
+    def render_page(self):
+        fields = parse_product_fields(self.request.query_params)
+        page = self.paginate_queryset(self.get_queryset().values(*product_columns(fields)))
+        context = {**self.get_serializer_context(), 'fields': fields}
+        serializer = ProductReadSerializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data).data
+
+class ProductDetailView(ReplicaReadMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     """
     API endpoint для получения деталей товара.
+    Поддерживает условный GET (ETag/Last-Modified), читает с реплики БД.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
 
+    def get_validators(self, request, *args, **kwargs):
+        pk = kwargs['pk']
+
+        def compute():
+            last_modified = Product.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+            if last_modified is None:
+                return None, None
+            return make_etag('product', pk, last_modified), last_modified
+
+        return get_or_compute_products(('detail-validators', pk), compute)
+
+    def retrieve(self, request, *args, **kwargs):
+        parts = ('detail', request.build_absolute_uri('/'), kwargs['pk'])
+        data = get_or_compute_products(parts, lambda: super(ProductDetailView, self).retrieve(request, *args, **kwargs).data)
+        return Response(data)
+
+class ProductExportView(views.APIView):
+    """
+    API endpoint для выгрузки каталога поставщика в CSV.
+    Ответ отдается потоком, ?compress=gzip включает сжатие.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'supplier':
+            return Response({"error": "Экспорт доступен только поставщикам"}, status=status.HTTP_403_FORBIDDEN)
+        products = Product.objects.filter(supplier__user=request.user)
+        content = iter_csv(iter_product_rows(products))
+        if request.query_params.get('compress') == 'gzip':
+            content, content_type, filename = iter_gzip(content), 'application/gzip', 'products.csv.gz'
+        else:
+            content_type, filename = 'text/csv; charset=utf-8', 'products.csv'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 class CartView(views.APIView):
     """
     API endpoint для работы с корзиной пользователя.
@@ -64,79 +153,178 @@ class CartView(views.APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        cart, _ = Cart.objects.prefetch_related(CART_ITEMS_PREFETCH).get_or_create(user=request.user)
         serializer = CartSerializer(cart)
         return Response(serializer.data)
 
     def post(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
         serializer = CartItemSerializer(data=request.data)
         if serializer.is_valid():
-            CartItem.objects.create(cart=cart, **serializer.validated_data)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            item, created = add_to_cart(request.user, **serializer.validated_data)
+            return Response(
+                CartItemSerializer(item).data,
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
         product_id = request.data.get('product_id')
         if not product_id:
             return Response({"error": "Не указан product_id"}, status=status.HTTP_400_BAD_REQUEST)
-        CartItem.objects.filter(cart=cart, product_id=product_id).delete()
+        CartItem.objects.filter(cart__user=request.user, product_id=product_id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class CartCheckoutView(views.APIView):
+    """
+    API endpoint для оформления корзины в заказ.
+    Заказ, позиции и очистка корзины выполняются в одной транзакции.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        delivery_address = request.data.get('delivery_address')
+        if not delivery_address:
+            return Response({"error": "Не указан delivery_address"}, status=status.HTTP_400_BAD_REQUEST)
+        order = checkout_cart(request.user, delivery_address)
+        if order is None:
+            return Response({"error": "Корзина пуста"}, status=status.HTTP_400_BAD_REQUEST)
+        order = Order.objects.prefetch_related(ORDER_ITEMS_PREFETCH).get(pk=order.pk)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
 class OrderCreateView(generics.CreateAPIView):
     """
     API endpoint для создания заказа.
-    Отправляет уведомления клиенту и администратору по email.
+    Уведомления клиенту и администратору отправляются фоновыми задачами Celery
+    после коммита транзакции.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
 
     def perform_create(self, serializer):
         order = serializer.save(customer=self.request.user)
-        # Отправка email клиенту
-        send_mail(
-            subject='Подтверждение заказа',
-            message=f'Ваш заказ #{order.id} принят. Спасибо за покупку!',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[self.request.user.email],
-        )
-        # Отправка email администратору
-        send_mail(
-            subject='Новый заказ',
-            message=f'Заказ #{order.id} от {self.request.user.username}',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.DEFAULT_FROM_EMAIL],
+        notify_order_created(order.id)
+
+class OrderBatchCreateView(views.APIView):
+    """
+    API endpoint для пакетной загрузки заказов (интеграция с ERP): {"orders": [...]},
+    до ORDER_BATCH_MAX_ORDERS заказов в формате OrderCreateView.
+    Товары всей пачки проверяются одним запросом, корректные заказы создаются
+    bulk_create в одной транзакции. В ответе — результат по каждому заказу в порядке
+    запроса: id созданного заказа или его ошибки. Если не создан ни один заказ — 400.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        rows = request.data.get('orders') if isinstance(request.data, dict) else None
+        if not isinstance(rows, list) or not rows:
+            return Response({"error": "Ожидается непустой список orders"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = getattr(settings, 'ORDER_BATCH_MAX_ORDERS', 5000)
+        if len(rows) > limit:
+            return Response({"error": f"Не больше {limit} заказов за запрос"}, status=status.HTTP_400_BAD_REQUEST)
+
+        orders, errors = validate_order_batch(rows)
+        created = create_orders(request.user, [data for _, data in orders]) if orders else []
+        notify_orders_created([order.id for order in created])
+        results = {index: {'index': index, 'id': order.id} for (index, _), order in zip(orders, created)}
+        results.update((index, {'index': index, 'errors': error}) for index, error in errors.items())
+        return Response(
+            {'created': len(created), 'failed': len(errors), 'results': [results[index] for index in range(len(rows))]},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
         )
 
-class OrderListView(generics.ListAPIView):
+class OrderListView(ReplicaReadMixin, generics.ListAPIView):
     """
     API endpoint для получения списка заказов текущего пользователя.
+    Применяется курсорная пагинация по дате создания,
+    ответ формирует быстрый OrderReadSerializer, чтение — с реплики БД.
+    Заказы, перенесенные в архив (orders.archive), остаются в списке.
     """
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
+
+    def get_serializer_class(self):
+        # Для генерации схемы OpenAPI остается полноценный OrderSerializer
+        if getattr(self, 'swagger_fake_view', False):
+            return OrderSerializer
+        return OrderReadSerializer
 
     def get_queryset(self):
+        orders = Order.objects.prefetch_related(ORDER_ITEMS_PREFETCH)
         if self.request.user.role == 'customer':
-            return Order.objects.filter(customer=self.request.user)
+            return orders.filter(customer=self.request.user)
         elif self.request.user.role == 'supplier':
-            return Order.objects.filter(items__product__supplier__user=self.request.user).distinct()
+            return orders.filter(id__in=self.get_supplier_links().values('order_id'))
         return Order.objects.none()
 
-class OrderDetailView(generics.RetrieveAPIView):
+    def get_supplier_links(self):
+        return SupplierOrder.objects.filter(supplier__user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        if request.user.role == 'customer':
+            # Оперативные и архивные заказы покупателя сливаются в одну ленту
+            paginator = MergedOrderCursorPagination()
+            page = paginator.paginate_querysets(
+                [self.get_queryset(), ArchivedOrder.objects.filter(customer=request.user)], request, view=self,
+            )
+            serializer = self.get_serializer(restore_orders(page), many=True)
+            return paginator.get_paginated_response(serializer.data)
+        if request.user.role != 'supplier':
+            return super().list(request, *args, **kwargs)
+        # Лента поставщика: страница выбирается диапазоном по индексу SupplierOrder
+        # (supplier, created_at), затем заказы страницы загружаются по первичному ключу —
+        # из оперативной таблицы, а не найденные там — из архива
+        paginator = SupplierOrderCursorPagination()
+        links = paginator.paginate_queryset(
+            self.get_supplier_links().only('order_id', 'created_at'), request, view=self,
+        )
+        ids = [link.order_id for link in links]
+        orders = Order.objects.prefetch_related(ORDER_ITEMS_PREFETCH).in_bulk(ids)
+        missing = [pk for pk in ids if pk not in orders]
+        if missing:
+            archived = restore_orders(list(ArchivedOrder.objects.filter(id__in=missing)))
+            orders.update((order.id, order) for order in archived)
+        serializer = self.get_serializer([orders[pk] for pk in ids if pk in orders], many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+class OrderDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     API endpoint для получения деталей заказа.
+    Поддерживает условный GET: в ETag входит и время изменения товаров заказа,
+    так как они вложены в ответ. Заказ, которого нет в оперативной таблице,
+    ищется в архиве (orders.archive) и отдается в том же виде.
     """
     permission_classes = [IsAuthenticated]
-    queryset = Order.objects.all()
+    queryset = Order.objects.prefetch_related(ORDER_ITEMS_PREFETCH)
     serializer_class = OrderSerializer
 
-class OrderStatusUpdateView(generics.UpdateAPIView):
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            archived = get_object_or_404(ArchivedOrder, pk=self.kwargs['pk'])
+            return restore_orders([archived])[0]
+
+    def get_validators(self, request, *args, **kwargs):
+        stats = Order.objects.filter(pk=kwargs['pk']).aggregate(
+            order=Max('updated_at'), products=Max('items__product__updated_at'),
+        )
+        if stats['order'] is None:
+            stats = archived_order_stats(kwargs['pk'])
+        if stats is None:
+            return None, None
+        last_modified = max(filter(None, stats.values()))
+        return make_etag('order', kwargs['pk'], stats['order'], stats['products']), last_modified
+
+class OrderStatusUpdateView(generics.GenericAPIView):
     """
     API endpoint для обновления статуса заказа.
+    Переход проверяется по Order.TRANSITIONS и записывается условным
+    UPDATE ... WHERE status = <ожидаемый> (compare-and-set): если статус уже
+    изменили параллельно или в expected_status передан устаревший, ответ — 409.
     """
     permission_classes = [IsAuthenticated]
-    queryset = Order.objects.all()
+    queryset = Order.objects.prefetch_related(ORDER_ITEMS_PREFETCH)
     serializer_class = OrderSerializer
 
     def patch(self, request, *args, **kwargs):
@@ -144,11 +332,86 @@ class OrderStatusUpdateView(generics.UpdateAPIView):
         new_status = request.data.get('status')
         if new_status not in dict(Order.STATUS_CHOICES):
             return Response({"error": "Некорректный статус"}, status=status.HTTP_400_BAD_REQUEST)
-        order.status = new_status
-        order.save()
+        expected = request.data.get('expected_status', order.status)
+        if expected != order.status:
+            return self.conflict("Статус заказа уже изменен", order.status)
+        if not can_transition(expected, new_status):
+            return self.conflict(f"Недопустимый переход: {expected} → {new_status}", order.status)
+        if not change_order_status(order, new_status, expected):
+            current = Order.objects.filter(pk=order.pk).values_list('status', flat=True).first()
+            return self.conflict("Статус заказа уже изменен", current)
         serializer = self.get_serializer(order)
         return Response(serializer.data)
 
+    def conflict(self, message, current):
+        return Response({"error": message, "status": current}, status=status.HTTP_409_CONFLICT)
+
+class OrderBulkStatusView(views.APIView):
+    """
+    API endpoint для массовой смены статуса заказов поставщиком.
+    Все допустимые переходы выполняются одним UPDATE; заказы чужие, не найденные
+    или с недопустимым переходом не меняются и возвращаются в skipped.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role != 'supplier' and not request.user.is_staff:
+            return Response(
+                {"error": "Массовая смена статуса доступна только поставщикам"}, status=status.HTTP_403_FORBIDDEN,
+            )
+        serializer = OrderStatusBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids, target = serializer.validated_data['ids'], serializer.validated_data['status']
+        orders = Order.objects.filter(id__in=ids)
+        if not request.user.is_staff:
+            orders = orders.filter(supplier_links__supplier__user=request.user)
+        updated = transition_orders(orders, target)
+        notify_status_changed(updated)
+        changed = set(updated)
+        return Response({
+            'status': target,
+            'updated': sorted(changed),
+            'skipped': [pk for pk in ids if pk not in changed],
+        })
+
+class SalesAnalyticsView(ReplicaReadMixin, views.APIView):
+    """
+    API endpoint аналитики продаж поставщика: единицы и выручка по товарам и дням.
+    Читает дневные агрегаты SalesRollup за период (orders.filters.filter_sales),
+    поэтому время ответа зависит от длины периода, а не от числа заказов.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'supplier':
+            return Response({"error": "Аналитика доступна только поставщикам"}, status=status.HTTP_403_FORBIDDEN)
+        rollups, date_from, date_to = filter_sales(
+            SalesRollup.objects.filter(supplier__user=request.user), request.query_params,
+        )
+        rows = list(
+            rollups.values('day', 'product_id')
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('day', 'product_id')
+        )
+        return Response({
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'totals': {
+                'units': sum(row['units'] for row in rows),
+                'revenue': f"{sum(row['revenue'] for row in rows):.2f}",
+            },
+            'rows': [
+                {
+                    'day': row['day'].isoformat(),
+                    'product': row['product_id'],
+                    'units': row['units'],
+                    'revenue': f"{row['revenue']:.2f}",
+                }
+                for row in rows
+            ],
+        })
+
 class ErrorTestView(views.APIView):
     """
     API endpoint для тестирования мониторинга ошибок (Sentry/Rollbar).
@@ -156,3 +419,18 @@ class ErrorTestView(views.APIView):
     """
     def get(self, request):
         raise Exception("Тестовое исключение для проверки мониторинга ошибок")
+
+
+def metrics_view(request):
+    """
+    Гистограммы запросов в формате Prometheus (orders.metrics).
+    Доступ закрыт по умолчанию: нужен заголовок Authorization: Bearer <settings.METRICS_TOKEN>
+    или сессия сотрудника (is_staff). Без токена открыто только при DEBUG.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not request.user.is_staff:
+        if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+        if not token and not settings.DEBUG:
+            return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from celery.schedules import crontab
 import sentry_sdk
 from sentry_sdk.integrations.django import DjangoIntegration
 
@@ -25,17 +26,20 @@ INSTALLED_APPS = [
     'drf_spectacular',            # автогенерация документации OpenAPI
     'silk',                      # анализ производительности (django-silk)
     'social_django',             # социальная авторизация
+    'versatileimagefield',       # превью изображений товаров
 
     # Ваше приложение:
     'orders',
 ]
 
 MIDDLEWARE = [
+    'orders.middleware.ServerTimingMiddleware',  # Server-Timing и метрики /metrics, первым
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'orders.middleware.ReplicaRoutingMiddleware',  # чтение с реплик, после аутентификации
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'silk.middleware.SilkyMiddleware',  # для django-silk
@@ -71,6 +75,23 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения каталога и списков заказов (orders.db_routing): пути к файлам
+# через запятую в DATABASE_REPLICAS. Локально реплики — копии db.sqlite3,
+# обновляемые manage.py sync_replicas; открываются только на чтение.
+DATABASE_REPLICAS = [path for path in os.environ.get('DATABASE_REPLICAS', '').split(',') if path]
+for number, path in enumerate(DATABASE_REPLICAS, 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{path}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    }
+REPLICA_DATABASES = [f'replica{number}' for number in range(1, len(DATABASE_REPLICAS) + 1)]
+DATABASE_ROUTERS = ['orders.db_routing.ReplicaRouter']
+# Сколько секунд после записи клиент читает из default; не меньше отставания реплик
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+# Служебные таблицы: их запись не закрепляет клиента, чтение всегда из default
+REPLICA_IGNORED_APPS = ('silk', 'sessions')
+
 # Пароли и валидация
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -86,37 +107,97 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Превью изображений товаров: генерируются заранее задачей Celery
+# (orders.tasks.warm_product_renditions), а не при первом запросе
+VERSATILEIMAGEFIELD_SETTINGS = {
+    'create_images_on_demand': False,
+}
+VERSATILEIMAGEFIELD_RENDITION_KEY_SETS = {
+    'product_image': [
+        ('thumbnail', 'thumbnail__100x100'),
+        ('list', 'thumbnail__300x300'),
+        ('detail', 'thumbnail__800x800'),
+    ],
+}
+
+# Общий кэш: кэш каталога и счетчики тротлинга должны быть одни на все процессы,
+# поэтому в продакшене нужен Redis (REDIS_CACHE_URL). Без него — LocMem в памяти
+# процесса (разработка и тесты).
+REDIS_CACHE_URL = os.environ.get('REDIS_CACHE_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+
 # DRF и схема OpenAPI
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-         'rest_framework.authentication.TokenAuthentication',
+         'orders.authentication.CachedTokenAuthentication',  # TokenAuthentication с кэшем
          'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+         'orders.renderers.ORJSONRenderer',   # без orjson работает как обычный JSONRenderer
+         'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Счетчики скользящего окна в общем кэше (orders.throttling): лимиты действуют на все процессы
     'DEFAULT_THROTTLE_CLASSES': [
-         'rest_framework.throttling.UserRateThrottle',
+         'orders.throttling.AnonSlidingThrottle',
+         'orders.throttling.UserSlidingThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
+         'anon': '60/minute',
          'user': '100/minute',
+         'products': '100/minute',     # ProductListView (throttle_scope)
+         'register': '10/hour',        # RegisterView, на IP
     },
 }
 
+# Курсорная пагинация списков (orders.pagination)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+ORDER_BULK_STATUS_MAX_IDS = 1000    # заказов в одном запросе массовой смены статуса
+ORDER_BATCH_MAX_ORDERS = 5000       # заказов в одном запросе пакетной загрузки
+ANALYTICS_MAX_DAYS = 366            # длина периода в /api/analytics/
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Procurement Project API',
     'DESCRIPTION': 'Документация API для проекта автоматизации закупок',
     'VERSION': '1.0.0',
 }
 
-# Кэширование (пример django-cacheops)
-CACHEOPS_REDIS = {
-    'host': 'localhost',
-    'port': 6379,
-    'db': 1,
-    'socket_timeout': 3,
-}
-CACHEOPS = {
-    'orders.product': {'ops': 'all', 'timeout': 60*15},
-}
+# Кэш каталога (orders.cache): версионированные ключи, инвалидация по событиям
+# изменения товаров и поставщиков, поэтому TTL может быть длинным
+PRODUCT_CACHE_TIMEOUT = 60 * 60 * 24
+PRODUCT_CACHE_LOCAL_SIZE = 256      # записей в LRU-кэше процесса
+PRODUCT_CACHE_LOCAL_TTL = 60        # секунд
+PRODUCT_CACHE_LOCK_TIMEOUT = 10     # защита от одновременного пересчета горячего ключа
+
+# Кэш токенов (orders.authentication.CachedTokenAuthentication)
+TOKEN_AUTH_CACHE_TIMEOUT = 60 * 5   # снимок токена и пользователя в общем кэше
+TOKEN_AUTH_LOCAL_TTL = 5            # в памяти процесса; задержка, с которой другие процессы видят деактивацию
+TOKEN_AUTH_LOCAL_SIZE = 1024
+
+# Легкие метрики каждого запроса (orders.middleware.ServerTimingMiddleware):
+# заголовок Server-Timing и гистограммы на /metrics
+SERVER_TIMING_HEADER = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')   # Bearer-токен для /metrics; без него вне DEBUG — только is_staff
+
+# Тяжелые профилировщики — только на доле запросов (проценты / доля от 0 до 1)
+SILKY_INTERCEPT_PERCENT = int(os.environ.get('SILKY_INTERCEPT_PERCENT', 100 if DEBUG else 1))
+SENTRY_TRACES_SAMPLE_RATE = float(os.environ.get('SENTRY_TRACES_SAMPLE_RATE', 0.05))
 
 # Социальная авторизация (пример для Google OAuth2)
 AUTHENTICATION_BACKENDS = (
@@ -128,13 +209,24 @@ AUTHENTICATION_BACKENDS = (
 sentry_sdk.init(
     dsn="https://6199de63790ac62c8ba047ee6a6c0d6e@o4509014817112064.ingest.de.sentry.io/4509014819405904",
     integrations=[DjangoIntegration()],
-    traces_sample_rate=1.0,
+    traces_sample_rate=SENTRY_TRACES_SAMPLE_RATE,
     send_default_pii=True
 )
 
 # Настройки Celery (брокер Redis)
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+CELERY_BEAT_SCHEDULE = {
+    'archive-delivered-orders': {
+        'task': 'orders.tasks.archive_delivered_orders',
+        'schedule': crontab(hour=3, minute=0),
+    },
+}
+
+# Архивация заказов (orders.archive): доставленные заказы без изменений дольше
+# ORDER_ARCHIVE_AFTER_DAYS переносятся в ArchivedOrder пачками по ORDER_ARCHIVE_BATCH_SIZE
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 90))
+ORDER_ARCHIVE_BATCH_SIZE = 500
 
 # ВАЖНО: Используем кастомную модель пользователя из orders
 AUTH_USER_MODEL = 'orders.User'
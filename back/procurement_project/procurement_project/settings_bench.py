@@ -0,0 +1,21 @@
+"""
+Настройки для нагрузочных замеров (manage.py bench_asgi): без профилировщика silk,
+трассировки Sentry и тротлинга, которые иначе доминируют во времени ответа.
+"""
+import sentry_sdk
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'silk']
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if not middleware.startswith('silk.')]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {scope: '1000000/minute' for scope in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']},
+}
+
+sentry_sdk.init(dsn=None)